@@ -1,23 +1,54 @@
 import streamlit as st
 import pandas as pd
 from arr_lib.setup import PREDEFINED_COLUMN_HEADERS
-from arr_lib.setup import PREDEFINED_DATE_FORMATS
-from arr_lib.arr_analysis import create_monthly_buckets
-from arr_lib.arr_analysis import create_arr_metrics
-from arr_lib.arr_analysis import create_customer_and_aggregated_metrics
-from arr_lib.arr_analysis import reconcile_overrides
+from arr_lib.setup import PREDEFINED_DATE_FORMATS, METRICS_BACKENDS
+from arr_lib.setup import RECON_ABSOLUTE_TOLERANCE, RECON_RELATIVE_TOLERANCE, RECON_MISMATCH_TYPES, RECON_PAGE_SIZE
+from arr_lib.arr_analysis import create_arr_metrics_from_contracts
+from arr_lib.arr_sparse import densify_frame
+from arr_lib.arr_incremental import update_customer_and_aggregated_metrics
+from arr_lib.arr_reconciliation import create_reconciliation, create_reconciliation_report, get_reconciliation_page
 from arr_lib.arr_analysis import highlight_positive_negative_cells, decorate_logo_metrics_df
 from arr_lib.arr_analysis import apply_overrides
 from arr_lib.arr_analysis import stylize_metrics_df, rename_columns
 from arr_lib.column_mapping_ui import perform_column_mapping
+from arr_lib.paging_ui import render_grid_page
+from arr_lib.arr_validations import validation_report_to_df, select_valid_rows
+from arr_lib.arr_ingestion import read_upload_preview, read_override_file, stream_revenue_matrix
+from arr_lib.arr_analysis import create_customer_and_aggregated_metrics
+from arr_lib.arr_snapshots import calculate_snapshot_key, save_snapshot, load_snapshot, SNAPSHOT_FRAME_KEYS
+from arr_lib.arr_cache import calculate_content_key, derive_stage_key, run_cached_stage
+from arr_lib.session_store import put_session_frame, get_session_frame, enforce_session_budget, get_session_memory_usage, clear_session_store
 from arr_lib.styling import BUTTON_STYLE
 from arr_lib.styling import MARKDOWN_STYLES
 from arr_lib.styling import GLOBAL_STYLING
 
-# on_change callback for file upload 
+# number of upload rows displayed and mapped in large file mode
+UPLOAD_PREVIEW_ROWS = 1000
+
+# on_change callback for file upload - the ingestion mode choices are kept 
 def clear_session_cb ():
+    clear_session_store(st.session_state)
     for key in st.session_state.keys():
-        del st.session_state[key]
+        if key not in ('streaming_ingestion', 'typed_ingestion', 'metrics_backend'):
+            del st.session_state[key]
+
+# pipeline cache key of the mapped data - upload fingerprint, column map and ingestion mode (no DataFrame is hashed)
+def get_input_key(streaming_ingestion, typed_ingestion):
+    if streaming_ingestion:
+        # large file mode - the upload is read with the validated column map when the analysis is generated
+        return derive_stage_key(st.session_state.upload_key, 'streamed', calculate_content_key(st.session_state.mapped_column_map_df))
+    return derive_stage_key(st.session_state.upload_key, 'mapped', calculate_content_key(st.session_state.get('mapped_column_map_df')),
+                            typed_ingestion, bool(st.session_state.get('continue_with_valid_rows')))
+
+# content hash of the mapped input - key of the saved analysis snapshot (the overrides do not change the analysis frames)
+def get_snapshot_key(streaming_ingestion, typed_ingestion):
+    return calculate_snapshot_key(get_input_key(streaming_ingestion, typed_ingestion))
+
+# key of the saved replanned analysis - the snapshot key plus the applied overrides and the content hash of the edited scratchpad
+# it was replanned from
+def get_replan_snapshot_key(streaming_ingestion, typed_ingestion, edited_df):
+    applied_override_key = st.session_state.get('override_key') if st.session_state.get('apply_override') else None
+    return calculate_snapshot_key(get_snapshot_key(streaming_ingestion, typed_ingestion), 'replan', applied_override_key, edited_df)
 
 def main():
 
@@ -41,20 +72,43 @@ def main():
     if 'prepare_ai_data' not in st.session_state:  
         st.session_state.prepare_ai_data = "False"          
 
+    # large file mode - only a preview is loaded for display and mapping, the analysis streams the upload in chunks
+    streaming_ingestion = st.checkbox("Large file mode (stream the upload in chunks)", key='streaming_ingestion')
+
+    # typed mode - the mapped data is read by the pyarrow CSV reader with fixed dtypes (ids and names as strings)
+    typed_ingestion = st.checkbox("Typed mode (pyarrow reader with fixed column types)", key='typed_ingestion', disabled=streaming_ingestion)
+    typed_ingestion = typed_ingestion and not streaming_ingestion
+
+    # metrics backend - dense numpy grids or sparse CSR grids (lower memory with many customers and months).
+    # The large file mode builds the dense grid while streaming
+    metrics_backend = st.selectbox("Metrics backend", METRICS_BACKENDS, key='metrics_backend', disabled=streaming_ingestion)
+
     # upload files
     uploaded_file = st.file_uploader("Upload a CSV file", type=["csv"], on_change = clear_session_cb)
     if uploaded_file is not None:
-        df = pd.read_csv(uploaded_file)
-        st.session_state.df = df
-        st.session_state.uploaded_file = uploaded_file       
+        # the upload is read once (and again if the large file mode is changed) - the session is cleared on a new upload
+        if ('upload_key' not in st.session_state) or (st.session_state.get('upload_streaming_ingestion') != streaming_ingestion):
+            if streaming_ingestion:
+                df = read_upload_preview(uploaded_file, UPLOAD_PREVIEW_ROWS)
+            else:
+                df = pd.read_csv(uploaded_file)
+            put_session_frame(st.session_state, 'df', df)
+            st.session_state.uploaded_file = uploaded_file       
+            st.session_state.upload_streaming_ingestion = streaming_ingestion
+
+            # fingerprint of the upload 
+            st.session_state.upload_key = calculate_content_key(uploaded_file)
   
     # Conitnue processing is uploaded data is available 
-    df = st.session_state.df
+    df = get_session_frame(st.session_state, 'df')
     if not df.empty:
         # Display mapped data 
         with st.expander('Show/Hide uploaded data', expanded=True):
             st.subheader('Uploaded Data :', divider='green') 
-            st.write(df)
+            if streaming_ingestion:
+                st.caption(f"Large file mode - first {UPLOAD_PREVIEW_ROWS:,} rows of the upload")
+            # only the page being viewed is sent to the browser
+            st.dataframe(render_grid_page(df, 'upload_grid', customer_grid=False))
 
         st.markdown("<br>", unsafe_allow_html=True)
 
@@ -70,13 +124,34 @@ def main():
         if 'column_mapping_status' not in st.session_state:
                 st.session_state.column_mapping_status = False
 
+        # initialize validation report 
+        if 'validation_report' not in st.session_state:
+                st.session_state.validation_report = None
+
         # Map file column names based on mapped columns and validate content     
         with st.expander('Show/Hide Column mapping', expanded=True):
-            mapped_df, column_mapping_status = perform_column_mapping(PREDEFINED_COLUMN_HEADERS, PREDEFINED_DATE_FORMATS, df)  
-            st.session_state.column_mapping_status = column_mapping_status
-            st.session_state.mapped_df =  mapped_df
-
-        mapped_df = st.session_state.mapped_df
+            mapped_df, column_mapping_status = perform_column_mapping(PREDEFINED_COLUMN_HEADERS, PREDEFINED_DATE_FORMATS, df,
+                                                                      typed_upload_file=st.session_state.uploaded_file if typed_ingestion else None)  
+
+        # Display validation report - and optionally continue with only the valid rows (the checks are not re-run)
+        validation_report = st.session_state.validation_report
+        if (validation_report is not None) and (not mapped_df.empty) and validation_report['num_rejected'] > 0:
+            with st.expander('Show/Hide validation report', expanded=True):
+                st.subheader('Validation Report :', divider='green') 
+                st.dataframe(validation_report_to_df(validation_report), use_container_width=True)
+
+                column_mapping_status = False
+                if not validation_report['missing_columns']:
+                    continue_with_valid_rows = st.checkbox(f"Continue with the valid rows only ({validation_report['num_rejected']:,} of {validation_report['num_rows']:,} rows rejected)", key='continue_with_valid_rows')
+                    if continue_with_valid_rows:
+                        valid_mapped_df = select_valid_rows(mapped_df, validation_report)
+                        # stored only when rows are removed - the mapped data in the session is already filtered on the next run 
+                        if len(valid_mapped_df) != len(mapped_df):
+                            mapped_df = valid_mapped_df
+                            put_session_frame(st.session_state, 'mapped_df', mapped_df)
+                        column_mapping_status = not mapped_df.empty
+
+        st.session_state.column_mapping_status = column_mapping_status
 
 
         # -------------------------------------------------------------------------------        
@@ -88,14 +163,10 @@ def main():
             # Display mapped data 
             with st.expander('Show/Hide mapped data', expanded=True):
                 st.subheader("Mapped Data :", divider='green') 
-                st.dataframe(st.session_state.mapped_df, use_container_width=False)
+                st.dataframe(mapped_df, use_container_width=False)
 
         st.markdown("<br><br>", unsafe_allow_html=True)
 
-        # initialize monthly_bucket_df 
-        if 'monthly_bucket_df' not in st.session_state:
-                st.session_state.monthly_bucket_df = pd.DataFrame()
-
         # Add a button to generate ARR metrics 
         if 'generate_arr_metrics_button_clicked' not in st.session_state:
             st.session_state.generate_arr_metrics_button_clicked = False
@@ -118,21 +189,39 @@ def main():
             try:
                 with st.spinner("Generating ARR  Analytics ..."):
 
-                    # Step 2a: Generate monthly buckets
-                    # ----------------------------------
-                    mapped_df = st.session_state.mapped_df
-                    monthly_bucket_df = create_monthly_buckets(mapped_df)                    
-                    st.session_state.monthly_bucket_df = monthly_bucket_df
+                    # reload the saved analysis of the same input if there is one 
+                    snapshot_key = get_snapshot_key(streaming_ingestion, typed_ingestion)
+                    snapshot_frames = load_snapshot(snapshot_key)
 
-                    # Step 2b: Create transposed matrix with arr details and aggregated arr metrics
+                    # Step 2a: Create transposed matrix directly from the contracts (no monthly buckets) 
+                    #           with arr details and aggregated arr metrics
                     #---------------------------------------------------------------------------------                   
-                    cust_arr_waterfall_df, customer_arr_df, logo_metrics_df, metrics_df = create_arr_metrics(monthly_bucket_df)
+                    snapshot_loaded = all(key in snapshot_frames for key in SNAPSHOT_FRAME_KEYS[:4])
+                    if snapshot_loaded:
+                        cust_arr_waterfall_df, customer_arr_df, logo_metrics_df, metrics_df = [snapshot_frames[key] for key in SNAPSHOT_FRAME_KEYS[:4]]
+                        st.info("Loaded the saved analysis of this data")
+                    elif streaming_ingestion:
+                        # large file mode - the whole upload is streamed with the column map validated on the preview,
+                        # rows that fail the validations are skipped and reported 
+                        input_key = get_input_key(streaming_ingestion, typed_ingestion)
+                        transposed_df, ingestion_report = run_cached_stage(derive_stage_key(input_key, 'revenue_matrix'), 
+                                                                           stream_revenue_matrix, st.session_state.uploaded_file, st.session_state.mapped_column_map_df)
+                        st.session_state.ingestion_report = ingestion_report
+                        cust_arr_waterfall_df, customer_arr_df, logo_metrics_df, metrics_df = run_cached_stage(derive_stage_key(input_key, 'arr_metrics'), 
+                                                                                                               create_customer_and_aggregated_metrics, transposed_df)
+                    else:
+                        mapped_df = get_session_frame(st.session_state, 'mapped_df')
+                        cust_arr_waterfall_df, customer_arr_df, logo_metrics_df, metrics_df = run_cached_stage(derive_stage_key(get_input_key(streaming_ingestion, typed_ingestion), 'arr_metrics', metrics_backend), 
+                                                                                                               create_arr_metrics_from_contracts, mapped_df, metrics_backend)
 
                     st.session_state.customer_arr_waterfall_df = cust_arr_waterfall_df         
                     st.session_state.customer_arr_df = customer_arr_df
                     st.session_state.logo_metrics_df = logo_metrics_df
                     st.session_state.metrics_df = metrics_df
 
+                    if not snapshot_loaded:
+                        save_snapshot(snapshot_key, {key: st.session_state[key] for key in SNAPSHOT_FRAME_KEYS[:4]})
+
                     st.session_state.prepare_ai_data = "True"    
 
             except ValueError as e:
@@ -145,12 +234,20 @@ def main():
                 
         metrics_df = st.session_state.metrics_df
         if (not metrics_df.empty) and st.session_state.column_mapping_status:
+
+            # Display the rows skipped by the streaming ingestion 
+            ingestion_report = st.session_state.get('ingestion_report')
+            if streaming_ingestion and (ingestion_report is not None) and ingestion_report['num_rejected'] > 0:
+                with st.expander('Show/Hide skipped rows', expanded=False):
+                    st.warning(f"{ingestion_report['num_rejected']:,} of {ingestion_report['num_rows']:,} rows failed the validations and were skipped")
+                    st.dataframe(validation_report_to_df(ingestion_report), use_container_width=True)
             
             # Display customer level detailes 
             with st.expander('Show/Hide MRR by Customer', expanded = True):
                 st.subheader('MRR by Customer :', divider='green') 
+                # only the page (and month window) being viewed is sent to the browser
+                display_customer_arr_df = render_grid_page(st.session_state.customer_arr_df, 'customer_arr_grid').round(2)
                 # set index to customerId, measureType - for freeze pane functionality
-                display_customer_arr_df = st.session_state.customer_arr_df.round(2).copy()
                 display_customer_arr_df.set_index(['customerName'], inplace=True)
                 st.dataframe(display_customer_arr_df, use_container_width=True)
 
@@ -160,7 +257,7 @@ def main():
             with st.expander('Show/Hide Customer Count', expanded = True):
                 st.subheader('Customer Count :', divider='green') 
                 # set inde to measureType
-                display_logo_metrics_df = rename_columns(st.session_state.logo_metrics_df.round(0)).copy()
+                display_logo_metrics_df = rename_columns(st.session_state.logo_metrics_df.round(0))
                 display_logo_metrics_df.set_index(['measureType'], inplace=True)
 
                 display_logo_metrics_df = decorate_logo_metrics_df(display_logo_metrics_df, 'blue')
@@ -172,7 +269,7 @@ def main():
 
             # Stylize aggregated metrics DF
 
-            display_metrics_df= st.session_state.metrics_df.copy()
+            display_metrics_df= st.session_state.metrics_df
             display_metrics_df= stylize_metrics_df(display_metrics_df, 'blue') 
 
             st.dataframe(display_metrics_df, use_container_width=True)
@@ -200,7 +297,10 @@ def main():
 
         uploaded_override_file = st.session_state.uploaded_override_file
         if uploaded_override_file is not None:
-            override_df = pd.read_csv(uploaded_override_file)
+            # in typed and large file mode the customer ids are strings - the override ids are read as strings too, so that they match
+            string_customer_ids = typed_ingestion or streaming_ingestion
+            override_df = read_override_file(uploaded_override_file, string_customer_ids)
+            st.session_state.override_key = calculate_content_key(uploaded_override_file, str(typed_ingestion), str(streaming_ingestion))
             st.session_state.override_df = override_df
 
         override_df =  st.session_state.override_df 
@@ -208,7 +308,7 @@ def main():
             try:
                 with st.expander('Show/Hide uploaded historical details', expanded = True):
                     st.subheader('Uploaded historical details :', divider='green')     
-                    display_override_df = override_df.round(2).copy()
+                    display_override_df = override_df.round(2)
                     display_override_df.set_index(['customerName'], inplace=True)
                     st.dataframe(display_override_df)
             except Exception as e:
@@ -216,15 +316,47 @@ def main():
 
         if (not override_df.empty ) and (not metrics_df.empty) and st.session_state.column_mapping_status: 
             try: 
-                recon_df = reconcile_overrides(st.session_state.customer_arr_df, st.session_state.override_df)
+                reconciliation = run_cached_stage(derive_stage_key(get_input_key(streaming_ingestion, typed_ingestion), 'create_reconciliation', st.session_state.override_key), 
+                                                  create_reconciliation, st.session_state.customer_arr_df, st.session_state.override_df)
+                recon_df = reconciliation['recon_df']
                 st.session_state.recon_df = recon_df
                 with st.expander('Show/Hide MRR reconciliation between imported and historical data', expanded = True):
                     st.subheader('MRR reconciliation between imported and historical data :', divider='green')  
-                    display_recon_df = recon_df.round(0).copy()   
-                    display_recon_df.set_index(['customerName', 'customerId'], inplace=True)  
-                    display_recon_df = highlight_positive_negative_cells(display_recon_df)   
-                    display_recon_df = display_recon_df.format("{:,.2f}")      
-                    st.dataframe(display_recon_df) 
+                    st.caption(f"{len(recon_df):,} customers with differences in {int((reconciliation['month_totals'] != 0).sum()):,} months - "
+                               f"total difference {reconciliation['total_difference']:,.2f}")
+
+                    recon_view = st.radio('View', ['Summary report', 'Full difference grid'], horizontal=True, key='recon_view')
+
+                    if recon_view == 'Summary report': 
+                        # tolerances, mismatch types and page - only the page being viewed is materialized
+                        tol_col1, tol_col2, tol_col3, tol_col4 = st.columns([2,2,4,2])
+                        absolute_tolerance = tol_col1.number_input('Absolute tolerance', min_value=0.0, value=RECON_ABSOLUTE_TOLERANCE, key='recon_absolute_tolerance')
+                        relative_tolerance = tol_col2.number_input('Relative tolerance (%)', min_value=0.0, value=RECON_RELATIVE_TOLERANCE * 100, key='recon_relative_tolerance') / 100
+                        selected_mismatch_types = tol_col3.multiselect('Mismatch types', RECON_MISMATCH_TYPES, key='recon_mismatch_types')
+
+                        recon_report = run_cached_stage(derive_stage_key(get_input_key(streaming_ingestion, typed_ingestion), 'create_reconciliation_report', 
+                                                                         st.session_state.override_key, absolute_tolerance, relative_tolerance), 
+                                                        create_reconciliation_report, st.session_state.customer_arr_df, st.session_state.override_df, 
+                                                        absolute_tolerance, relative_tolerance)
+
+                        recon_page = tol_col4.number_input('Page', min_value=1, value=1, step=1, key='recon_page')
+                        page_summary_df, page_grid_df, num_pages = get_reconciliation_page(recon_report, recon_page, RECON_PAGE_SIZE, selected_mismatch_types)
+
+                        st.dataframe(recon_report['type_summary_df'].round(2), use_container_width=True)
+                        st.caption(f"Page {min(recon_page, num_pages)} of {num_pages} - customers ranked by absolute difference")
+                        st.dataframe(page_summary_df.round(2), use_container_width=True)
+
+                        # drill down - differences of the customers of the page 
+                        display_recon_df = page_grid_df.round(0).set_index(['customerName', 'customerId'])
+                        display_recon_df = highlight_positive_negative_cells(display_recon_df)   
+                        display_recon_df = display_recon_df.format("{:,.2f}")      
+                        st.dataframe(display_recon_df) 
+                    else: 
+                        display_recon_df = recon_df.round(0)   
+                        display_recon_df.set_index(['customerName', 'customerId'], inplace=True)  
+                        display_recon_df = highlight_positive_negative_cells(display_recon_df)   
+                        display_recon_df = display_recon_df.format("{:,.2f}")      
+                        st.dataframe(display_recon_df) 
             except Exception as e:
                 st.error(f"Error: {e}") 
 
@@ -278,15 +410,20 @@ def main():
                     
                     # Call the method to create the metrics df
                     if st.session_state.apply_override: 
-                         planning_df = apply_overrides(st.session_state.customer_arr_df, st.session_state.override_df)
+                         planning_df = run_cached_stage(derive_stage_key(get_input_key(streaming_ingestion, typed_ingestion), 'apply_overrides', st.session_state.override_key), 
+                                                        apply_overrides, st.session_state.customer_arr_df, st.session_state.override_df)
                     else:
-                        planning_df = st.session_state.customer_arr_df  
+                        # the planning sheet is edited as a whole - dense columns
+                        planning_df = densify_frame(st.session_state.customer_arr_df)
                     st.session_state.planning_df = planning_df
 
                     # reset replan output dfs 
                     st.session_state.replan_metrics_df = pd.DataFrame()
                     st.session_state.replan_customer_arr_df = pd.DataFrame()
 
+                    # reset incremental replan state - the next replan is a full calculation
+                    st.session_state.replan_metrics_state = None
+
             except ValueError as e:
                 st.error(f"Error: {str(e)}")
 
@@ -346,6 +483,9 @@ def main():
         if 'replan_arr_metrics_button_clicked' not in st.session_state:
                 st.session_state.replan_arr_metrics_button_clicked = False
 
+        if 'replan_metrics_state' not in st.session_state:
+                st.session_state.replan_metrics_state = None
+
         if 'edited_df' not in st.session_state:
                 st.session_state.edited_df = pd.DataFrame()
 
@@ -358,16 +498,31 @@ def main():
             try:
                 with st.spinner("Replanning ARR Metrics"):
                     
-                    # Call the method to create the metrics df
+                    # Call the method to create the metrics df - only the edited customers are recalculated 
                     call_edited_df = st.session_state.edited_df     
-         
-                    replan_customer_arr_waterfall_df, replan_customer_arr_df, replan_logo_metrics_df, replan_metrics_df = create_customer_and_aggregated_metrics(call_edited_df)
+
+                    # the first replan of the session reloads the saved replanned analysis of the same scratchpad if there is one
+                    replan_snapshot_key = get_replan_snapshot_key(streaming_ingestion, typed_ingestion, call_edited_df)
+                    replan_snapshot_frames = load_snapshot(replan_snapshot_key, SNAPSHOT_FRAME_KEYS[4:]) if st.session_state.replan_metrics_state is None else {}
+                    replan_snapshot_loaded = all(key in replan_snapshot_frames for key in SNAPSHOT_FRAME_KEYS[4:])
+
+                    if replan_snapshot_loaded:
+                        replan_customer_arr_waterfall_df, replan_customer_arr_df, replan_logo_metrics_df, replan_metrics_df = [replan_snapshot_frames[key] for key in SNAPSHOT_FRAME_KEYS[4:]]
+                        st.info("Loaded the saved replanned analysis of this scratchpad")
+                    else:
+                        replan_metrics_state, replan_frames = update_customer_and_aggregated_metrics(call_edited_df, st.session_state.replan_metrics_state)
+                        replan_customer_arr_waterfall_df, replan_customer_arr_df, replan_logo_metrics_df, replan_metrics_df = replan_frames
+                        st.session_state.replan_metrics_state = replan_metrics_state
 
                     st.session_state.replan_customer_arr_waterfall_df = replan_customer_arr_waterfall_df
                     st.session_state.replan_customer_arr_df = replan_customer_arr_df  
                     st.session_state.replan_logo_metrics_df = replan_logo_metrics_df
                     st.session_state.replan_metrics_df = replan_metrics_df
 
+                    # save the replanned results under the key of the scratchpad they were replanned from
+                    if not replan_snapshot_loaded:
+                        save_snapshot(replan_snapshot_key, {key: st.session_state[key] for key in SNAPSHOT_FRAME_KEYS[4:]})
+
                     st.session_state.prepare_ai_data = "True"    
 
             except ValueError as e:
@@ -385,7 +540,8 @@ def main():
             with st.expander('Show/Hide MRR by Customer', expanded = True):
                 st.subheader('MRR by Customer :', divider='green') 
  
-                display_replan_customer_arr_df = st.session_state.replan_customer_arr_df.round(2).copy()
+                # only the page (and month window) being viewed is sent to the browser
+                display_replan_customer_arr_df = render_grid_page(st.session_state.replan_customer_arr_df, 'replan_customer_arr_grid').round(2)
 
                 # set inde to customerName  - for freeze pane functionality
                 display_replan_customer_arr_df.set_index(['customerName'], inplace=True)
@@ -397,7 +553,7 @@ def main():
                 st.subheader('Customer Count :', divider='green') 
 
 
-                display_replan_logo_metrics_df = st.session_state.replan_logo_metrics_df.round(0).copy()
+                display_replan_logo_metrics_df = st.session_state.replan_logo_metrics_df.round(0)
                 display_replan_logo_metrics_df = rename_columns(display_replan_logo_metrics_df)
                 display_replan_logo_metrics_df.set_index(['measureType'], inplace=True)
 
@@ -407,11 +563,19 @@ def main():
             st.subheader('ARR Walk (by Type) :', divider='green') 
 
             # set inde to customerId, measureType - for freeze pane functionality
-            display_replan_metrics_df = st.session_state.replan_metrics_df.copy()        
+            display_replan_metrics_df = st.session_state.replan_metrics_df        
             display_replan_metrics_df = stylize_metrics_df(display_replan_metrics_df, 'green')
             st.dataframe(display_replan_metrics_df, use_container_width=True)
 
 
+    # spill the intermediate frames above the session memory ceiling - and show the current usage 
+    enforce_session_budget(st.session_state)
+    session_memory_usage = get_session_memory_usage(st.session_state)
+    with st.sidebar.expander('Session memory', expanded=False):
+        st.caption(f"{session_memory_usage['in_memory_bytes'] / (1024 * 1024):,.1f} MB in memory of {session_memory_usage['budget_bytes'] / (1024 * 1024):,.0f} MB, "
+                   f"{session_memory_usage['spilled_bytes'] / (1024 * 1024):,.1f} MB on disk")
+        st.dataframe(session_memory_usage['frames'], hide_index=True, use_container_width=True)
+
     # -- Create sidebar for plot controls
     # st.sidebar.title('AI helper')
     # query= st.sidebar.text_area('Ask your question - not implemented yet')
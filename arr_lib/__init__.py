@@ -0,0 +1,8 @@
+import pandas as pd
+
+
+# Immutable frame convention
+# pandas copy-on-write is enabled for the app - derived frames share the data of their inputs and a copy is only made when
+# a frame is modified. Functions never modify their input frames: a function that modifies a frame works on a shallow
+# copy (copy(deep=False)) or on the new frame returned by a pandas method, not on the caller's object
+pd.set_option('mode.copy_on_write', True)
@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+from arr_lib.setup import CUSTOMER_WATERFALL_MEASURE_TYPES
+from arr_lib.arr_analysis import create_metrics_from_totals, create_logo_metrics_frame, count_waterfall_customers
+
+
+# Aggregate store for the ARR metrics
+# keeps the monthly totals of each measure and the monthly customer counts - a change of a customer's waterfall is applied
+# by subtracting the old rows and adding the new rows, so the update cost is proportional to the change and not to the book
+
+
+def calculate_waterfall_aggregates(waterfall):
+    """
+    Calculates the monthly totals and customer counts of a customers x measures x months waterfall array
+
+    Parameters:
+    - waterfall (np.ndarray): customers x measures x months (see calculate_customer_waterfall)
+
+    Returns:
+    - np.ndarray: measures x months totals
+    - np.ndarray: 3 x months customer counts - monthlyRevenue, newBusiness, churn
+    """
+
+    waterfall = np.asarray(waterfall, dtype=np.float64)
+
+    totals = waterfall.sum(axis=0)
+    counts = count_waterfall_customers(waterfall)
+
+    return totals, counts
+
+
+def waterfall_df_to_array(input_df, month_columns):
+    """
+    Converts customer waterfall rows (cust_arr_waterfall_df structure) to a customers x measures x months array -
+    rows are grouped by customerName, customerId and missing measures are 0
+
+    Parameters:
+    - df (pd.DataFrame): customerName, customerId, measureType and one column per month
+    - month_columns (list): month column names
+
+    Returns:
+    - np.ndarray: customers x measures x months
+    """
+
+    df = input_df
+
+    measure_codes = pd.Categorical(df['measureType'].astype(str), categories=CUSTOMER_WATERFALL_MEASURE_TYPES).codes
+    customer_codes, customers = pd.MultiIndex.from_arrays([df['customerName'], df['customerId']]).factorize()
+
+    values = df[month_columns].apply(pd.to_numeric, errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+
+    # rows with an unknown measureType are ignored
+    known = measure_codes >= 0
+
+    waterfall = np.zeros((len(customers), len(CUSTOMER_WATERFALL_MEASURE_TYPES), len(month_columns)))
+    np.add.at(waterfall, (customer_codes[known], measure_codes[known]), values[known])
+
+    return waterfall
+
+
+def create_aggregate_store(cust_arr_waterfall_df):
+    """
+    Full rebuild of the aggregate store from the customer waterfall df
+
+    Parameters:
+    - cust_arr_waterfall_df (pd.DataFrame): customerName, customerId, measureType and one column per month
+
+    Returns:
+    - dict: aggregate store - month_columns, totals (measures x months), customer_counts (3 x months)
+    """
+
+    month_columns = [col for col in cust_arr_waterfall_df.columns if col not in ('customerName', 'customerId', 'measureType')]
+
+    return create_aggregate_store_from_array(waterfall_df_to_array(cust_arr_waterfall_df, month_columns), month_columns)
+
+
+def create_aggregate_store_from_array(waterfall, month_columns):
+    """
+    Full rebuild of the aggregate store from a customers x measures x months waterfall array
+    """
+
+    totals, counts = calculate_waterfall_aggregates(waterfall)
+
+    return {
+        'month_columns': list(month_columns),
+        'totals': totals,
+        'customer_counts': counts,
+    }
+
+
+def update_aggregate_store(store, old_waterfall, new_waterfall):
+    """
+    Applies a change of customer waterfalls to the aggregate store - subtracts the old and adds the new waterfall
+
+    Parameters:
+    - store (dict): aggregate store (see create_aggregate_store)
+    - old_waterfall (np.ndarray or pd.DataFrame): waterfall of the changed customers before the change (None for added customers)
+    - new_waterfall (np.ndarray or pd.DataFrame): waterfall of the changed customers after the change (None for removed customers)
+
+    Returns:
+    - dict: updated aggregate store
+    """
+
+    month_columns = store['month_columns']
+
+    totals = store['totals'].copy()
+    counts = store['customer_counts'].copy()
+
+    for waterfall, sign in [(old_waterfall, -1), (new_waterfall, 1)]:
+        if waterfall is None:
+            continue
+        if isinstance(waterfall, pd.DataFrame):
+            waterfall = waterfall_df_to_array(waterfall, month_columns)
+        change_totals, change_counts = calculate_waterfall_aggregates(waterfall)
+        totals += sign * change_totals
+        counts += sign * change_counts
+
+    return {
+        'month_columns': month_columns,
+        'totals': totals,
+        'customer_counts': counts,
+    }
+
+
+def aggregate_store_to_metrics_df(store):
+    """
+    Creates the aggregated metrics df (metrics_df) from the aggregate store
+    """
+
+    return create_metrics_from_totals(store['totals'], store['month_columns'])
+
+
+def aggregate_store_to_logo_metrics_df(store):
+    """
+    Creates the logo waterfall df (logo_metrics_df) from the aggregate store
+    """
+
+    revenue_counts, new_business_counts, churn_counts = store['customer_counts']
+
+    return create_logo_metrics_frame(revenue_counts, new_business_counts, churn_counts, store['month_columns'])
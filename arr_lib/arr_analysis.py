@@ -1,16 +1,18 @@
+import numpy as np
 import pandas as pd
 from datetime import datetime
-import streamlit as st
-from arr_lib.setup import ARR_DISPLAY_COLUMN_MAP
+from arr_lib.setup import ARR_DISPLAY_COLUMN_MAP, AGG_METRICS_DISPLAY_FORMATS
+from arr_lib.setup import CUSTOMER_WATERFALL_MEASURE_TYPES, LOGO_WATERFALL_MEASURE_TYPES
+from arr_lib.setup import RETENTION_HORIZONS
 from arr_lib.styling import DF_HIGHLIGHT_TEXT_COLOR, DF_HIGHLIGHT_TEXT_WEIGHT
 from arr_lib.styling import DF_NEGATIVE_HIGHLIGHT_BG_COLOR, DF_POSITIVE_HIGHLIGHT_BG_COLOR
 from arr_lib.styling import DF_HIGHLIGHT_BG_COLOR_CURR_PERIOD, DF_HIGHLIGHT_BG_COLOR_PREV_PERIOD
 from arr_lib.styling import DF_LIGHT_BLUE_BG, DF_LIGHTER_BLUE_BG
+from arr_lib.arr_reconciliation import create_reconciliation
 
 
 # implemented with presetting the number of months
 
-@st.cache_data
 def create_monthly_buckets(input_df):
     """
         Process uploaded contract data 
@@ -25,42 +27,30 @@ def create_monthly_buckets(input_df):
     - pd.DataFrame: Processed DataFrame one row for each month - for the customer and contract 
     """
 
-    df = input_df.copy()
-
-    # Calculate contractMonths by rounding contractLength/30 - added 0.01 for boundary conditions
-    df['contractMonths'] = ((df['contractDuration'] / 30) + 0.01).round()
-
+    # shallow copy - the contractId column is replaced below, the input frame is not modified
+    df = input_df.copy(deep=False)
 
     # handle missing contactId situations - defaults it to customerId + index of the row (unique)
-    df['contractId'].fillna(df['customerId'].astype(str) + df.index.astype(str), inplace=True)
+    df['contractId'] = df['contractId'].fillna(df['customerId'].astype(str) + df.index.astype(str))
 
     # handle repeating contractId situation - concatenate contractId with index
     df['contractId'] = df['contractId'].astype(str) + df.index.astype(str)
 
-    # Repeat rows based on contractMonths
-    second_df = df.loc[df.index.repeat(df['contractMonths'].astype(int))].reset_index(drop=True)
-
-    # handle missing contactId situations - defaults it to customerId + index of the row (unique)
-    # second_df['contractId'].fillna(second_df['customerId'].astype(str) + second_df.index.astype(str), inplace=True)
+    # start month, number of months and monthly revenue - calculated once per contract
+    start_ordinals, contract_months, contract_revenue = calculate_contract_month_ranges(df)
 
-    # Add a column called monthIndex and increment it by 1 for each customerId and contractId
-    second_df['monthIndex'] = second_df.groupby(['customerId', 'contractId']).cumcount() + 1
+    # Repeat rows based on contractMonths - positional repeat, so it works with any index
+    row_positions = np.repeat(np.arange(len(df)), contract_months)
+    second_df = df[['customerId', 'customerName', 'contractId']].iloc[row_positions].reset_index(drop=True)
 
-    # Convert monthIndex to integers and calculate the 'month' column
-    second_df['monthIndex'] = second_df['monthIndex'].astype(int)
+    # monthIndex (0 based) is the position of the row within its contract
+    month_offsets = np.arange(len(row_positions)) - np.repeat(np.cumsum(contract_months) - contract_months, contract_months)
 
-    # increments the month fields based on monthIndex
-    second_df['month'] = second_df.apply(lambda row: row['contractStartDate'] + pd.DateOffset(months=row['monthIndex'] - 1), axis=1)
-
-    # Reformat 'month' to YYYY-MM format (drop the day portion)
-    second_df['month'] = second_df['month'].dt.strftime('%Y-%m')
+    # increments the month based on monthIndex and formats each distinct month only once (YYYY-MM format)
+    second_df['month'] = format_month_ordinals(start_ordinals[row_positions] + month_offsets)
 
     # Add a column called monthlyRevenue
-    second_df['monthlyRevenue'] = second_df['totalContractValue'] / second_df['contractMonths']
-
-    # Fill NaN values with 0 for 'monthlyRevenue'
-    second_df['monthlyRevenue'] = second_df['monthlyRevenue'].round(2).fillna(0)
-
+    second_df['monthlyRevenue'] = contract_revenue[row_positions]
 
     # filter only the following columns - customerId, contractId, month, monthlyRevenue 
     second_df = second_df[['customerId', 'customerName', 'contractId', 'month', 'monthlyRevenue']]
@@ -68,7 +58,66 @@ def create_monthly_buckets(input_df):
     return second_df
 
 
-@st.cache_data
+def calculate_contract_month_ranges(df):
+    """
+    Calculates the month range and the monthly revenue for each contract - this is the contract level input for the 
+    month expansion (create_monthly_buckets) and for the direct revenue matrix (create_revenue_matrix_from_contracts)
+
+    Parameters:
+    - df (pd.DataFrame): validated contract data with contractStartDate, contractDuration and totalContractValue 
+
+    Returns:
+    - np.ndarray: month ordinal of the first month of each contract 
+    - np.ndarray: number of months of each contract 
+    - np.ndarray: monthly revenue of each contract 
+    """
+
+    # Calculate contractMonths by rounding contractLength/30 - added 0.01 for boundary conditions
+    contract_months = ((df['contractDuration'] / 30) + 0.01).round()
+
+    # monthly revenue is calculated once per contract and then repeated for every month
+    contract_revenue = (df['totalContractValue'] / contract_months).round(2).fillna(0).to_numpy(dtype=np.float64)
+
+    # month ordinal (year * 12 + month - 1) of the contract start date
+    start_ordinals = to_month_ordinals(df['contractStartDate'])
+
+    return start_ordinals, contract_months.astype(int).to_numpy(), contract_revenue
+
+
+def to_month_ordinals(dates):
+    """
+    Converts a datetime series into integer month ordinals (year * 12 + month - 1), so that month arithmetic
+    becomes integer arithmetic 
+
+    Parameters:
+    - dates (pd.Series): datetime values
+
+    Returns:
+    - np.ndarray: int64 month ordinal for each date 
+    """
+    dates = pd.to_datetime(dates)
+
+    return (dates.dt.year.to_numpy(dtype=np.int64) * 12) + dates.dt.month.to_numpy(dtype=np.int64) - 1
+
+
+def format_month_ordinals(ordinals):
+    """
+    Formats integer month ordinals as YYYY-MM strings - each distinct month is formatted only once
+
+    Parameters:
+    - ordinals (np.ndarray): int month ordinals (year * 12 + month - 1)
+
+    Returns:
+    - np.ndarray: YYYY-MM string for each ordinal 
+    """
+    ordinals = np.asarray(ordinals, dtype=np.int64)
+
+    unique_ordinals, inverse = np.unique(ordinals, return_inverse=True)
+    labels = np.array([f'{o // 12:04d}-{o % 12 + 1:02d}' for o in unique_ordinals], dtype=object)
+
+    return labels[inverse.reshape(-1)]
+
+
 def create_arr_metrics(input_df):
     """
     Process df containing monthly rr values for each customer and generates aggregated value.
@@ -81,7 +130,7 @@ def create_arr_metrics(input_df):
     - pd.DataFrame: Dataframe with transposed data for each customer - for each month becoming a column, also gives customer level aggregated revenue
     - pd.DataFrame: Gives the over all metrics for each month, agrregatd for all customers - MRR, ARR, newBusiness, upSell, downSell, churn 
     """
-    df = input_df.copy()
+    df = input_df
 
     transposed_df = create_transposed_monthly_revenue_matrix(df)
     cust_arr_waterfall_df, customer_arr_df, logo_waterfall_df, metrics_df = create_customer_and_aggregated_metrics(transposed_df)
@@ -89,7 +138,29 @@ def create_arr_metrics(input_df):
     return cust_arr_waterfall_df, customer_arr_df, logo_waterfall_df, metrics_df
 
 
-@st.cache_data
+def create_arr_metrics_from_contracts(input_df, backend='dense'):
+    """
+    Same as create_arr_metrics, but starts from the contract data and builds the revenue matrix directly 
+    (create_revenue_matrix_from_contracts) - the one row per month table is never created
+
+    Parameters:
+    - df (pd.DataFrame): validated contract data DataFrame
+    - backend (str): 'dense' - numpy customer x month grids, 'sparse' - scipy CSR grids (arr_sparse), one of METRICS_BACKENDS
+
+    Returns: 4 data frames - same as create_arr_metrics
+    """
+
+    if backend == 'sparse':
+        # arr_sparse builds on this module - imported when the sparse backend is selected
+        from arr_lib.arr_sparse import create_sparse_arr_metrics_from_contracts
+        return create_sparse_arr_metrics_from_contracts(input_df)
+
+    transposed_df = create_revenue_matrix_from_contracts(input_df)
+    cust_arr_waterfall_df, customer_arr_df, logo_waterfall_df, metrics_df = create_customer_and_aggregated_metrics(transposed_df)
+
+    return cust_arr_waterfall_df, customer_arr_df, logo_waterfall_df, metrics_df
+
+
 def create_transposed_monthly_revenue_matrix (input_df): 
     """
     Process df containing monthly rr values for each customer and creates a transposed dataframe
@@ -101,12 +172,11 @@ def create_transposed_monthly_revenue_matrix (input_df):
     - pd.DataFrame: Dataframe with transposed data - for each month becoming a column, also gives customer level aggregated revenue
     """
 
-    df = input_df.copy()
     # Print the original dataframe
     print("Original DataFrame:")
 
     # select only the required columns 
-    df = df.loc[:, ['customerName', 'customerId', 'month', 'monthlyRevenue']]
+    df = input_df.loc[:, ['customerName', 'customerId', 'month', 'monthlyRevenue']]
 
 
     # Transpose the melted dataframe
@@ -120,7 +190,80 @@ def create_transposed_monthly_revenue_matrix (input_df):
     return transposed_df
 
 
-@st.cache_data
+def create_revenue_matrix_from_contracts(input_df):
+    """
+    Creates the customer x month revenue matrix directly from the contract data, without creating the one row per month 
+    table (create_monthly_buckets + create_transposed_monthly_revenue_matrix). 
+    Each contract adds its monthly revenue at the start month and subtracts it after the end month in a difference array,
+    a cumulative sum over the months then gives the revenue for each customer and month 
+
+    Parameters:
+    - df (pd.DataFrame): validated contract data DataFrame
+
+    Returns:
+    - pd.DataFrame: Dataframe with transposed data - for each month becoming a column (same as create_transposed_monthly_revenue_matrix)
+    """
+
+    df = input_df
+
+    start_ordinals, contract_months, contract_revenue = calculate_contract_month_ranges(df)
+
+    # contracts shorter than a month do not create any monthly revenue 
+    valid = (contract_months > 0) & df['customerName'].notna().to_numpy() & df['customerId'].notna().to_numpy()
+    start_ordinals = start_ordinals[valid]
+    end_ordinals = start_ordinals + contract_months[valid]
+    
+    # amounts are accumulated in cents - the integer cumulative sum does not leave rounding residue in the churned months 
+    contract_cents = np.rint(contract_revenue[valid] * 100)
+
+    # customers are sorted by customerName, customerId (same as pivot_table)
+    customer_keys = pd.MultiIndex.from_arrays([df['customerName'], df['customerId']])[valid]
+    customer_codes, customers = customer_keys.factorize(sort=True)
+
+    transposed_df = create_revenue_matrix_from_month_ranges(customer_codes, customers, start_ordinals, end_ordinals, contract_cents)
+
+    return transposed_df
+
+
+def create_revenue_matrix_from_month_ranges(customer_codes, customers, start_ordinals, end_ordinals, contract_cents):
+    """
+    Builds the transposed customer x month revenue matrix from contract level month ranges - the contract months are 
+    never expanded, each contract adds its monthly value at the start month and removes it after the end month (difference array)
+
+    Parameters:
+    - customer_codes (np.ndarray): row position of the customer of each contract in customers 
+    - customers (pd.MultiIndex): customerName, customerId for each row of the matrix 
+    - start_ordinals (np.ndarray): month ordinal of the first month of each contract 
+    - end_ordinals (np.ndarray): month ordinal after the last month of each contract 
+    - contract_cents (np.ndarray): monthly revenue of each contract in cents 
+
+    Returns:
+    - pd.DataFrame: customerName, customerId and one column per covered month (YYYY-MM)
+    """
+
+    first_month = start_ordinals.min() if len(start_ordinals) else 0
+    num_months = (end_ordinals.max() - first_month) if len(end_ordinals) else 0
+    width = num_months + 1
+
+    # difference array - add at the start month, subtract after the end month
+    start_positions = customer_codes * width + (start_ordinals - first_month)
+    end_positions = customer_codes * width + (end_ordinals - first_month)
+    diff_array = np.bincount(start_positions, weights=contract_cents, minlength=len(customers) * width)
+    diff_array -= np.bincount(end_positions, weights=contract_cents, minlength=len(customers) * width)
+
+    revenue_matrix = diff_array.reshape(len(customers), width).cumsum(axis=1)[:, :num_months] / 100
+
+    # only months covered by at least one contract become columns (same as pivot_table)
+    coverage = np.bincount(start_ordinals - first_month, minlength=width) - np.bincount(end_ordinals - first_month, minlength=width)
+    covered_months = np.flatnonzero(coverage.cumsum()[:num_months] > 0)
+
+    transposed_df = pd.DataFrame(revenue_matrix[:, covered_months], columns=format_month_ordinals(first_month + covered_months))
+    transposed_df.insert(0, 'customerName', customers.get_level_values(0))
+    transposed_df.insert(1, 'customerId', customers.get_level_values(1))
+
+    return transposed_df
+
+
 def create_customer_and_aggregated_metrics(input_df):
     """
     Process df containing transposed monthly metrics for each customer with aggregated monthly revenue, and calculates the following metrics
@@ -138,95 +281,156 @@ def create_customer_and_aggregated_metrics(input_df):
     - pd.DataFrame: Gives aggregated metrics  - MRR, ARR, newBusiness, upSell, downSell, churn 
     """
 
-    df = input_df.copy()
-    df.insert(2, 'measureType', 'monthlyRevenue')
+    df = input_df
 
-    # Identify 'newBusiness' rows based on the condition
-    new_business_mask = (df.shift(axis=1, fill_value=0) == 0) & (df != 0)
+    # assumes customerName and customerId columns, all the other columns are months 
+    month_columns = [col for col in df.columns if col not in ('customerName', 'customerId', 'measureType')]
 
-    # Create a new DataFrame with 'newBusiness' rows
-    new_business_df = df[new_business_mask].copy()
-    new_business_df['measureType'] = 'newBusiness'
+    # customers are processed in customerName, customerId order 
+    df = df.sort_values(['customerName', 'customerId'], kind='stable')
 
-    # Fill NaN values with 0
-    new_business_df = new_business_df.fillna(0)
+    # revenue grid - customers x months 
+    revenue = df[month_columns].apply(pd.to_numeric, errors='coerce').fillna(0).to_numpy(dtype=np.float64)
 
-    # Retrieve the 'customerId' values for 'upSell' rows
-    new_business_df['customerId'] = df.loc[new_business_mask.index, 'customerId'].values
-    # Retrieve the 'customerName' values for 'upSell' rows
-    new_business_df['customerName'] = df.loc[new_business_mask.index, 'customerName'].values
+    # customers x measures x months - monthlyRevenue, newBusiness, upSell, downSell, churn 
+    waterfall = calculate_customer_waterfall(revenue)
 
+    # dataframe with all measuretypes for a customer 
+    df_cust_arr_waterfall = create_customer_waterfall_frame(waterfall, df['customerName'].to_numpy(), df['customerId'].to_numpy(), month_columns)
 
+    # select only the monthlyRevenue for csutomer level details 
+    df_rr = pd.DataFrame(revenue, columns=month_columns)
+    df_rr.insert(0, 'customerName', df['customerName'].to_numpy())
+    df_rr.insert(1, 'customerId', df['customerId'].to_numpy())
 
-    # Identify 'upSell' rows based on the condition for all month columns
-    df_numeric = df.iloc[:, 2:].apply(pd.to_numeric, errors='coerce')  # Convert columns to numeric
-    up_sell_mask = (df_numeric.diff(axis=1) > 0) & (df_numeric.shift(axis=1) != 0)
-    up_sell_df = (df_numeric[up_sell_mask] - df_numeric.shift(axis=1))[up_sell_mask].copy()
-    up_sell_df['measureType'] = 'upSell'
+    # sort mothly_revenue matrix, but first month of sales
+    df_rr = sort_by_first_month_of_sales(df_rr)
 
-    # Mask to make 'upSell' rows zero when the previous month's 'monthlyRevenue' is 0 for all month columns
-    zero_month_mask = (df_numeric.iloc[:, :-1] == 0)
-    up_sell_df[zero_month_mask] = 0
+    # create aggregated metrics from customer level metrics - monthly totals of each measure 
+    df_agg = create_metrics_from_totals(waterfall.sum(axis=0), month_columns)
 
-    # Retrieve the 'customerId' values for 'upSell' rows
-    up_sell_df['customerId'] = df.loc[up_sell_mask.index, 'customerId'].values
-    # Retrieve the 'customerName' values for 'upSell' rows
-    up_sell_df['customerName'] = df.loc[up_sell_mask.index, 'customerName'].values
+    # create logo waterfall - customer counts from the waterfall array 
+    revenue_counts, new_business_counts, churn_counts = count_waterfall_customers(waterfall)
+    df_logo_waterfall = create_logo_metrics_frame(revenue_counts, new_business_counts, churn_counts, month_columns)
 
-    # Identify 'downSell' rows based on the condition for all month columns
-    down_sell_mask = (df_numeric.diff(axis=1) < 0) & (df_numeric.shift(axis=1) != 0) & (df_numeric !=0 )
-    down_sell_df = (df_numeric[down_sell_mask] - df_numeric.shift(axis=1))[down_sell_mask].copy()
-    down_sell_df['measureType'] = 'downSell'
+    # print(df_logo_waterfall)
 
-    # Retrieve the 'customerId' values for 'downSell' rows
-    down_sell_df['customerId'] = df.loc[down_sell_mask.index, 'customerId'].values
-    # Retrieve the 'customerName' values for 'downSell' rows
-    down_sell_df['customerName'] = df.loc[down_sell_mask.index, 'customerName'].values
+    return df_cust_arr_waterfall, df_rr, df_logo_waterfall, df_agg
 
-    # Calculate 'churn' rows based on the specified condition
-    churn_mask = (df_numeric.diff(axis=1) < 0) & (df_numeric == 0)
-    churn_df = (df_numeric[churn_mask] - df_numeric.shift(axis=1))[churn_mask].copy()
-    churn_df['measureType'] = 'churn'
 
+def calculate_customer_waterfall(revenue):
+    """
+    Calculates the customer level ARR waterfall from the customer x month revenue grid in one vectorized pass 
+        newBusiness : revenue in a month where the previous month has no revenue (not for the first month)
+        upSell : increase over a non-zero previous month
+        downSell : decrease over a non-zero previous month, to a non-zero value
+        churn : previous month revenue lost in a month without revenue
 
-    # Retrieve the 'customerId' values for 'churn' rows
-    churn_df['customerId'] = df.loc[churn_mask.index, 'customerId'].values
-    # Retrieve the 'customerName' values for 'churn' rows
-    churn_df['customerName'] = df.loc[churn_mask.index, 'customerName'].values
+    Parameters:
+    - revenue (np.ndarray): customers x months revenue grid
 
+    Returns:
+    - np.ndarray: customers x measures x months - measures in CUSTOMER_WATERFALL_MEASURE_TYPES order
+    """
 
-    # Append 'upSell', 'downSell', and 'churn' rows to the original DataFrame
-    df = pd.concat([df, up_sell_df, down_sell_df, churn_df], ignore_index=True)
+    revenue = np.asarray(revenue, dtype=np.float64)
+    num_customers, num_months = revenue.shape
 
-    # Append 'newBusiness' rows to the original DataFrame
-    df = pd.concat([df, new_business_df], ignore_index=True)
+    waterfall = np.zeros((num_customers, len(CUSTOMER_WATERFALL_MEASURE_TYPES), num_months))
+    waterfall[:, 0, :] = revenue
 
-    # Fill NaN values with 0
-    df = df.fillna(0)
+    # current month, previous month and the change - from the second month onwards
+    curr = revenue[:, 1:]
+    prev = revenue[:, :-1]
+    delta = curr - prev
 
-    # Define the sorting order for 'measureType'
-    sorting_order = ['monthlyRevenue', 'newBusiness', 'upSell', 'downSell', 'churn']
+    np.copyto(waterfall[:, 1, 1:], curr, where=(prev == 0) & (curr != 0))
+    np.copyto(waterfall[:, 2, 1:], delta, where=(delta > 0) & (prev != 0) & (curr != 0))
+    np.copyto(waterfall[:, 3, 1:], delta, where=(delta < 0) & (prev != 0) & (curr != 0))
+    np.copyto(waterfall[:, 4, 1:], delta, where=(delta < 0) & (curr == 0))
 
-    # Sort the DataFrame based on 'measureType' using the defined order and 'customerId'
-    df['measureType'] = pd.Categorical(df['measureType'], categories=sorting_order, ordered=True)
-    df = df.sort_values(['customerName','customerId', 'measureType'])
+    return waterfall
 
 
-    # dataframe with all measuretypes for a customer 
-    df_cust_arr_waterfall = df
+def create_customer_waterfall_frame(waterfall, customer_names, customer_ids, month_columns):
+    """
+    Creates the customer waterfall df (cust_arr_waterfall_df) from the customers x measures x months array 
 
+    Parameters:
+    - waterfall (np.ndarray): customers x measures x months (see calculate_customer_waterfall)
+    - customer_names (np.ndarray): customerName for each customer 
+    - customer_ids (np.ndarray): customerId for each customer 
+    - month_columns (list): month column names 
 
-    # select only the monthlyRevenue for csutomer level details 
-    df_rr = df[df['measureType'] == 'monthlyRevenue']
+    Returns:
+    - pd.DataFrame: customerName, customerId, measureType and one column per month - measures of a customer are adjacent rows
+    """
 
-    # remove the measureType column from customer level arr details 
-    del df_rr['measureType']
+    num_measures = len(CUSTOMER_WATERFALL_MEASURE_TYPES)
 
-    # sort mothly_revenue matrix, but first month of sales
-    df_rr = sort_by_first_month_of_sales(df_rr)
+    df = pd.DataFrame(waterfall.reshape(-1, len(month_columns)), columns=list(month_columns))
+    df.insert(0, 'customerName', np.repeat(customer_names, num_measures))
+    df.insert(1, 'customerId', np.repeat(customer_ids, num_measures))
+    df.insert(2, 'measureType', pd.Categorical(np.tile(CUSTOMER_WATERFALL_MEASURE_TYPES, len(customer_names)), categories=CUSTOMER_WATERFALL_MEASURE_TYPES, ordered=True))
+
+    return df
 
-    # create aggregated metrics from customer level metrics 
-    df_agg = create_aggregated_arr_metrics(df)
+
+def create_aggregated_arr_metrics(input_df):
+    """
+    Process df containing transposed monthly metrics for each customer, aggregates the values for all customers and returns the aggregated df
+
+    Parameters:
+    - df (pd.DataFrame): transposed monthly metrics for each customerlevel with revenue, new buessiness, upsell, downsell and churn
+
+    Returns:
+    - pd.DataFrame: Gives the over all metrics for each month - MRR, ARR, newBusiness, upSell, downSell, churn 
+    """
+
+    df = input_df
+    # Group by 'customerId', 'CustomerName' and aggregate the sum across all measureTypes for each month
+    aggregated_df = df.groupby(['measureType'], observed=True).agg({col: 'sum' for col in df.columns[3:]}).reset_index()
+
+    return aggregated_df
+
+
+def create_aggregated_metrics_frame(totals, month_columns):
+    """
+    Creates the aggregated metrics df (same structure as create_aggregated_arr_metrics) from monthly totals that were
+    calculated outside of pandas 
+
+    Parameters:
+    - totals (np.ndarray): 2-D array of monthly totals - one row for each measure in CUSTOMER_WATERFALL_MEASURE_TYPES order
+    - month_columns (list): month column names 
+
+    Returns:
+    - pd.DataFrame: Gives the over all metrics for each month - monthlyRevenue, newBusiness, upSell, downSell, churn 
+    """
+
+    aggregated_df = pd.DataFrame(np.asarray(totals, dtype=np.float64), columns=list(month_columns))
+    aggregated_df.insert(0, 'measureType', pd.Categorical(CUSTOMER_WATERFALL_MEASURE_TYPES, categories=CUSTOMER_WATERFALL_MEASURE_TYPES, ordered=True))
+
+    return aggregated_df
+
+
+def create_metrics_from_totals(totals, month_columns):
+    """
+    Creates the aggregated metrics df (metrics_df) from the monthly totals of each measure 
+        1. aggregated df 
+        2. waterfall structure (opening period revenue)
+        3. annualized 
+        4. retention metrics 
+
+    Parameters:
+    - totals (np.ndarray): 2-D array of monthly totals - one row for each measure in CUSTOMER_WATERFALL_MEASURE_TYPES order
+    - month_columns (list): month column names 
+
+    Returns:
+    - pd.DataFrame: aggregated metrics - MRR, ARR, newBusiness, upSell, downSell, churn and retention metrics 
+    """
+
+    # create aggregated metrics from the monthly totals 
+    df_agg = create_aggregated_metrics_frame(totals, month_columns)
 
     # convert the aggregated df to a waterfall structure
     df_agg = create_waterfall(df_agg)
@@ -237,179 +441,209 @@ def create_customer_and_aggregated_metrics(input_df):
     # create additional metrics - like gross renewal rate, net renewal rate etc
     df_agg = calculate_retention_metrics(df_agg)
 
-    # create logo waterfall 
-    df_logo_waterfall = calculate_logo_count_waterfall(df)
-
-    # print(df_logo_waterfall)
-
-    return df_cust_arr_waterfall, df_rr, df_logo_waterfall, df_agg
+    return df_agg
 
 
-@st.cache_data
-def create_aggregated_arr_metrics(input_df):
+def create_logo_metrics_frame(revenue_counts, new_business_counts, churn_counts, month_columns):
     """
-    Process df containing transposed monthly metrics for each customer, aggregates the values for all customers and returns the aggregated df
+    Creates the logo waterfall df (same structure as calculate_logo_count_waterfall) from monthly customer counts 
 
     Parameters:
-    - df (pd.DataFrame): transposed monthly metrics for each customerlevel with revenue, new buessiness, upsell, downsell and churn
+    - revenue_counts (np.ndarray): number of customers with revenue in each month 
+    - new_business_counts (np.ndarray): number of new customers in each month 
+    - churn_counts (np.ndarray): number of churned customers in each month 
+    - month_columns (list): month column names 
 
     Returns:
-    - pd.DataFrame: Gives the over all metrics for each month - MRR, ARR, newBusiness, upSell, downSell, churn 
+    - pd.DataFrame: logo waterfall - lastMonthRevenueLogo, newBusinessLogo, churnLogo, monthlyRevenueLogo
     """
 
-    df = input_df.copy()
-    # Group by 'customerId', 'CustomerName' and aggregate the sum across all measureTypes for each month
-    aggregated_df = df.groupby(['measureType'], observed=True).agg({col: 'sum' for col in df.columns[3:]}).reset_index()
+    revenue_counts = np.asarray(revenue_counts, dtype=np.int64)
+    new_business_counts = np.asarray(new_business_counts, dtype=np.int64)
+    churn_counts = -np.asarray(churn_counts, dtype=np.int64)
+
+    # months without any customer activity are not part of the logo waterfall 
+    active_months = (revenue_counts != 0) | (new_business_counts != 0) | (churn_counts != 0)
+    month_columns = np.asarray(month_columns, dtype=object)[active_months]
+    revenue_counts = revenue_counts[active_months]
+
+    # opening count is the closing count of the previous month - the first month opens with its own closing count
+    last_month_counts = np.concatenate([revenue_counts[:1], revenue_counts[:-1]])
+
+    counts = np.vstack([last_month_counts, new_business_counts[active_months], churn_counts[active_months], revenue_counts])
+
+    logo_wf_df = pd.DataFrame(counts, columns=list(month_columns))
+    logo_wf_df.insert(0, 'measureType', pd.Categorical(LOGO_WATERFALL_MEASURE_TYPES, categories=LOGO_WATERFALL_MEASURE_TYPES, ordered=True))
+
+    return logo_wf_df
 
-    return aggregated_df
 
-@st.cache_data
-def calculate_retention_metrics (input_df):
+def calculate_retention_metrics (input_df, horizons=tuple(RETENTION_HORIZONS)):
     """
     calculates the following metrics 
         - Gross Renewal Rate : measured as 1 - { (cummulative sum of last 12 months churn and downsell ) / revenue of 12 month prior } 
         - Net Retention Rate : measured as 1 - { (cummulative sum of last 12 months upsell, churn and downsell ) / revenue of 12 month prior  } 
         - Yearly ARR Growth: measured as   ( current period reenue / revenue of 12 month prior) - 1
+
+    The same metrics are added for each of the horizons (in months) as grossRetentionRate<n>M, netRetentionRate<n>M 
+    and revenueGrowth<n>M - all the windows are calculated from one set of prefix sums 
+
+    The measures are kept as rows of a numpy array (measures x months) - no transposes and no row wise apply 
     """
-    df = input_df.copy()
-    upSell_df = df[df['measureType']=='upSell']
-    downSell_df = df[df['measureType']=='downSell']
-    churn_df = df[df['measureType']=='churn']
-    monthlyRev_df = df[df['measureType']=='monthlyRevenue']
+    df = input_df
+
+    measure_types = df['measureType'].astype(str).tolist()
+    month_columns = [col for col in df.columns if col != 'measureType']
+    values = df[month_columns].to_numpy(dtype=np.float64)
+
+    measure_rows = {measure: values[i] for i, measure in enumerate(measure_types)}
+
+    # prefix sums of upSell, downSell and churn - shared by all the trailing windows 
+    prefix_sums = calculate_prefix_sums(np.vstack([measure_rows['upSell'], measure_rows['downSell'], measure_rows['churn']]))
 
     # caculate trailing yearly metrics 
     trailing_period = 12
 
-    trailing_upSell_df = calculate_trailing_metrics(upSell_df, trailing_period, 'trailingUpSell')
-    trailing_downSell_df = calculate_trailing_metrics(downSell_df, trailing_period, 'trailingDownSell')
-    trailing_churn_df = calculate_trailing_metrics(churn_df, trailing_period, 'trailingChurn')
-    previous_period_revenue = calculate_previous_period_values(monthlyRev_df, trailing_period, 'monthlyRevenue', 'prevYearRevenue')
+    trailing_up_sell, trailing_down_sell, trailing_churn = calculate_trailing_sums_from_prefix(prefix_sums, trailing_period)
+    prev_year_revenue = calculate_previous_period_values(measure_rows['monthlyRevenue'], trailing_period)
 
-  
-    temp_metrics_df = pd.concat([df, trailing_upSell_df, trailing_downSell_df, trailing_churn_df, previous_period_revenue ], ignore_index=True)
+    gross_retention_rate = 1 + safe_divide(trailing_down_sell + trailing_churn, prev_year_revenue)
+    net_retention_rate = 1 + safe_divide(trailing_down_sell + trailing_churn + trailing_up_sell, prev_year_revenue)
+    yearly_revenue_growth = safe_divide(measure_rows['monthlyRevenue'], prev_year_revenue) - 1
 
-    # transpose the df - so that measureType become columns and months become rows
-    temp_metrics_df = temp_metrics_df.transpose()
-    temp_metrics_df.columns = temp_metrics_df.iloc[0]  # Set the first row as column headers
-    temp_metrics_df = temp_metrics_df[1:]  # Remove the first row
+    metrics = [values, trailing_up_sell, trailing_down_sell, trailing_churn, prev_year_revenue,
+               gross_retention_rate, net_retention_rate, yearly_revenue_growth]
+    metric_names = measure_types + ['trailingUpSell', 'trailingDownSell', 'trailingChurn', 'prevYearRevenue',
+                                    'grossRetentionRate', 'netRetentionRate', 'yearlyRevenueGrowth']
 
-    temp_metrics_df['grossRetentionRate'] = temp_metrics_df.apply(lambda row: (1 + (row['trailingDownSell'] + row['trailingChurn']) / row['prevYearRevenue']) if row['prevYearRevenue'] is not None else None, axis=1)
-    temp_metrics_df['netRetentionRate'] = temp_metrics_df.apply(lambda row: (1 + (row['trailingDownSell'] + row['trailingChurn'] + row['trailingUpSell']) / row['prevYearRevenue']) if row['prevYearRevenue'] is not None else None, axis=1)
-    temp_metrics_df['yearlyRevenueGrowth'] = temp_metrics_df.apply(lambda row: ( row['monthlyRevenue']  / row['prevYearRevenue'] - 1) if row['prevYearRevenue'] is not None else None, axis=1)
+    # multi-horizon retention metrics 
+    for horizon in horizons:
+        horizon_up_sell, horizon_down_sell, horizon_churn = calculate_trailing_sums_from_prefix(prefix_sums, horizon)
+        prev_period_revenue = calculate_previous_period_values(measure_rows['monthlyRevenue'], horizon)
 
-    # transpose back 
-    temp_metrics_df = temp_metrics_df.transpose()
-    temp_metrics_df.reset_index(inplace=True)
-    temp_metrics_df.rename(columns={'index': 'measureType'}, inplace=True)
+        metrics += [1 + safe_divide(horizon_down_sell + horizon_churn, prev_period_revenue),
+                    1 + safe_divide(horizon_down_sell + horizon_churn + horizon_up_sell, prev_period_revenue),
+                    safe_divide(measure_rows['monthlyRevenue'], prev_period_revenue) - 1]
+        metric_names += [f'grossRetentionRate{horizon}M', f'netRetentionRate{horizon}M', f'revenueGrowth{horizon}M']
 
-    return temp_metrics_df
+    metrics_df = pd.DataFrame(np.vstack(metrics), columns=month_columns)
+    metrics_df.insert(0, 'measureType', metric_names)
 
-@st.cache_data
-def calculate_trailing_metrics(input_df, trailing_period, newMeasureType): 
-    """
-    calculates the trailing cummulative sum of a metrics for a given period 
+    return metrics_df
+
+
+def calculate_trailing_sums(values, trailing_period): 
     """
-    df = input_df.copy()
-    df = df.transpose()
-    df.columns = df.iloc[0]  # Set the first row as column headers
-    df = df[1:]  # Remove the first row
+    calculates the trailing cummulative sum of a metrics for a given period - the first months use the available months
+    (same as rolling(window=trailing_period, min_periods=1).sum()), using a cumulative sum difference 
 
-    # return rolling cummulative period 
-    cum_column_df =  df.rolling(window=trailing_period, min_periods=1).sum()
-    
-    df[newMeasureType] = cum_column_df
-    df_transposed = df.transpose()
-    df_transposed.reset_index(inplace=True)
-    df_transposed.rename(columns={'index': 'measureType'}, inplace=True)
+    Parameters:
+    - values (np.ndarray): monthly values - months on the last axis 
+    - trailing_period (int): number of months in the trailing window 
+
+    Returns:
+    - np.ndarray: trailing sum for each month 
+    """
 
-    return df_transposed[df_transposed['measureType']==newMeasureType]
+    return calculate_trailing_sums_from_prefix(calculate_prefix_sums(values), trailing_period)
 
 
-@st.cache_data
-def calculate_previous_period_values(input_df, trailing_period, measureType, newMeasureType): 
+def calculate_prefix_sums(values): 
     """
-    calculates the trailing cummulative sum of a metrics for a given period 
+    returns the cumulative sums of the monthly values with a leading 0 - months on the last axis 
     """
-    df = input_df.copy()
-    df = df.transpose()
-    df.columns = df.iloc[0]  # Set the first row as column headers
-    df = df[1:]  # Remove the first row
+    values = np.asarray(values, dtype=np.float64)
 
-    # return rolling cummulative period 
-    prev_df =  df[measureType].shift(trailing_period)
+    prefix_sums = np.zeros(values.shape[:-1] + (values.shape[-1] + 1,))
+    np.cumsum(values, axis=-1, out=prefix_sums[..., 1:])
 
-    df[newMeasureType] = prev_df
-    df_transposed = df.transpose()
-    df_transposed.reset_index(inplace=True)
-    df_transposed.rename(columns={'index': 'measureType'}, inplace=True)
+    return prefix_sums
 
-    return  df_transposed[df_transposed['measureType']==newMeasureType]
 
+def calculate_trailing_sums_from_prefix(prefix_sums, trailing_period): 
+    """
+    calculates the trailing sum for a given period from the prefix sums (see calculate_prefix_sums) 
+    """
+    num_months = prefix_sums.shape[-1] - 1
 
-@st.cache_data
-def calculate_logo_count_waterfall (input_df):
+    # sum of the window = cumulative sum at the month - cumulative sum before the start of the window 
+    window_start = np.maximum(np.arange(num_months) + 1 - trailing_period, 0)
+
+    return prefix_sums[..., 1:] - prefix_sums[..., window_start]
+
+
+def calculate_previous_period_values(values, trailing_period): 
     """
-    calculates the logo waterfall metrics 
-        Beging Customer Count
-        New Customers Count
-        Churn Customers Count
-        Ending Customers Count 
+    returns the value of a metrics from trailing_period months before - NaN for the first trailing_period months 
+
+    Parameters:
+    - values (np.ndarray): monthly values - months on the last axis 
+    - trailing_period (int): number of months to look back 
+
+    Returns:
+    - np.ndarray: previous period value for each month 
     """
+    values = np.asarray(values, dtype=np.float64)
 
-    df = input_df.copy()
+    prev_values = np.full(values.shape, np.nan)
+    if trailing_period < values.shape[-1]:
+        prev_values[..., trailing_period:] = values[..., :values.shape[-1] - trailing_period]
 
-    # filter out upsell and downsell records 
+    return prev_values
 
-    # categorical value are cached and gives erratic behavior 
-    df['measureType'] = df['measureType'].astype(str)
-    filtered_df = df[df['measureType'].isin(['monthlyRevenue', 'newBusiness', 'churn'])]
 
-    # Melt the DataFrame to have a single 'value' column for months
-    melted_df = pd.melt(filtered_df, id_vars=['customerId', 'customerName', 'measureType'], var_name='month', value_name='value')
-    melted_df['value'].fillna(0, inplace=True)
+def safe_divide(numerator, denominator): 
+    """
+    element wise division - returns NaN where the denominator is 0 or NaN 
+    """
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
 
-    # Filter rows with non-zero values
-    non_zero_df = melted_df[melted_df['value'] != 0]
+    result = np.full(np.broadcast(numerator, denominator).shape, np.nan)
+    valid = (denominator != 0) & ~np.isnan(denominator)
+    np.divide(numerator, denominator, out=result, where=valid)
 
-    # Group by month, measureType, and count distinct customers
-    result_df = non_zero_df.groupby(['month', 'measureType'])['customerId'].count().reset_index()
+    return result
 
-    # turn values in the 'churn' row to negative - the column where the ount is stored is customerId - because of group by 
-    result_df.loc[result_df['measureType'] == 'churn', 'customerId'] *= -1
 
-    # Pivot the result to have months as columns and measuretype as index
-    final_df = result_df.pivot_table(index='measureType', columns='month', values='customerId', aggfunc='sum', fill_value=0)
+def calculate_logo_count_waterfall (input_df):
+    """
+    calculates the logo waterfall metrics 
+        Beging Customer Count
+        New Customers Count
+        Churn Customers Count
+        Ending Customers Count 
 
-    # Reset the index and remove the 'month' index name
-    final_df.reset_index(inplace=True)
-    final_df.columns.name = None
+    Customer counts are the column wise non-zero counts of the monthlyRevenue, newBusiness and churn rows - no melt / pivot 
+    """
 
-    # Change the values in the measureType columns to include a suffix  "Logo" without using a for loop
-    final_df['measureType'] = final_df['measureType'].apply(lambda x: f'{x}Logo')
+    df = input_df
 
-    # Copy the monthly revenue to waterfall final_df 
-    logo_wf_df = final_df[final_df['measureType']=='monthlyRevenueLogo'].copy()
+    month_columns = [col for col in df.columns if col not in ('customerName', 'customerId', 'measureType')]
 
-    # Shift the columns of the original final_df - by one colmn- and add it  to waterfall final_df - so that it now captures last month's revenue
-    logo_wf_df.iloc[0, 2:] = logo_wf_df.iloc[0, 1:-1].values
-    logo_wf_df['measureType'] = 'lastMonthRevenueLogo'
+    # categorical value are cached and gives erratic behavior 
+    measure_types = df['measureType'].astype(str).to_numpy()
+    values = df[month_columns].fillna(0).to_numpy()
 
+    revenue_counts, new_business_counts, churn_counts = [np.count_nonzero(values[measure_types == measure], axis=0) 
+                                                         for measure in ['monthlyRevenue', 'newBusiness', 'churn']]
 
-    # concat the lastMonthrevenue to the final_df
-    logo_wf_df = pd.concat([logo_wf_df, final_df], ignore_index=True)
+    return create_logo_metrics_frame(revenue_counts, new_business_counts, churn_counts, month_columns)
 
-    # Define the sorting order for 'measureType'
-    sorting_order = ['lastMonthRevenueLogo', 'newBusinessLogo',  'churnLogo', 'monthlyRevenueLogo']
 
-    # Sort the DataFrame based on 'measureType' using the defined order and 'customerId'
-    logo_wf_df['measureType'] = pd.Categorical(logo_wf_df['measureType'], categories=sorting_order, ordered=True)
-    logo_wf_df = logo_wf_df.sort_values(['measureType'])
+def count_waterfall_customers(waterfall):
+    """
+    Returns the monthly number of customers with revenue, new business and churn from a customers x measures x months 
+    waterfall array (see calculate_customer_waterfall) - counted one measure at a time 
 
+    Returns:
+    - np.ndarray: 3 x months - monthlyRevenue, newBusiness, churn counts 
+    """
 
-    return logo_wf_df
+    return np.vstack([np.count_nonzero(waterfall[:, CUSTOMER_WATERFALL_MEASURE_TYPES.index(measure), :], axis=0) 
+                      for measure in ['monthlyRevenue', 'newBusiness', 'churn']])
 
 
-@st.cache_data
 def create_waterfall(input_df): 
     """
     Process df containing monthly rr metrics, and add the previous months revenue as the opening balance and then reorders the rows as
@@ -426,10 +660,10 @@ def create_waterfall(input_df):
     Returns:
     - pd.DataFrame: Dataframe with waterfall details 
     """
-    df = input_df.copy()
+    df = input_df
 
-    # CCopy the monthly revenue to waterfall df 
-    waterfall_df = df[df['measureType']=='monthlyRevenue'].copy()
+    # CCopy the monthly revenue to waterfall df - the row selection is a new frame (copy on write), df is not modified
+    waterfall_df = df[df['measureType']=='monthlyRevenue']
 
     # Shift the columns of the original df - by one colmn- and add it  to waterfall df - so that it now captures last month's revenue
     waterfall_df.iloc[0, 2:] = df.iloc[0, 1:-1].values
@@ -452,7 +686,37 @@ def create_waterfall(input_df):
     return waterfall_df
 
 
-@st.cache_data
+def calculate_sales_month_range(values, month_columns):
+    """
+    Calculates the sort keys of sort_by_first_month_of_sales - rank of the first and of the last month with sales of each customer
+
+    Parameters:
+    - values (np.ndarray): customers x months revenue grid
+    - month_columns (list): month column names (YYYY-MM) of the grid
+
+    Returns:
+    - np.ndarray: rank of the first non-zero month (the first month if there are no sales)
+    - np.ndarray: rank of the last non-zero month (number of months if there are no sales - sorted last)
+    """
+
+    num_months = values.shape[1]
+
+    # rank of each month column - months are ordered by their YYYY-MM label
+    month_ranks = np.argsort(np.argsort(np.asarray(month_columns, dtype=str), kind='stable'), kind='stable')
+
+    non_zero_mask = values != 0
+
+    # first non-zero sales month - via argmax of the mask (the first month if there are no sales)
+    first_non_zero_month = month_ranks[non_zero_mask.argmax(axis=1)] if num_months else np.zeros(len(values), dtype=np.int64)
+
+    # last non-zero sales month - via argmax on the reversed mask, customers without sales are sorted last
+    has_sales = (non_zero_mask & ~pd.isna(values)).any(axis=1)
+    last_non_zero_month = month_ranks[num_months - 1 - non_zero_mask[:, ::-1].argmax(axis=1)] if num_months else np.zeros(len(values), dtype=np.int64)
+    last_non_zero_month = np.where(has_sales, last_non_zero_month, num_months)
+
+    return first_non_zero_month, last_non_zero_month
+
+
 def sort_by_first_month_of_sales(input_df): 
     """
     Sort the df containing monthwise customer revenue grid, in the order of first month of sale
@@ -464,29 +728,24 @@ def sort_by_first_month_of_sales(input_df):
     - pd.DataFrame: Same grid but sorted in first month of sales 
     """
 
-    df = input_df.copy()
+    df = input_df
 
     # assumes the first 2 columns are customerId, customerName
+    first_non_zero_month, last_non_zero_month = calculate_sales_month_range(df.iloc[:, 2:].to_numpy(), df.columns[2:])
 
-    # Create a new column 'first_non_zero_month' to store the name of the first non-zero sales month
-    df['first_non_zero_month'] = (df.iloc[:, 2:] != 0).idxmax(axis=1)
-
-    # Create a new column 'last_non_zero_month' to store the name of the last non-zero sales month
-    df['last_non_zero_month'] = (df.iloc[:, 2:-1].apply(lambda x: x.iloc[::-1].ne(0).idxmax() if x.any() else 'NaN', axis=1))
+    # customerId as sortable integer codes (missing ids last)
+    customer_codes, _ = pd.factorize(df['customerId'], sort=True)
+    customer_codes = np.where(customer_codes < 0, len(df), customer_codes)
 
     # 'first_non_zero_month', 'last_non_zero_month', and finally by 'customerId'
-    sorted_df = df.sort_values(by=[ 'first_non_zero_month', 'last_non_zero_month', 'customerId'])
+    sorted_df = df.take(np.lexsort((customer_codes, last_non_zero_month, first_non_zero_month)))
 
     # Reset the index if needed
-    sorted_df.reset_index(drop=True, inplace=True)
-
-    # Drop the 'first_non_zero_month' and 'last_non_zero_month' columns
-    sorted_df.drop(columns=['first_non_zero_month', 'last_non_zero_month'], inplace=True)
+    sorted_df = sorted_df.reset_index(drop=True)
 
     return sorted_df
 
 
-@st.cache_data
 def annualize_agg_arr(input_df): 
     """
     Converts MRR to ARR 
@@ -498,7 +757,8 @@ def annualize_agg_arr(input_df):
     - pd.DataFrame: Annualized waterfall df 
     """
 
-    df = input_df.copy()
+    # shallow copy - the numerical columns are replaced, the input frame is not modified
+    df = input_df.copy(deep=False)
 
     annualized_df = df
 
@@ -511,7 +771,6 @@ def annualize_agg_arr(input_df):
     return annualized_df
 
 
-@st.cache_data
 def rename_columns(input_df):
     """
     Converts the name of the ARR metrcis to meaningful display values
@@ -523,7 +782,7 @@ def rename_columns(input_df):
     - pd.DataFrame: Same dataframe but the values in the measureType column is transalted based on the ARR_DISPLAY_COLUMN_MAP dict
     """
     # Replace 'measureType' values based on the mapping dictionary
-    df = input_df.copy()
+    df = input_df.copy(deep=False)
 
     df['measureType'] = df['measureType'].replace(ARR_DISPLAY_COLUMN_MAP)
 
@@ -532,53 +791,58 @@ def rename_columns(input_df):
 
 def stylize_metrics_df(input_df, theme):
     """
-    Stylize the dataframe using pandas styler class and applymap 
+    Stylize the dataframe using pandas styler class - the displayed metrics (AGG_METRICS_DISPLAY_FORMATS) become the rows and 
+    the months the columns. The values stay numeric, the number formats are applied by the styler (format_metrics_styler)
     """
-    df = input_df.copy()
+    df = input_df
 
+    # measureType as index - only the displayed metrics, in display order
+    measure_types = list(AGG_METRICS_DISPLAY_FORMATS)
+    stylized_df = df.drop(columns=['measureType']).set_axis(df['measureType'].astype(str), axis=0).loc[measure_types]
 
-    # drop metrics with intermediate
-    # transpose the df - so that measureType become columns and months become rows
-    stylized_df = df.transpose()
-    stylized_df.columns = stylized_df.iloc[0]  # Set the first row as column headers
-    stylized_df = stylized_df[1:]  # Remove the first row
+    # replace the metrics name to redable values as per map 
+    stylized_df.index = pd.Index([ARR_DISPLAY_COLUMN_MAP.get(measure_type, measure_type) for measure_type in measure_types], name='measureType')
 
+    stylized_df=decorate_agg_metrics(stylized_df, theme)
 
-    # filter only the relevant columns
-    stylized_df = stylized_df[['lastMonthRevenue', 'newBusiness', 'upSell', 'downSell', 'churn', 'monthlyRevenue', 'grossRetentionRate', 'netRetentionRate', 'yearlyRevenueGrowth']]
+    stylized_df = format_metrics_styler(stylized_df, {ARR_DISPLAY_COLUMN_MAP.get(measure_type, measure_type): number_format 
+                                                      for measure_type, number_format in AGG_METRICS_DISPLAY_FORMATS.items()})
 
-    # these metrics are formatted with 0 precision 
-    stylized_df['lastMonthRevenue'] = stylized_df['lastMonthRevenue'].apply(lambda x: '{:,.0f}'.format(x) if not pd.isnull(x)  else None)
-    stylized_df['newBusiness'] = stylized_df['newBusiness'].apply(lambda x: '{:,.0f}'.format(x) if not pd.isnull(x)  else None)
-    stylized_df['upSell'] = stylized_df['upSell'].apply(lambda x: '{:,.0f}'.format(x) if not pd.isnull(x)  else None)
-    stylized_df['downSell'] = stylized_df['downSell'].apply(lambda x: '{:,.0f}'.format(x) if not pd.isnull(x)  else None)
-    stylized_df['churn'] = stylized_df['churn'].apply(lambda x: '{:,.0f}'.format(x) if not pd.isnull(x)  else None)
-    stylized_df['monthlyRevenue'] = stylized_df['monthlyRevenue'].apply(lambda x: '{:,.0f}'.format(x) if not pd.isnull(x)  else None)
+    return stylized_df
 
-    # these metrics are formatted as % with 2 digit precision 
-    stylized_df['grossRetentionRate'] = stylized_df['grossRetentionRate'].apply(lambda x: '{:,.2%}'.format(x) if not pd.isnull(x)  else None)
-    stylized_df['netRetentionRate'] = stylized_df['netRetentionRate'].apply(lambda x: '{:,.2%}'.format(x) if not pd.isnull(x)  else None)
-    stylized_df['yearlyRevenueGrowth'] = stylized_df['yearlyRevenueGrowth'].apply(lambda x: '{:,.2%}'.format(x) if not pd.isnull(x)  else None)
 
-    # transpose back 
-    stylized_df = stylized_df.transpose()
-    stylized_df.reset_index(inplace=True)
-    stylized_df.rename(columns={'index': 'measureType'}, inplace=True)
+def format_metrics_styler(styler, row_formats, na_rep='', separator_rep='--------'):
+    """
+    Applies number formats by row to a styler - one formatter for all the rows with the same format, the values of the 
+    underlying df stay numeric (the formats are only used for display)
 
-    # replace the metrics name to redable values as per map 
-    stylized_df = rename_columns(stylized_df)
+    Parameters:
+    - styler (pd.io.formats.style.Styler): styler of the metrics df (metrics as rows)
+    - row_formats (dict): row label -> format string (e.g. '{:,.0f}')
+    - na_rep (str): displayed for missing values of the formatted rows
+    - separator_rep (str): displayed for the rows without a format (separator rows)
 
-    stylized_df.set_index(['measureType'], inplace=True)
+    Returns:
+    - pd.io.formats.style.Styler: styler with the number formats
+    """
 
-    stylized_df=decorate_agg_metrics(stylized_df, theme)
+    rows_by_format = {}
+    for row in styler.data.index:
+        rows_by_format.setdefault(row_formats.get(row), []).append(row)
 
-    return stylized_df
+    for number_format, rows in rows_by_format.items():
+        if number_format is None:
+            styler = styler.format(na_rep=separator_rep, subset=pd.IndexSlice[rows, :])
+        else:
+            styler = styler.format(number_format, na_rep=na_rep, subset=pd.IndexSlice[rows, :])
+
+    return styler
 
 
-@st.cache_data
 def reconcile_overrides(input_original_df, input_override_df):
     """
     Compares the scratchpad and override dfs - and create a recon_df with the difference in values for a given customer and month
+    (see create_reconciliation for the totals of the differences)
 
     Parameters:
     - original_df (pd.DataFrame): Original DataFrame
@@ -588,76 +852,74 @@ def reconcile_overrides(input_original_df, input_override_df):
     - pd.DataFrame: DataFrame with differences between the two input DataFrames, truncated to the columns of override_df
     """
 
-    original_df = input_original_df.copy()
-    override_df = input_override_df.copy()
+    return create_reconciliation(input_original_df, input_override_df)['recon_df']
 
-    # Replace NaN values with zeros in both DataFrames
-    original_df.fillna(0, inplace=True)
-    override_df.fillna(0, inplace=True)
 
-    # Melt the DataFrames to convert months into rows
-    melted_df_original = pd.melt(original_df, id_vars=['customerId', 'customerName'], var_name='month', value_name='value_original')
-    melted_df_override = pd.melt(override_df, id_vars=['customerId', 'customerName'], var_name='month', value_name='value_override')
+def highlight_positive_negative_cells(df):
+    """
+    Apply Pandas dataframe styles - 
+    """
 
-    # Merge the melted DataFrames on 'customerId', 'customerName', and 'month'
-    merged_df = melted_df_original.merge(melted_df_override, on=['customerId', 'customerName', 'month'], how='outer')
+    pos_bg = DF_POSITIVE_HIGHLIGHT_BG_COLOR
+    neg_bg = DF_NEGATIVE_HIGHLIGHT_BG_COLOR
+    text_color = DF_HIGHLIGHT_TEXT_COLOR
+    text_weight = DF_HIGHLIGHT_TEXT_WEIGHT
 
-    # Calculate the differences for each row using vectorized operations
-    merged_df['difference'] =  merged_df['value_override'].fillna(0) - merged_df['value_original'].fillna(0)
+    # Apply styling to the DataFrame - css of all the cells from the numeric values in one step
+    styled_df = df.style.apply(calculate_sign_styles, axis=None,
+                               negative_style=f'background-color: {neg_bg}; color: {text_color}; font-weight: {text_weight}',
+                               positive_style=f'background-color: {pos_bg}; color: {text_color}; font-weight: {text_weight}')
 
-    # Create a new DataFrame containing 'customerId', 'customerName', 'month', and 'difference'
-    result_df = merged_df[['customerId', 'customerName', 'month', 'difference']]
+    return styled_df
 
-    # Sort the result DataFrame by 'customerId' and 'month'
-    result_df.sort_values(by=['customerId', 'month'], inplace=True)
 
-    # Transpose the result DataFrame to make months become columns
-    transposed_result_df = result_df.pivot_table(index=['customerId', 'customerName'], columns='month', values='difference', fill_value=0).reset_index()
+def calculate_sign_styles(input_df, negative_style, positive_style=''):
+    """
+    Returns the css of each cell from the sign of its value - np.where over the whole frame instead of a function call per cell.
+    The numeric columns are used as is, only the text (object) columns are parsed - formatted numbers (thousands separators,
+    % signs) are read as numbers, missing and non numeric values get no style
 
-    # Remove the month as index
-    transposed_result_df.columns.name = None  # Remove the 'month' label
+    Parameters:
+    - df (pd.DataFrame): values to style
+    - negative_style (str): css of the negative values
+    - positive_style (str): css of the positive values
 
-    # Truncate the resulting DataFrame to the columns of override_df
-    truncated_df = transposed_result_df[override_df.columns]
+    Returns:
+    - pd.DataFrame: css for each cell (same index and columns as df)
+    """
 
-    # Drop rows where all columns except 'customerId' and 'customerName' have a value of 0
-    truncated_df = truncated_df[(truncated_df.drop(['customerId', 'customerName'], axis=1) != 0).any(axis=1)]
+    numeric_columns = [pos for pos, dtype in enumerate(input_df.dtypes) if pd.api.types.is_numeric_dtype(dtype)]
+    text_columns = [pos for pos, dtype in enumerate(input_df.dtypes) if pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype)]
 
+    # other columns (e.g. dates) are missing values - no style
+    values = np.full(input_df.shape, np.nan)
+    values[:, numeric_columns] = input_df.iloc[:, numeric_columns].to_numpy(dtype=np.float64, na_value=np.nan)
+    for pos in text_columns:
+        values[:, pos] = pd.to_numeric(input_df.iloc[:, pos].astype(str).str.replace(',', '').str.replace('%', ''), errors='coerce')
 
-    return truncated_df
+    styles = np.where(values < 0, negative_style, np.where(values > 0, positive_style, ''))
 
+    return pd.DataFrame(styles, index=input_df.index, columns=input_df.columns)
 
-def highlight_positive_negative_cells(df):
-    """
-    Apply Pandas dataframe styles - 
+
+def calculate_row_styles(input_df, row_styles):
     """
+    Returns the css of each cell from the label of its row - one lookup per row, the css is repeated over the columns
 
-    pos_bg = DF_POSITIVE_HIGHLIGHT_BG_COLOR
-    neg_bg = DF_NEGATIVE_HIGHLIGHT_BG_COLOR
-    text_color = DF_HIGHLIGHT_TEXT_COLOR
-    text_weight = DF_HIGHLIGHT_TEXT_WEIGHT
+    Parameters:
+    - df (pd.DataFrame): values to style
+    - row_styles (dict): row label -> css of the cells of the row (other rows get no style)
 
-    # Apply styling to the DataFrame, excluding 'customerId' and 'customerName' columns
-    styled_df = df.style.applymap(lambda val: style_positive_negative_lambda(val, pos_bg, neg_bg, text_color, text_weight ))
+    Returns:
+    - pd.DataFrame: css for each cell (same index and columns as df)
+    """
 
-    return styled_df
+    styles = np.asarray([row_styles.get(row, '') for row in input_df.index], dtype=object)
 
+    return pd.DataFrame(np.repeat(styles[:, None], input_df.shape[1], axis=1), index=input_df.index, columns=input_df.columns)
 
 
-def style_positive_negative_lambda(val, positive_bg_color, negative_bg_color, text_color, text_weight ):
-    """
-    Takes a scalar and returns a string with the css property
-    for red color if the value is negative, and green if it's greater than 0.
-    """
-    if val < 0:
-        return f'background-color: {negative_bg_color}; color: {text_color}; font-weight: {text_weight}'
-    elif val > 0:
-        return f'background-color: {positive_bg_color}; color: {text_color}; font-weight: {text_weight}'
-    else:
-        return ''
-    
 
-@st.cache_data    
 def insert_blank_row(input_df, row_index, index_value, fill_value): 
     """
     Insert a blank row into a DataFrame at the specified row index, 
@@ -668,7 +930,7 @@ def insert_blank_row(input_df, row_index, index_value, fill_value):
     :return: New DataFrame with the blank row inserted.
     """
 
-    df = input_df.copy()
+    df = input_df
 
     # Create a DataFrame with a single blank row
     blank_row = pd.DataFrame({col: fill_value for col in df.columns}, index=[row_index])
@@ -696,10 +958,10 @@ def decorate_agg_metrics(input_df, theme):
     Note: Streamlit has does not render all the pandas styling 
     """
 
-    df = input_df.copy()
+    df = input_df
 
-    # insert a blank row after aggregated ARR metrics 
-    df = insert_blank_row(df, 6, '-------------------------------------------------', '--------')
+    # insert a blank row after aggregated ARR metrics - missing values, so that the columns stay numeric
+    df = insert_blank_row(df, 6, '-------------------------------------------------', np.nan)
 
     if theme == 'green': 
         neg_bg = DF_NEGATIVE_HIGHLIGHT_BG_COLOR
@@ -715,34 +977,12 @@ def decorate_agg_metrics(input_df, theme):
         text_weight = DF_HIGHLIGHT_TEXT_WEIGHT
 
 
-    # Function to apply styling to each cell
-    def style_cell(val):
-        # Check for None, empty string, spaces, or strings starting with '--'
-        if val is None or val == '' or str(val).isspace() or str(val).startswith('--'):
-            return ''
-        try:
-            val_num = float(str(val).replace(",", "").replace("%", ""))
-            if val_num < 0:
-                return f'color: {neg_bg}; font-weight: {text_weight}'
-            else:
-                return ''
-        except ValueError:
-            return ''
-
-    # Function to apply styling to each row
-    def style_row(row):
-        if row.name == 'Opening Period ARR':
-            return [f'background-color: {prev_period_bg}'] * len(row)
-        elif row.name == 'Closing Period ARR':
-            return [f'background-color: {curr_period_bg}'] * len(row)
-        else:
-            return [''] * len(row)
-
-    # Apply styling to each cell
-    styled_df = df.style.apply(lambda x: x.map(style_cell), axis=None)
+    # Apply styling to each cell - negative values, from the numeric values of the whole frame
+    styled_df = df.style.apply(calculate_sign_styles, axis=None, negative_style=f'color: {neg_bg}; font-weight: {text_weight}')
 
-    # Apply styling to each row
-    styled_df = styled_df.apply(style_row, axis=1)
+    # Apply styling to each row - opening and closing period rows, by row label
+    styled_df = styled_df.apply(calculate_row_styles, axis=None, row_styles={'Opening Period ARR': f'background-color: {prev_period_bg}',
+                                                                             'Closing Period ARR': f'background-color: {curr_period_bg}'})
 
     # Set text alignment
     styled_df = styled_df.set_properties(**{'text-align': 'right'}) # does not work with current Streamlit version
@@ -761,7 +1001,7 @@ def decorate_logo_metrics_df(input_df, theme):
     Note: Streamlit has does not render all the pandas styling 
     """
 
-    df = input_df.copy()
+    df = input_df
 
     if theme is 'green':
         neg_bg = DF_NEGATIVE_HIGHLIGHT_BG_COLOR
@@ -777,34 +1017,12 @@ def decorate_logo_metrics_df(input_df, theme):
         text_weight = DF_HIGHLIGHT_TEXT_WEIGHT       
 
 
-    # Function to apply styling to each cell
-    def style_cell(val):
-        # Check for None, empty string, spaces, or strings starting with '--'
-        if val is None or val == '' or str(val).isspace() or str(val).startswith('--'):
-            return ''
-        try:
-            val_num = float(str(val).replace(",", "").replace("%", ""))
-            if val_num < 0:
-                return f'color: {neg_bg}; font-weight: {text_weight}'
-            else:
-                return ''
-        except ValueError:
-            return ''
-
-    # Function to apply styling to each row
-    def style_row(row):
-        if row.name == 'Opening Period Customers':
-            return [f'background-color: {prev_period_bg}'] * len(row)
-        elif row.name == 'Closing Period Customers':
-            return [f'background-color: {curr_period_bg}'] * len(row)
-        else:
-            return [''] * len(row)
-
-    # Apply styling to each cell
-    styled_df = df.style.apply(lambda x: x.map(style_cell), axis=None)
+    # Apply styling to each cell - negative values, from the numeric values of the whole frame
+    styled_df = df.style.apply(calculate_sign_styles, axis=None, negative_style=f'color: {neg_bg}; font-weight: {text_weight}')
 
-    # Apply styling to each row
-    styled_df = styled_df.apply(style_row, axis=1)
+    # Apply styling to each row - opening and closing period rows, by row label
+    styled_df = styled_df.apply(calculate_row_styles, axis=None, row_styles={'Opening Period Customers': f'background-color: {prev_period_bg}',
+                                                                             'Closing Period Customers': f'background-color: {curr_period_bg}'})
 
     # Set text alignment
     styled_df = styled_df.set_properties(**{'text-align': 'right'}) # does not work with current Streamlit version
@@ -812,44 +1030,51 @@ def decorate_logo_metrics_df(input_df, theme):
     return styled_df
 
 
-@st.cache_data
-def apply_overrides(input_original_df, input_override_df ):
+def index_by_customer(input_df):
     """
-    Compares the scratchpad and override dfs - and create a recon_df with the difference in values for a given customer and month
+    Indexes a customer x month df by customerId, customerName - all the other columns are months.
+    Rows with a missing customerId or customerName are dropped and customers with more than one row are averaged
+    (same as the pivot_table of the melted df)
 
     Parameters:
-    - scratch_pad_df (pd.DataFrame): scratch pad df 
-    - override_df  (pd.DataFrame): override df 
+    - df (pd.DataFrame): customerId, customerName and one column per month
 
     Returns:
-    - pd.DataFrame: for each customer as row and months as columns, it creates the differnce between the tow input dfs 
+    - pd.DataFrame: one row per customer (customerId, customerName index, sorted) and one column per month
     """
 
-    original_df = input_original_df.copy()
-    override_df = input_override_df.copy()
+    month_columns = [col for col in input_df.columns if col not in ('customerId', 'customerName')]
 
+    return input_df.groupby(['customerId', 'customerName'], observed=True, sort=True)[month_columns].mean()
 
-    # Melt the DataFrames to convert months into rows
-    melted_df_original = pd.melt(original_df, id_vars=['customerId', 'customerName'], var_name='month', value_name='value_original')
-    melted_df_override = pd.melt(override_df, id_vars=['customerId', 'customerName'], var_name='month', value_name='value_override')
 
-    # Merge the melted DataFrames on 'customerId', 'customerName', and 'month'
-    merged_df = melted_df_original.merge(melted_df_override, on=['customerId', 'customerName', 'month'], how='outer')
+def apply_overrides(input_original_df, input_override_df ):
+    """
+    Applies the override (historical) values to the scratchpad df - for each customer and month the override value is used 
+    if present, otherwise the scratchpad value. Customers and months of both dfs are kept (outer join).
+    Both dfs are aligned on the customer index and month columns - no melt / merge / pivot of one row per customer month
 
-    # Apply the logic: if value_override is not NaN, use it, otherwise, use the value from value_edited
-    merged_df['value'] = merged_df.apply(lambda row: row['value_override'] if not pd.isna(row['value_override']) else row['value_original'], axis=1)
+    Parameters:
+    - scratch_pad_df (pd.DataFrame): scratch pad df 
+    - override_df  (pd.DataFrame): override df 
+
+    Returns:
+    - pd.DataFrame: for each customer as row and months as columns, the override value or the scratch pad value - sorted by first month of sales
+    """
 
-    # Create a new DataFrame containing 'customerId', 'customerName', 'month', and 'difference'
-    result_df = merged_df[['customerId', 'customerName', 'month', 'value']]
+    original_df = index_by_customer(input_original_df)
+    override_df = index_by_customer(input_override_df)
 
-    # Sort the result DataFrame by 'customerId' and 'month'
-    result_df.sort_values(by=['customerId', 'month'], inplace=True)
+    # if the override value is not NaN, use it, otherwise use the scratch pad value - union of customers and months
+    combined_df = override_df.combine_first(original_df)
 
-    # Transpose the result DataFrame to make months become columns
-    transposed_result_df = result_df.pivot_table(index=['customerId', 'customerName'], columns='month', values='value', fill_value=0).reset_index()
+    # customers and months without any value are dropped, the other missing values are 0 (same as pivot_table)
+    combined_df = combined_df.dropna(how='all').dropna(how='all', axis=1).fillna(0)
 
-    # Remove the month as index 
-    transposed_result_df.columns.name = None 
+    # months as columns in sorted order
+    combined_df = combined_df.reindex(columns=sorted(combined_df.columns)).sort_index()
+
+    transposed_result_df = combined_df.reset_index()
 
     # sort the dataset by first month of sales 
     transposed_result_df = sort_by_first_month_of_sales(transposed_result_df)
@@ -0,0 +1,171 @@
+import os
+import sys
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from arr_lib.setup import PIPELINE_CACHE_BUDGET_BYTES
+
+
+# Pipeline cache for the ARR analysis stages
+# the raw upload is fingerprinted once (file bytes plus column map) - each stage derives its key from the key of its input and
+# the stage parameters, so a cache lookup never hashes a DataFrame. The stage outputs are kept in a process wide store with
+# LRU eviction and a memory budget.
+# Note: cached outputs are shared by all the callers (no copy like st.cache_data) - treat them as read only
+
+
+# block size for hashing uploaded files
+HASH_BLOCK_SIZE = 1 << 20
+
+# stage key -> (output, size in bytes) - in least recently used order
+_stage_outputs = OrderedDict()
+_stage_outputs_lock = threading.Lock()
+_stage_stats = {'nbytes': 0, 'hits': 0, 'misses': 0, 'evictions': 0}
+
+
+def calculate_content_key(*inputs):
+    """
+    Calculates the content hash of the inputs - the same content always gives the same key (also across processes)
+
+    Parameters:
+    - inputs: str (e.g. a key), pd.DataFrame (column map, overrides), file like / os.PathLike (upload) or None
+
+    Returns:
+    - str: content key
+    """
+
+    hasher = hashlib.sha256()
+
+    for input_value in inputs:
+        if input_value is None:
+            hasher.update(b'none')
+        elif isinstance(input_value, str):
+            hasher.update(b'str:' + input_value.encode())
+        elif isinstance(input_value, pd.DataFrame):
+            # column names, dtypes and frame metadata (date formats) are part of the content
+            hasher.update(repr([list(input_value.columns), list(input_value.dtypes.astype(str)), input_value.attrs]).encode())
+            hasher.update(pd.util.hash_pandas_object(input_value, index=False).to_numpy().tobytes())
+        else:
+            hash_upload(hasher, input_value)
+
+    return hasher.hexdigest()[:32]
+
+
+def hash_upload(hasher, file):
+    """
+    Adds the content of an uploaded file (file like or os.PathLike) to the hasher - block by block
+    """
+
+    if isinstance(file, os.PathLike):
+        with open(file, 'rb') as upload:
+            hash_upload(hasher, upload)
+        return
+
+    file.seek(0)
+    for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+        hasher.update(block)
+    file.seek(0)
+
+
+def derive_stage_key(input_key, stage, *params):
+    """
+    Derives the key of a stage output from the key of the stage input, the stage name and the stage parameters
+
+    Parameters:
+    - input_key (str): key of the stage input (upload fingerprint or the key of the previous stage)
+    - stage (str): stage name
+    - params: stage parameters (keys of other inputs, flags) - must have a stable repr
+
+    Returns:
+    - str: stage key
+    """
+
+    return hashlib.sha256(repr((input_key, stage, params)).encode()).hexdigest()[:32]
+
+
+def estimate_nbytes(value):
+    """
+    Estimates the memory used by a stage output - frames, arrays and (nested) tuples, lists and dicts of them
+    """
+
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        memory_usage = value.memory_usage(deep=True)
+        return int(memory_usage.sum() if isinstance(memory_usage, pd.Series) else memory_usage)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sum(estimate_nbytes(item) for item in value.values())
+
+    return sys.getsizeof(value)
+
+
+def run_cached_stage(stage_key, stage_function, *args, **kwargs):
+    """
+    Returns the cached output of the stage key - or runs the stage function and caches its output
+
+    Parameters:
+    - stage_key (str): key of the stage output (see derive_stage_key)
+    - stage_function (callable): computes the stage output from args / kwargs
+
+    Returns:
+    - output of the stage function
+    """
+
+    with _stage_outputs_lock:
+        if stage_key in _stage_outputs:
+            _stage_outputs.move_to_end(stage_key)
+            _stage_stats['hits'] += 1
+            return _stage_outputs[stage_key][0]
+        _stage_stats['misses'] += 1
+
+    # computed outside of the lock - other sessions are not blocked (a concurrent miss computes the stage twice)
+    output = stage_function(*args, **kwargs)
+    store_stage_output(stage_key, output)
+
+    return output
+
+
+def store_stage_output(stage_key, output, budget_bytes=None):
+    """
+    Stores a stage output and evicts the least recently used outputs until the store is within the memory budget -
+    an output larger than the budget is not stored
+    """
+
+    budget_bytes = PIPELINE_CACHE_BUDGET_BYTES if budget_bytes is None else budget_bytes
+    nbytes = estimate_nbytes(output)
+    if nbytes > budget_bytes:
+        return
+
+    with _stage_outputs_lock:
+        if stage_key in _stage_outputs:
+            _stage_stats['nbytes'] -= _stage_outputs.pop(stage_key)[1]
+
+        _stage_outputs[stage_key] = (output, nbytes)
+        _stage_stats['nbytes'] += nbytes
+
+        while _stage_stats['nbytes'] > budget_bytes:
+            _, (_, evicted_nbytes) = _stage_outputs.popitem(last=False)
+            _stage_stats['nbytes'] -= evicted_nbytes
+            _stage_stats['evictions'] += 1
+
+
+def clear_pipeline_cache():
+    """
+    Removes all the stage outputs
+    """
+
+    with _stage_outputs_lock:
+        _stage_outputs.clear()
+        _stage_stats['nbytes'] = 0
+
+
+def get_pipeline_cache_info():
+    """
+    Returns the usage of the pipeline cache - entries, nbytes, budget_bytes, hits, misses and evictions
+    """
+
+    with _stage_outputs_lock:
+        return {'entries': len(_stage_outputs), 'budget_bytes': PIPELINE_CACHE_BUDGET_BYTES, **_stage_stats}
@@ -184,9 +184,8 @@ def top_cust_chart(customer_arr_df, bar_color, chart_title):
     generate and return an altair chart - for customer pareto 
     """
 
-    # Check if 'Total_Sales' column exists, and drop it if it does
-    if 'Total_Sales' in customer_arr_df.columns:
-        customer_arr_df = customer_arr_df.drop(columns=['Total_Sales'])
+    # Drop the 'Total_Sales' column if it exists - drop returns a new frame, so the caller's df is not modified below
+    customer_arr_df = customer_arr_df.drop(columns=['Total_Sales'], errors='ignore')
 
     # Create a new column with the sum of monthly sales
     customer_arr_df['Total_Sales'] = customer_arr_df.iloc[:, 2:].sum(axis=1)
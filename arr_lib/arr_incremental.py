@@ -0,0 +1,217 @@
+import numpy as np
+import pandas as pd
+from arr_lib.setup import CUSTOMER_WATERFALL_MEASURE_TYPES
+from arr_lib.arr_analysis import calculate_customer_waterfall, create_customer_waterfall_frame
+from arr_lib.arr_analysis import calculate_sales_month_range
+from arr_lib.arr_aggregates import create_aggregate_store_from_array, update_aggregate_store
+from arr_lib.arr_aggregates import aggregate_store_to_metrics_df, aggregate_store_to_logo_metrics_df
+
+
+# Incremental ARR metrics for the planning scratchpad
+# the state keeps the last computed revenue grid, the customer waterfall, the customer level dfs and the aggregate store
+# (arr_aggregates) - an edit only recomputes the waterfall of the touched customers, patches their rows and patches the
+# aggregate store by the difference
+
+
+NUM_MEASURES = len(CUSTOMER_WATERFALL_MEASURE_TYPES)
+
+
+def split_scratchpad_df(input_df):
+    """
+    Splits the edited scratchpad df into customer names, customer ids, month columns and the numeric revenue grid
+
+    Parameters:
+    - df (pd.DataFrame): customerName, customerId and one column per month
+
+    Returns:
+    - np.ndarray: customerName for each row
+    - np.ndarray: customerId for each row
+    - list: month column names
+    - np.ndarray: rows x months revenue grid (blank or non numeric cells are 0)
+    """
+
+    month_columns = [col for col in input_df.columns if col not in ('customerName', 'customerId', 'measureType')]
+
+    # only the month columns that are not numeric (e.g. text typed in the editor) are converted
+    month_df = input_df[month_columns]
+    text_columns = [col for col, dtype in month_df.dtypes.items() if not pd.api.types.is_numeric_dtype(dtype)]
+    if text_columns:
+        month_df = month_df.assign(**{col: pd.to_numeric(month_df[col], errors='coerce') for col in text_columns})
+    revenue = month_df.to_numpy(dtype=np.float64)
+
+    # blank cells are 0 - the (read only) values of the df are used as is if there are none
+    if np.isnan(revenue).any():
+        revenue = np.where(np.isnan(revenue), 0, revenue)
+
+    return input_df['customerName'].to_numpy(), input_df['customerId'].to_numpy(), month_columns, revenue
+
+
+def create_customer_arr_frame(revenue, customer_names, customer_ids, month_columns):
+    """
+    Creates the customer level revenue df (customer_arr_df) sorted by first month of sales - same as sort_by_first_month_of_sales
+
+    Parameters:
+    - revenue (np.ndarray): customers x months revenue grid
+    - customer_names (np.ndarray): customerName for each customer
+    - customer_ids (np.ndarray): customerId for each customer
+    - month_columns (list): month column names
+
+    Returns:
+    - pd.DataFrame: customerName, customerId and one column per month - sorted by first month of sales
+    - np.ndarray: sort keys - first and last month of sales and customerId code for each customer
+    - np.ndarray: row position of each customer in the df
+    """
+
+    first_non_zero_month, last_non_zero_month = calculate_sales_month_range(revenue, month_columns)
+
+    # customerId as sortable integer codes (missing ids last)
+    customer_codes, _ = pd.factorize(customer_ids, sort=True)
+    customer_codes = np.where(customer_codes < 0, len(customer_ids), customer_codes)
+
+    sort_keys = np.stack([first_non_zero_month, last_non_zero_month, customer_codes])
+    sort_order = np.lexsort(sort_keys[::-1])
+    positions = np.empty(len(sort_order), dtype=np.int64)
+    positions[sort_order] = np.arange(len(sort_order))
+
+    df_rr = pd.DataFrame(revenue[sort_order], columns=month_columns)
+    df_rr.insert(0, 'customerName', customer_names[sort_order])
+    df_rr.insert(1, 'customerId', customer_ids[sort_order])
+
+    return df_rr, sort_keys, positions
+
+
+def create_incremental_metrics_state(input_df):
+    """
+    Full calculation of the customer and aggregated metrics for the scratchpad df - returns the state for later incremental updates
+
+    Parameters:
+    - df (pd.DataFrame): edited scratchpad df - customerName, customerId and one column per month
+
+    Returns:
+    - dict: incremental metrics state
+    - tuple: cust_arr_waterfall_df, customer_arr_df, logo_metrics_df, metrics_df (same as create_customer_and_aggregated_metrics)
+    """
+
+    customer_names, customer_ids, month_columns, revenue = split_scratchpad_df(input_df)
+
+    # waterfall rows are in customerName, customerId order - position of each scratchpad row in the waterfall
+    waterfall_order = input_df.reset_index(drop=True).sort_values(['customerName', 'customerId'], kind='stable').index.to_numpy()
+    waterfall_positions = np.empty(len(waterfall_order), dtype=np.int64)
+    waterfall_positions[waterfall_order] = np.arange(len(waterfall_order))
+
+    waterfall = calculate_customer_waterfall(revenue[waterfall_order])
+
+    customer_arr_df, sort_keys, customer_arr_positions = create_customer_arr_frame(revenue, customer_names, customer_ids, month_columns)
+
+    state = {
+        'customer_names': customer_names,
+        'customer_ids': customer_ids,
+        'month_columns': month_columns,
+        'revenue': revenue,
+        'waterfall': waterfall,
+        'waterfall_positions': waterfall_positions,
+        'aggregates': create_aggregate_store_from_array(waterfall, month_columns),
+        'cust_arr_waterfall_df': create_customer_waterfall_frame(waterfall, customer_names[waterfall_order], customer_ids[waterfall_order], month_columns),
+        'customer_arr_df': customer_arr_df,
+        'sort_keys': sort_keys,
+        'customer_arr_positions': customer_arr_positions,
+    }
+
+    return state, create_frames_from_state(state)
+
+
+def create_frames_from_state(state):
+    """
+    Creates the customer level and aggregated frames from the incremental metrics state -
+    the customer level frames are copies of the frames of the state, owned by the caller (see update_customer_and_aggregated_metrics)
+
+    Returns:
+    - tuple: cust_arr_waterfall_df, customer_arr_df, logo_metrics_df, metrics_df
+    """
+
+    df_logo_waterfall = aggregate_store_to_logo_metrics_df(state['aggregates'])
+
+    df_agg = aggregate_store_to_metrics_df(state['aggregates'])
+
+    # lazy copies (copy-on-write) - the next update copies the values of the state frames before it patches them, so frames
+    # returned earlier (session keys, snapshots) keep their values
+    return state['cust_arr_waterfall_df'].copy(deep=False), state['customer_arr_df'].copy(deep=False), df_logo_waterfall, df_agg
+
+
+def update_customer_and_aggregated_metrics(input_df, state=None):
+    """
+    Incremental version of create_customer_and_aggregated_metrics for the planning scratchpad.
+    The edited df is compared to the df of the previous calculation (kept in the state) -
+        - only the customers with changed cells get their waterfall recomputed (a changed month also changes the following month)
+        - the aggregate store (monthly totals and customer counts) is patched by the difference between the old and new waterfall of these customers
+        - the cells of these customers are patched in the customer waterfall and customer revenue dfs - the customer revenue df
+          is re-sorted only if the first or last month of sales of a changed customer moved
+        - the aggregated, retention and logo frames are recreated from the patched totals (months sized)
+    Added / removed / renamed customers or changed month columns fall back to the full calculation
+
+    Note: the state keeps its own cust_arr_waterfall_df and customer_arr_df and patches them in place - the returned frames
+    are copies owned by the caller, a later update does not change them
+
+    Parameters:
+    - df (pd.DataFrame): edited scratchpad df - customerName, customerId and one column per month
+    - state (dict): incremental metrics state of the previous calculation, None for a full calculation
+
+    Returns:
+    - dict: updated incremental metrics state
+    - tuple: cust_arr_waterfall_df, customer_arr_df, logo_metrics_df, metrics_df (same as create_customer_and_aggregated_metrics)
+    """
+
+    if state is None:
+        return create_incremental_metrics_state(input_df)
+
+    customer_names, customer_ids, month_columns, revenue = split_scratchpad_df(input_df)
+
+    # same customers in the same order and same months - otherwise full calculation
+    same_structure = (month_columns == state['month_columns']
+                      and pd.Index(customer_names).equals(pd.Index(state['customer_names']))
+                      and pd.Index(customer_ids).equals(pd.Index(state['customer_ids'])))
+    if not same_structure:
+        return create_incremental_metrics_state(input_df)
+
+    # scratchpad rows with at least one edited cell
+    changed_cells = revenue != state['revenue']
+    changed_rows = np.flatnonzero(changed_cells.any(axis=1))
+    if len(changed_rows) == 0:
+        return state, create_frames_from_state(state)
+
+    changed_revenue = revenue[changed_rows]
+
+    # recompute the waterfall of the changed customers and patch the totals and counts by the difference
+    waterfall_positions = state['waterfall_positions'][changed_rows]
+    old_waterfall = state['waterfall'][waterfall_positions]
+    new_waterfall = calculate_customer_waterfall(changed_revenue)
+    state['aggregates'] = update_aggregate_store(state['aggregates'], old_waterfall, new_waterfall)
+    state['waterfall'][waterfall_positions] = new_waterfall
+
+    # patch the cells of the changed customers in the customer waterfall df (one row per measure) - only the changed months
+    # are written, pandas sets the cells column by column
+    cust_arr_waterfall_df = state['cust_arr_waterfall_df']
+    changed_months = np.flatnonzero((new_waterfall != old_waterfall).any(axis=(0, 1)))
+    waterfall_rows = (waterfall_positions[:, None] * NUM_MEASURES + np.arange(NUM_MEASURES)).ravel()
+    cust_arr_waterfall_df.iloc[waterfall_rows, cust_arr_waterfall_df.columns.get_indexer([month_columns[i] for i in changed_months])] = \
+        new_waterfall[:, :, changed_months].reshape(-1, len(changed_months))
+
+    state['revenue'] = revenue
+
+    # patch the edited cells in the customer revenue df
+    customer_arr_df = state['customer_arr_df']
+    edited_months = np.flatnonzero(changed_cells[changed_rows].any(axis=0))
+    customer_arr_df.iloc[state['customer_arr_positions'][changed_rows], customer_arr_df.columns.get_indexer([month_columns[i] for i in edited_months])] = \
+        changed_revenue[:, edited_months]
+
+    # the rows are re-sorted only if the first or last month of sales of a changed customer moved
+    sort_keys = state['sort_keys']
+    first_non_zero_month, last_non_zero_month = calculate_sales_month_range(changed_revenue, month_columns)
+    if (first_non_zero_month != sort_keys[0, changed_rows]).any() or (last_non_zero_month != sort_keys[1, changed_rows]).any():
+        sort_keys[0, changed_rows] = first_non_zero_month
+        sort_keys[1, changed_rows] = last_non_zero_month
+        sort_order = np.lexsort(sort_keys[::-1])
+        state['customer_arr_df'] = customer_arr_df.take(state['customer_arr_positions'][sort_order]).reset_index(drop=True)
+        state['customer_arr_positions'][sort_order] = np.arange(len(sort_order))
+
+    return state, create_frames_from_state(state)
@@ -0,0 +1,252 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+from arr_lib.setup import SAVED_COLUMN_MAP_FILE_PATH
+from arr_lib.setup import INGESTION_CHUNK_SIZE
+from arr_lib.setup import PREDEFINED_COLUMN_TYPES
+from arr_lib.setup import PREDEFINED_DATE_FORMAT_MAP
+from arr_lib.column_mapping import map_columns, get_mapped_date_formats
+from arr_lib.arr_validations import create_validation_report, merge_validation_reports, select_valid_rows
+from arr_lib.arr_analysis import calculate_contract_month_ranges, create_revenue_matrix_from_month_ranges
+
+
+# Streaming ingestion of large contract uploads
+# the upload is read in chunks - each chunk is mapped, validated and reduced to contract level month ranges
+# (customer, start month, end month, monthly value in cents), the chunk itself is then released.
+# Peak memory is one chunk plus the compact contract arrays and the output revenue matrix
+#
+# Typed ingestion of contract uploads
+# the upload is read by the (multi-threaded) pyarrow CSV reader with the arrow types of the data elements (PREDEFINED_COLUMN_TYPES) -
+# the dtypes do not depend on the content of the file
+
+
+# numeric text accepted for the float64 data elements - other values become null (and are reported by the validations)
+NUMERIC_PATTERN = r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$'
+
+
+def read_upload_preview(file, nrows=1000):
+    """
+    Reads the first rows of the upload - used to display the upload and to map the columns without loading the whole file
+
+    Parameters:
+    - file (str or file like): uploaded csv file
+    - nrows (int): number of rows to read
+
+    Returns:
+    - pd.DataFrame: first nrows of the upload
+    """
+
+    rewind_upload(file)
+    preview_df = pd.read_csv(file, nrows=nrows)
+    rewind_upload(file)
+
+    return preview_df
+
+
+def read_override_file(file, string_customer_ids=False):
+    """
+    Reads the override (historical MRR) file - customerId, customerName and one column per month
+
+    Parameters:
+    - file (str or file like): uploaded csv file
+    - string_customer_ids (bool): read customerId and customerName as strings - the typed and the streaming ingestion
+      read the customer columns of the upload as strings, the override ids must be strings too to match them
+
+    Returns:
+    - pd.DataFrame: override df
+    """
+
+    rewind_upload(file)
+    override_df = pd.read_csv(file, dtype={'customerId': str, 'customerName': str} if string_customer_ids else None)
+    rewind_upload(file)
+
+    return override_df
+
+
+def rewind_upload(file):
+    """
+    Moves a file like upload back to the start, so that it can be read again (file paths are left as is)
+    """
+
+    if hasattr(file, 'seek'):
+        file.seek(0)
+
+
+def stream_contract_month_ranges(file, column_mapping_df, chunksize=INGESTION_CHUNK_SIZE):
+    """
+    Reads the upload in chunks and yields the contract level month ranges of the valid rows of each chunk -
+    the columns are mapped, the dates parsed and the rows validated chunk by chunk
+
+    Parameters:
+    - file (str or file like): uploaded csv file
+    - column_mapping_df (pd.DataFrame): column map - columnHeaders, columnNames, dateFormat
+    - chunksize (int): number of rows read at a time
+
+    Yields:
+    - np.ndarray: customerName of each contract
+    - np.ndarray: customerId of each contract
+    - np.ndarray: month ordinal of the first month of each contract
+    - np.ndarray: month ordinal after the last month of each contract
+    - np.ndarray: monthly revenue of each contract in cents
+    - dict: validation report of the chunk (see create_validation_report)
+    """
+
+    # only the mapped columns are parsed - the same file column can be mapped to more than one data element
+    source_columns = list(dict.fromkeys(column_mapping_df['columnNames']))
+
+    # customer ids and names are read as strings in every chunk - otherwise a chunk of numeric ids (1001) and a chunk
+    # of mixed ids ('1001', 'A1') would split the same customer in two or break sorting the customers
+    customer_columns = column_mapping_df.loc[column_mapping_df['columnHeaders'].isin(['customerId', 'customerName']), 'columnNames']
+    customer_dtypes = {column: str for column in customer_columns}
+
+    rewind_upload(file)
+
+    for chunk in pd.read_csv(file, usecols=source_columns, dtype=customer_dtypes, chunksize=chunksize):
+
+        mapped_chunk = map_columns(chunk, column_mapping_df)
+
+        # parses the dates, calculates contractDuration and converts totalContractValue of the mapped chunk
+        mapped_chunk, validation_report = create_validation_report(mapped_chunk)
+        valid_chunk = select_valid_rows(mapped_chunk, validation_report)
+
+        start_ordinals, contract_months, contract_revenue = calculate_contract_month_ranges(valid_chunk)
+
+        # contracts shorter than a month do not create any monthly revenue
+        valid = contract_months > 0
+
+        yield (valid_chunk['customerName'].to_numpy()[valid],
+               valid_chunk['customerId'].to_numpy()[valid],
+               start_ordinals[valid],
+               start_ordinals[valid] + contract_months[valid],
+               np.rint(contract_revenue[valid] * 100),
+               validation_report)
+
+
+def stream_revenue_matrix(file, column_mapping_df=None, chunksize=INGESTION_CHUNK_SIZE):
+    """
+    Streaming version of create_revenue_matrix_from_contracts - builds the transposed customer x month revenue matrix
+    from the upload without loading the whole file. Rows that fail the validations are skipped and reported.
+
+    Parameters:
+    - file (str or file like): uploaded csv file
+    - column_mapping_df (pd.DataFrame): column map - the saved column map (saved_map/column_map.csv) if None
+    - chunksize (int): number of rows read at a time
+
+    Returns:
+    - pd.DataFrame: customerName, customerId and one column per month (same as create_revenue_matrix_from_contracts)
+    - dict: validation report of the whole upload (see merge_validation_reports)
+    """
+
+    if column_mapping_df is None:
+        column_mapping_df = pd.read_csv(SAVED_COLUMN_MAP_FILE_PATH)
+
+    # customer (customerName, customerId) -> row of the matrix, in order of first appearance
+    customer_positions = {}
+
+    customer_codes, start_ordinals, end_ordinals, contract_cents, validation_reports = [], [], [], [], []
+
+    for names, ids, chunk_start_ordinals, chunk_end_ordinals, chunk_cents, validation_report in stream_contract_month_ranges(file, column_mapping_df, chunksize):
+
+        # factorize the customers of the chunk - the dictionary lookup is once per distinct customer, not per row
+        chunk_codes, chunk_customers = pd.MultiIndex.from_arrays([names, ids]).factorize()
+        chunk_positions = np.array([customer_positions.setdefault(customer, len(customer_positions)) for customer in chunk_customers], dtype=np.int64)
+
+        customer_codes.append(chunk_positions[chunk_codes])
+        start_ordinals.append(chunk_start_ordinals)
+        end_ordinals.append(chunk_end_ordinals)
+        contract_cents.append(chunk_cents)
+        validation_reports.append(validation_report)
+
+    customer_codes = np.concatenate(customer_codes) if customer_codes else np.array([], dtype=np.int64)
+    start_ordinals = np.concatenate(start_ordinals) if start_ordinals else np.array([], dtype=np.int64)
+    end_ordinals = np.concatenate(end_ordinals) if end_ordinals else np.array([], dtype=np.int64)
+    contract_cents = np.concatenate(contract_cents) if contract_cents else np.array([], dtype=np.float64)
+
+    # customers are sorted by customerName, customerId (same as pivot_table) - renumber the contract customer codes
+    customers = pd.MultiIndex.from_tuples(list(customer_positions), names=['customerName', 'customerId'])
+    customers, sort_order = customers.sort_values(return_indexer=True)
+    customer_rank = np.empty(len(sort_order), dtype=np.int64)
+    customer_rank[sort_order] = np.arange(len(sort_order))
+
+    transposed_df = create_revenue_matrix_from_month_ranges(customer_rank[customer_codes], customers, start_ordinals, end_ordinals, contract_cents)
+
+    return transposed_df, merge_validation_reports(validation_reports)
+
+
+def read_typed_contracts(file, column_mapping_df):
+    """
+    Reads the upload with the pyarrow CSV reader and returns the mapped contract data with explicit dtypes
+        customerId, customerName : category (dictionary encoded strings, categories in sorted order)
+        contractId : object (strings)
+        contractStartDate, contractEndDate : datetime64[ns] - parsed with the selected date format, NaT for invalid dates
+        totalContractValue : float64 - NaN for non numeric values
+    Only the mapped columns are read. The frame can be validated with create_validation_report like the map_columns output.
+
+    Parameters:
+    - file (str or file like): uploaded csv file
+    - column_mapping_df (pd.DataFrame): column map - columnHeaders, columnNames, dateFormat
+
+    Returns:
+    - pd.DataFrame: mapped contract data, date formats in df.attrs['dateFormats'] (same as map_columns)
+    """
+
+    column_mapping = column_mapping_df.set_index('columnHeaders')['columnNames'].to_dict()
+    date_formats = get_mapped_date_formats(column_mapping_df)
+
+    # a file column is dictionary encoded by the reader if it is only mapped to dictionary data elements, otherwise read as strings
+    source_types = {}
+    for header, source_column in column_mapping.items():
+        arrow_type = pa.dictionary(pa.int32(), pa.string()) if PREDEFINED_COLUMN_TYPES.get(header) == 'dictionary' else pa.string()
+        source_types[source_column] = arrow_type if source_types.get(source_column, arrow_type) == arrow_type else pa.string()
+
+    rewind_upload(file)
+    convert_options = pa_csv.ConvertOptions(column_types=source_types, include_columns=list(source_types), strings_can_be_null=True)
+    table = pa_csv.read_csv(file, convert_options=convert_options)
+
+    typed_table = pa.table({header: convert_arrow_column(table[source_column], PREDEFINED_COLUMN_TYPES.get(header, 'string'),
+                                                         PREDEFINED_DATE_FORMAT_MAP.get(date_formats.get(header)))
+                            for header, source_column in column_mapping.items()})
+    typed_df = typed_table.to_pandas()
+
+    # the reader encodes the categories in order of appearance - sorted, so that sorting by customer stays alphabetical
+    for col in typed_df.select_dtypes('category').columns:
+        typed_df[col] = typed_df[col].cat.reorder_categories(typed_df[col].cat.categories.sort_values())
+
+    typed_df.attrs['dateFormats'] = date_formats
+
+    return typed_df
+
+
+def convert_arrow_column(column, column_type, date_format=None):
+    """
+    Converts a column read by the pyarrow CSV reader (string or dictionary) to the arrow type of the data element
+
+    Parameters:
+    - column (pa.ChunkedArray): column as read from the file
+    - column_type (str): dictionary, string, timestamp or float64 (see PREDEFINED_COLUMN_TYPES)
+    - date_format (str): pandas date format for the timestamp columns - left as strings if None
+
+    Returns:
+    - pa.ChunkedArray: converted column
+    """
+
+    if column_type == 'dictionary':
+        return column if pa.types.is_dictionary(column.type) else column.dictionary_encode()
+
+    if pa.types.is_dictionary(column.type):
+        column = pc.cast(column, pa.string())
+
+    if column_type == 'timestamp' and date_format is not None:
+        # parsed by pandas (not pc.strptime, which rolls impossible dates like 02/31 forward) - the same values are
+        # rejected as by the pandas ingestion (create_validation_report). Only the distinct dates are parsed
+        encoded_column = pc.dictionary_encode(column.combine_chunks())
+        parsed_dates = pd.to_datetime(encoded_column.dictionary.to_pandas(), format=date_format, errors='coerce')
+        return pa.chunked_array([pc.take(pa.array(parsed_dates, type=pa.timestamp('ns'), from_pandas=True), encoded_column.indices)])
+
+    if column_type == 'float64':
+        column = pc.utf8_trim_whitespace(column)
+        return pc.cast(pc.if_else(pc.match_substring_regex(column, NUMERIC_PATTERN), column, pa.scalar(None, pa.string())), pa.float64())
+
+    return column
@@ -0,0 +1,101 @@
+import numpy as np
+
+
+# Server side paging of the large grids (MRR by customer, uploaded data)
+# the grid is filtered (search, month window), sorted and sliced to one page before it is sent to the browser -
+# the payload of a rerun is bounded by the page size and the month window, not by the size of the book
+
+
+# columns of the customer grids that are not months
+CUSTOMER_GRID_KEY_COLUMNS = ['customerName', 'customerId', 'measureType']
+
+
+def get_month_columns(input_df):
+    """
+    Returns the month columns of a customer grid - all the columns except customerName, customerId and measureType
+    """
+
+    return [col for col in input_df.columns if col not in CUSTOMER_GRID_KEY_COLUMNS]
+
+
+def search_grid_rows(input_df, search, search_columns=None):
+    """
+    Returns the rows of a df with the search text in one of the search columns (case insensitive)
+
+    Parameters:
+    - df (pd.DataFrame): grid to search
+    - search (str): text to search for - all rows if empty
+    - search_columns (list): columns to search - customerName / customerId if present, otherwise all the columns
+
+    Returns:
+    - pd.DataFrame: matching rows (index kept)
+    """
+
+    search = (search or '').strip()
+    if not search:
+        return input_df
+
+    if search_columns is None:
+        search_columns = [col for col in ('customerName', 'customerId') if col in input_df.columns]
+        search_columns = search_columns or list(input_df.columns)
+
+    # one vectorized contains per column
+    matches = np.zeros(len(input_df), dtype=bool)
+    for col in search_columns:
+        matches |= input_df[col].astype(str).str.contains(search, case=False, regex=False).to_numpy()
+
+    return input_df[matches]
+
+
+def filter_customer_grid(input_df, search='', month_window=None, sort_by_total=False):
+    """
+    Filters a customer grid (customerName, customerId and one column per month) for display
+
+    Parameters:
+    - df (pd.DataFrame): customer grid
+    - search (str): customers with the text in the customerName or customerId (case insensitive) - all if empty
+    - month_window (tuple): first and last month (YYYY-MM) of the months to keep - all months if None
+    - sort_by_total (bool): customers sorted by the total over the months of the window (descending), otherwise the grid order
+
+    Returns:
+    - pd.DataFrame: filtered grid - customer columns and the months of the window (index kept)
+    """
+
+    df = search_grid_rows(input_df, search)
+
+    month_columns = get_month_columns(df)
+    if month_window is not None:
+        first_month, last_month = month_window
+        month_columns = [col for col in month_columns if first_month <= str(col) <= last_month]
+
+    df = df[[col for col in df.columns if col in CUSTOMER_GRID_KEY_COLUMNS] + month_columns]
+
+    if sort_by_total:
+        # summed one month at a time - a sparse grid (sparse metrics backend) is not densified as a whole
+        totals = np.zeros(len(df))
+        for col in month_columns:
+            totals += df[col].to_numpy(dtype=np.float64)
+        df = df.take(np.argsort(-totals, kind='stable'))
+
+    return df
+
+
+def slice_grid_page(input_df, page, page_size):
+    """
+    Returns one page of a grid
+
+    Parameters:
+    - df (pd.DataFrame): filtered grid
+    - page (int): page number (1 based) - limited to the available pages
+    - page_size (int): rows per page
+
+    Returns:
+    - pd.DataFrame: rows of the page
+    - int: page number of the returned page
+    - int: number of pages
+    """
+
+    num_pages = max(1, int(np.ceil(len(input_df) / page_size)))
+    page = min(max(int(page), 1), num_pages)
+
+    return input_df.iloc[(page - 1) * page_size:page * page_size], page, num_pages
@@ -0,0 +1,275 @@
+import numpy as np
+import pandas as pd
+from arr_lib.setup import RECON_ABSOLUTE_TOLERANCE, RECON_RELATIVE_TOLERANCE
+from arr_lib.setup import RECON_MISMATCH_TYPES, RECON_PAGE_SIZE
+
+
+# Reconciliation of the computed customer MRR (customer_arr_df) with the uploaded historical MRR (override_df)
+# both frames are aligned on integer customer codes (the sorted union of the customers of both frames) and on the month
+# columns of the override - the difference is one array subtraction, the non-zero rows and the totals (per customer,
+# per month and overall) are all taken from the same difference array
+#
+# The reconciliation report applies tolerances, classifies the mismatched customers and ranks them - the UI materializes
+# only the page being viewed (get_reconciliation_page)
+
+
+# key columns of the customer x month frames
+CUSTOMER_KEY_COLUMNS = ['customerId', 'customerName']
+
+
+def encode_customers(*input_dfs):
+    """
+    Assigns an integer code to each customer (customerId, customerName) of the dfs - codes follow the sorted order of the customers.
+    Missing customerId / customerName values are 0 (same as the fillna of the melted reconciliation)
+
+    Parameters:
+    - input_dfs (pd.DataFrame): customerId, customerName and one column per month
+
+    Returns:
+    - list: np.ndarray of customer codes for the rows of each df
+    - pd.MultiIndex: customerId, customerName of each code
+    """
+
+    keys = pd.concat([input_df[CUSTOMER_KEY_COLUMNS] for input_df in input_dfs], ignore_index=True)
+
+    # categorical keys (typed ingestion) are compared by their values - missing values are 0 (where keeps object keys as
+    # they are, fillna would downcast them)
+    keys = keys.astype({col: object for col in CUSTOMER_KEY_COLUMNS if isinstance(keys[col].dtype, pd.CategoricalDtype)})
+    keys = keys.where(keys.notna(), 0)
+    codes, customers = pd.MultiIndex.from_frame(keys).factorize(sort=True)
+
+    # split the codes back to the rows of each df
+    row_counts = np.cumsum([len(input_df) for input_df in input_dfs])[:-1]
+
+    return np.split(codes, row_counts), customers
+
+
+def align_customer_months(input_df, customer_codes, num_customers, month_columns):
+    """
+    Returns the values of a df on the shared customer and month axis - customers and months missing in the df
+    and missing values are 0, customers with more than one row are averaged
+
+    Parameters:
+    - df (pd.DataFrame): customerId, customerName and one column per month
+    - customer_codes (np.ndarray): customer code of each row of the df (see encode_customers)
+    - num_customers (int): number of customers of the shared axis
+    - month_columns (list): month columns of the shared axis
+
+    Returns:
+    - np.ndarray: customers x months values
+    """
+
+    values = input_df.reindex(columns=month_columns).fillna(0).to_numpy(dtype=np.float64)
+
+    customer_values = np.zeros((num_customers, len(month_columns)))
+    row_counts = np.bincount(customer_codes, minlength=num_customers)
+
+    # one row per customer (the usual case) - rows are placed directly, otherwise summed and averaged
+    if (row_counts <= 1).all():
+        customer_values[customer_codes] = values
+        return customer_values
+
+    np.add.at(customer_values, customer_codes, values)
+
+    return customer_values / np.maximum(row_counts, 1)[:, None]
+
+
+def align_reconciliation_frames(input_original_df, input_override_df):
+    """
+    Aligns the scratchpad and override dfs on the shared customer axis (customers of both dfs) and the month columns of the override
+
+    Parameters:
+    - original_df (pd.DataFrame): scratchpad df - customerId, customerName and one column per month
+    - override_df (pd.DataFrame): override df - customerId, customerName and one column per month
+
+    Returns:
+    - dict: customers (pd.MultiIndex), month_columns (list), original_values and override_values (customers x months np.ndarray),
+      in_original and in_override (np.ndarray - True for the customers with at least one row in the df)
+    """
+
+    month_columns = [col for col in input_override_df.columns if col not in CUSTOMER_KEY_COLUMNS]
+
+    (original_codes, override_codes), customers = encode_customers(input_original_df, input_override_df)
+
+    return {
+        'customers': customers,
+        'month_columns': month_columns,
+        'original_values': align_customer_months(input_original_df, original_codes, len(customers), month_columns),
+        'override_values': align_customer_months(input_override_df, override_codes, len(customers), month_columns),
+        'in_original': np.bincount(original_codes, minlength=len(customers)) > 0,
+        'in_override': np.bincount(override_codes, minlength=len(customers)) > 0,
+    }
+
+
+def create_reconciliation(input_original_df, input_override_df):
+    """
+    Reconciles the scratchpad (computed) and override (historical) dfs - difference of the override and scratchpad value
+    for each customer and month of the override, customers of both dfs (outer join)
+
+    Parameters:
+    - original_df (pd.DataFrame): scratchpad df - customerId, customerName and one column per month
+    - override_df (pd.DataFrame): override df - customerId, customerName and one column per month
+
+    Returns:
+    - dict:
+        recon_df (pd.DataFrame): customers with a difference in at least one month - columns of override_df (same as reconcile_overrides)
+        customer_totals (pd.DataFrame): customerId, customerName, difference (sum over the months), mismatchedMonths - for the rows of recon_df
+        month_totals (pd.Series): difference summed over the customers for each month of the override
+        total_difference (float): difference summed over the customers and months
+    """
+
+    aligned = align_reconciliation_frames(input_original_df, input_override_df)
+    customers, month_columns = aligned['customers'], aligned['month_columns']
+
+    difference = aligned['override_values'] - aligned['original_values']
+
+    # customers with at least one month with a difference - rows keep their position on the customer axis as index
+    mismatched = difference != 0
+    mismatched_rows = np.flatnonzero(mismatched.any(axis=1))
+
+    recon_df = pd.DataFrame(difference[mismatched_rows], columns=month_columns, index=mismatched_rows)
+    recon_df.insert(0, 'customerId', customers.get_level_values(0)[mismatched_rows])
+    recon_df.insert(1, 'customerName', customers.get_level_values(1)[mismatched_rows])
+
+    # columns in the order of the override df
+    recon_df = recon_df[list(input_override_df.columns)]
+
+    customer_totals = recon_df[CUSTOMER_KEY_COLUMNS].assign(difference=difference[mismatched_rows].sum(axis=1),
+                                                            mismatchedMonths=mismatched[mismatched_rows].sum(axis=1))
+
+    return {
+        'recon_df': recon_df,
+        'customer_totals': customer_totals,
+        'month_totals': pd.Series(difference.sum(axis=0), index=month_columns, name='difference'),
+        'total_difference': float(difference.sum()),
+    }
+
+
+def create_reconciliation_report(input_original_df, input_override_df, absolute_tolerance=RECON_ABSOLUTE_TOLERANCE, relative_tolerance=RECON_RELATIVE_TOLERANCE):
+    """
+    Tolerance aware reconciliation of the scratchpad (computed) and override (historical) dfs - a month is a mismatch if the
+    difference is above the absolute tolerance and above the relative tolerance of the larger of the two values.
+    Customers with at least one mismatched month are classified
+        missingInUpload : customer only in the override (historical) df
+        missingInHistory : customer only in the scratchpad (uploaded) df
+        timingShift : customer in both, two or more mismatched months with differences of opposite sign that net out (within the
+            tolerances of their absolute sum) - the same amount moved months
+        amountDelta : customer in both, any other mismatch
+    and ranked by the sum of the absolute differences of the mismatched months
+
+    Parameters:
+    - original_df (pd.DataFrame): scratchpad df - customerId, customerName and one column per month
+    - override_df (pd.DataFrame): override df - customerId, customerName and one column per month
+    - absolute_tolerance (float): differences up to this amount are not a mismatch
+    - relative_tolerance (float): differences up to this share of the larger value are not a mismatch
+
+    Returns:
+    - dict:
+        summary_df (pd.DataFrame): one row per mismatched customer in rank order - customerId, customerName, mismatchType, difference,
+            absoluteDifference, mismatchedMonths, firstMismatchMonth, lastMismatchMonth
+        type_summary_df (pd.DataFrame): customers, difference and absoluteDifference for each mismatch type
+        month_totals (pd.Series): difference of the mismatched months summed over the customers for each month
+        total_difference (float): difference of the mismatched months summed over the customers and months
+        differences (np.ndarray): mismatched customers x months difference, 0 for the months within the tolerances - rows in rank order
+        month_columns (list): month columns of the differences
+    """
+
+    aligned = align_reconciliation_frames(input_original_df, input_override_df)
+    customers, month_columns = aligned['customers'], aligned['month_columns']
+    original_values, override_values = aligned['original_values'], aligned['override_values']
+
+    difference = override_values - original_values
+    tolerance = np.maximum(absolute_tolerance, relative_tolerance * np.maximum(np.abs(original_values), np.abs(override_values)))
+    mismatched = np.abs(difference) > tolerance
+
+    mismatched_rows = np.flatnonzero(mismatched.any(axis=1))
+    mismatched = mismatched[mismatched_rows]
+    differences = np.where(mismatched, difference[mismatched_rows], 0)
+
+    # classification - a timing shift needs at least two mismatched months with differences of opposite sign that net out:
+    # the net difference is within the tolerances of the gross (absolute) difference of the mismatched months. The tolerance
+    # is not taken on the totals over the months - it would grow with the totals and hide a single month difference
+    net_differences = differences.sum(axis=1)
+    gross_differences = np.abs(differences).sum(axis=1)
+    net_tolerance = np.maximum(absolute_tolerance, relative_tolerance * gross_differences)
+    timing_shift = ((mismatched.sum(axis=1) >= 2) & (differences > 0).any(axis=1) & (differences < 0).any(axis=1)
+                    & (np.abs(net_differences) <= net_tolerance))
+    mismatch_types = np.select([~aligned['in_original'][mismatched_rows],
+                                ~aligned['in_override'][mismatched_rows],
+                                timing_shift],
+                               ['missingInUpload', 'missingInHistory', 'timingShift'], 'amountDelta')
+
+    # first and last mismatched month - via argmax of the mask (and of the reversed mask)
+    month_labels = np.asarray(month_columns, dtype=object)
+    first_months = month_labels[mismatched.argmax(axis=1)] if len(month_columns) else np.array([], dtype=object)
+    last_months = month_labels[len(month_columns) - 1 - mismatched[:, ::-1].argmax(axis=1)] if len(month_columns) else np.array([], dtype=object)
+
+    summary_df = pd.DataFrame({
+        'customerId': customers.get_level_values(0)[mismatched_rows],
+        'customerName': customers.get_level_values(1)[mismatched_rows],
+        'mismatchType': pd.Categorical(mismatch_types, categories=RECON_MISMATCH_TYPES),
+        'difference': differences.sum(axis=1),
+        'absoluteDifference': np.abs(differences).sum(axis=1),
+        'mismatchedMonths': mismatched.sum(axis=1),
+        'firstMismatchMonth': first_months,
+        'lastMismatchMonth': last_months,
+    })
+
+    # rank by the absolute difference - ties keep the customer order
+    rank_order = np.argsort(-summary_df['absoluteDifference'].to_numpy(), kind='stable')
+    summary_df = summary_df.take(rank_order).reset_index(drop=True)
+    differences = differences[rank_order]
+
+    type_summary_df = summary_df.groupby('mismatchType', observed=False).agg(customers=('customerId', 'size'),
+                                                                             difference=('difference', 'sum'),
+                                                                             absoluteDifference=('absoluteDifference', 'sum'))
+
+    return {
+        'summary_df': summary_df,
+        'type_summary_df': type_summary_df,
+        'month_totals': pd.Series(differences.sum(axis=0), index=month_columns, name='difference'),
+        'total_difference': float(differences.sum()),
+        'differences': differences,
+        'month_columns': month_columns,
+    }
+
+
+def get_reconciliation_page(report, page, page_size=RECON_PAGE_SIZE, mismatch_types=None):
+    """
+    Returns one page of the reconciliation report - only the rows of the page are materialized as frames.
+    The drill down grid is limited to the months between the first and last mismatched month of the page
+
+    Parameters:
+    - report (dict): reconciliation report (see create_reconciliation_report)
+    - page (int): page number (1 based) - limited to the available pages
+    - page_size (int): customers per page
+    - mismatch_types (list): mismatch types to include - all if None or empty
+
+    Returns:
+    - pd.DataFrame: summary rows of the page (index is the rank, 0 based)
+    - pd.DataFrame: customerId, customerName and the difference for each month of the page (index is the rank)
+    - int: number of pages
+    """
+
+    summary_df = report['summary_df']
+
+    positions = np.arange(len(summary_df))
+    if mismatch_types:
+        positions = positions[summary_df['mismatchType'].isin(mismatch_types).to_numpy()]
+
+    num_pages = max(1, int(np.ceil(len(positions) / page_size)))
+    page = min(max(int(page), 1), num_pages)
+    page_positions = positions[(page - 1) * page_size:page * page_size]
+
+    page_summary_df = summary_df.iloc[page_positions]
+    page_differences = report['differences'][page_positions]
+
+    # months between the first and last mismatched month of the page
+    mismatched_months = np.flatnonzero((page_differences != 0).any(axis=0))
+    month_slice = slice(mismatched_months[0], mismatched_months[-1] + 1) if len(mismatched_months) else slice(0, 0)
+
+    page_grid_df = pd.DataFrame(page_differences[:, month_slice], columns=report['month_columns'][month_slice], index=page_summary_df.index)
+    page_grid_df.insert(0, 'customerId', page_summary_df['customerId'])
+    page_grid_df.insert(1, 'customerName', page_summary_df['customerName'])
+
+    return page_summary_df, page_grid_df, num_pages
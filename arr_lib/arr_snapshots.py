@@ -0,0 +1,156 @@
+import os
+import shutil
+import pyarrow as pa
+from arr_lib.setup import SNAPSHOT_DIR_PATH, SNAPSHOT_DIR_BUDGET_BYTES
+from arr_lib.arr_cache import calculate_content_key
+from arr_lib.arr_sparse import densify_frame
+
+
+# Snapshot store for the computed ARR results
+# the result frames are written as uncompressed arrow (feather v2) files to a directory named after a content hash of the
+# mapped input - a later session with the same input reloads them memory mapped instead of recomputing.
+# The replanned frames are saved under their own key that also hashes the applied overrides and the edited scratchpad.
+# The directory is kept within a disk budget - the least recently saved or loaded snapshots are removed first
+
+
+# result frames kept in the snapshot (session state keys)
+SNAPSHOT_FRAME_KEYS = [
+    'customer_arr_waterfall_df', 'customer_arr_df', 'logo_metrics_df', 'metrics_df',
+    'replan_customer_arr_waterfall_df', 'replan_customer_arr_df', 'replan_logo_metrics_df', 'replan_metrics_df',
+]
+
+# changes with the layout of the result frames - old snapshots are not reused
+SNAPSHOT_VERSION = '1'
+
+
+def calculate_snapshot_key(*inputs):
+    """
+    Calculates the snapshot key - content hash of the analysis inputs (see calculate_content_key) and the snapshot version
+    """
+
+    return calculate_content_key(SNAPSHOT_VERSION, *inputs)
+
+
+def save_snapshot(snapshot_key, frames, snapshot_dir=SNAPSHOT_DIR_PATH):
+    """
+    Writes the result frames to the snapshot directory of the key - frames already in the snapshot are replaced
+
+    Parameters:
+    - snapshot_key (str): content hash of the inputs (see calculate_snapshot_key)
+    - frames (dict): session state key -> pd.DataFrame - empty frames are not written
+
+    Returns:
+    - bool: True if all the frames were written
+    """
+
+    snapshot_path = os.path.join(snapshot_dir, snapshot_key)
+    os.makedirs(snapshot_path, exist_ok=True)
+
+    all_written = True
+    for name, df in frames.items():
+        if df is None or df.empty:
+            continue
+        # e.g. mixed types in an object column - the analysis is not snapshotted
+        if not write_arrow_frame(df, os.path.join(snapshot_path, f'{name}.arrow')):
+            all_written = False
+            break
+
+    # most recently used snapshot - the others are removed first if the directory is over the budget
+    os.utime(snapshot_path)
+    prune_snapshots(snapshot_key, snapshot_dir=snapshot_dir)
+
+    return all_written
+
+
+def load_snapshot(snapshot_key, frame_keys=SNAPSHOT_FRAME_KEYS, snapshot_dir=SNAPSHOT_DIR_PATH):
+    """
+    Reads the result frames of the snapshot key - the arrow files are memory mapped
+
+    Parameters:
+    - snapshot_key (str): content hash of the inputs (see calculate_snapshot_key)
+    - frame_keys (list): session state keys of the frames to read
+
+    Returns:
+    - dict: session state key -> pd.DataFrame for the frames found in the snapshot (empty if there is no snapshot)
+    """
+
+    frames = {}
+
+    for name in frame_keys:
+        file_path = os.path.join(snapshot_dir, snapshot_key, f'{name}.arrow')
+        if not os.path.exists(file_path):
+            continue
+        frames[name] = read_arrow_frame(file_path)
+
+    # a loaded snapshot becomes the most recently used
+    if frames:
+        os.utime(os.path.join(snapshot_dir, snapshot_key))
+
+    return frames
+
+
+def prune_snapshots(keep_key=None, budget_bytes=None, snapshot_dir=SNAPSHOT_DIR_PATH):
+    """
+    Removes the least recently used snapshots (saved or loaded - modification time of the snapshot directory) until the
+    snapshot directory is within the disk budget. The snapshot of keep_key is removed last - only if it is larger than the budget
+
+    Parameters:
+    - keep_key (str): snapshot key that was just saved
+    - budget_bytes (int): disk budget - SNAPSHOT_DIR_BUDGET_BYTES if None
+
+    Returns:
+    - list: keys of the removed snapshots
+    """
+
+    budget_bytes = SNAPSHOT_DIR_BUDGET_BYTES if budget_bytes is None else budget_bytes
+
+    snapshots = []
+    for entry in os.scandir(snapshot_dir):
+        if not entry.is_dir():
+            continue
+        nbytes = sum(file.stat().st_size for file in os.scandir(entry.path) if file.is_file())
+        snapshots.append((entry.name == keep_key, entry.stat().st_mtime, entry.name, nbytes))
+
+    total_nbytes = sum(nbytes for *_, nbytes in snapshots)
+
+    removed_keys = []
+    for _, _, snapshot_key, nbytes in sorted(snapshots):
+        if total_nbytes <= budget_bytes:
+            break
+        # memory mapped files of a snapshot another session is reading stay readable until they are closed
+        shutil.rmtree(os.path.join(snapshot_dir, snapshot_key), ignore_errors=True)
+        total_nbytes -= nbytes
+        removed_keys.append(snapshot_key)
+
+    return removed_keys
+
+
+def write_arrow_frame(df, file_path):
+    """
+    Writes a df as an uncompressed arrow (feather v2) file - to a temporary file that is then renamed, so a reader never sees a partial file.
+    Sparse columns (sparse metrics backend) are written dense - arrow has no sparse column type
+
+    Returns:
+    - bool: False if the df cannot be converted to arrow (e.g. mixed types in an object column)
+    """
+
+    try:
+        table = pa.Table.from_pandas(densify_frame(df))
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return False
+
+    with pa.OSFile(file_path + '.tmp', 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(file_path + '.tmp', file_path)
+
+    return True
+
+
+def read_arrow_frame(file_path):
+    """
+    Reads a df written by write_arrow_frame - the file is memory mapped, the numeric columns are not copied 
+    """
+
+    with pa.memory_map(file_path, 'r') as source:
+        return pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True)
@@ -0,0 +1,336 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from arr_lib.setup import CUSTOMER_WATERFALL_MEASURE_TYPES
+from arr_lib.arr_analysis import calculate_contract_month_ranges, format_month_ordinals
+from arr_lib.arr_analysis import create_metrics_from_totals, create_logo_metrics_frame
+
+
+# Sparse backend for the customer x month revenue grid
+# the revenue grid and the customer waterfall grids are stored as scipy CSR matrices (customers x months) -
+# memory scales with the number of active customer months and not with customers x months
+
+
+def create_sparse_revenue_matrix_from_contracts(input_df):
+    """
+    Creates the customer x month revenue matrix as a sparse CSR matrix directly from the contract data
+
+    Parameters:
+    - df (pd.DataFrame): validated contract data DataFrame
+
+    Returns:
+    - sp.csr_matrix: customer x month revenue matrix
+    - pd.DataFrame: customerName, customerId for each row of the matrix (sorted by customerName, customerId)
+    - list: month column names (YYYY-MM) for each column of the matrix
+    """
+
+    df = input_df
+
+    start_ordinals, contract_months, contract_revenue = calculate_contract_month_ranges(df)
+
+    # contracts shorter than a month do not create any monthly revenue
+    valid = (contract_months > 0) & df['customerName'].notna().to_numpy() & df['customerId'].notna().to_numpy()
+    start_ordinals = start_ordinals[valid]
+    end_ordinals = start_ordinals + contract_months[valid]
+
+    # amounts are accumulated in cents - so that the churned months do not keep rounding residue
+    contract_cents = np.rint(contract_revenue[valid] * 100)
+
+    customer_keys = pd.MultiIndex.from_arrays([df['customerName'], df['customerId']])[valid]
+    customer_codes, customers = customer_keys.factorize(sort=True)
+
+    revenue_matrix, covered_ordinals = create_sparse_revenue_matrix_from_month_ranges(customer_codes, len(customers), start_ordinals,
+                                                                                      end_ordinals, contract_cents)
+
+    customers_df = pd.DataFrame({'customerName': customers.get_level_values(0), 'customerId': customers.get_level_values(1)})
+
+    return revenue_matrix, customers_df, list(format_month_ordinals(covered_ordinals))
+
+
+def create_sparse_revenue_matrix_from_month_ranges(customer_codes, num_customers, start_ordinals, end_ordinals, contract_cents):
+    """
+    Sparse version of create_revenue_matrix_from_month_ranges - the contract months are never expanded. Each contract adds its
+    monthly value at the start month and removes it after the end month (sparse difference array), the running sum over the
+    boundaries of a customer gives the revenue of each run of months between two boundaries. Only the months with revenue
+    are stored - once per customer month, not once per contract month
+
+    Parameters:
+    - customer_codes (np.ndarray): row position of the customer of each contract
+    - num_customers (int): number of rows of the matrix
+    - start_ordinals (np.ndarray): month ordinal of the first month of each contract
+    - end_ordinals (np.ndarray): month ordinal after the last month of each contract
+    - contract_cents (np.ndarray): monthly revenue of each contract in cents
+
+    Returns:
+    - sp.csr_matrix: customer x month revenue matrix - one column per covered month
+    - np.ndarray: month ordinal of each column of the matrix
+    """
+
+    first_month = start_ordinals.min() if len(start_ordinals) else 0
+    num_months = (end_ordinals.max() - first_month) if len(end_ordinals) else 0
+    width = num_months + 1
+
+    # only months covered by at least one contract become columns (same as pivot_table)
+    coverage = np.bincount(start_ordinals - first_month, minlength=width) - np.bincount(end_ordinals - first_month, minlength=width)
+    covered = coverage.cumsum()[:num_months] > 0
+    covered_months = np.flatnonzero(covered)
+    column_positions = np.cumsum(covered) - 1
+
+    # difference array - add at the start month, subtract after the end month. The integer cents are summed per customer
+    # and boundary month by the CSR conversion (ordered by customer and month)
+    boundaries = sp.csr_matrix((np.concatenate([contract_cents, -contract_cents]).astype(np.int64),
+                                (np.concatenate([customer_codes, customer_codes]),
+                                 np.concatenate([start_ordinals, end_ordinals]) - first_month)),
+                               shape=(num_customers, width))
+    boundaries.sum_duplicates()
+    boundaries.eliminate_zeros()
+
+    rows = np.repeat(np.arange(num_customers), np.diff(boundaries.indptr))
+    months = boundaries.indices
+
+    # running revenue after each boundary - the boundaries of a customer sum to 0 (every contract is closed), so the
+    # cumulative sum over all the boundaries restarts at 0 for each customer
+    running_cents = np.cumsum(boundaries.data)
+
+    # each boundary starts a run of months up to the next boundary of the customer - the last boundary closes all contracts
+    run_lengths = np.zeros(len(months), dtype=np.int64)
+    run_lengths[:-1] = np.where(rows[1:] == rows[:-1], months[1:] - months[:-1], 0)
+    run_lengths[running_cents == 0] = 0
+
+    # expanded once per customer month with revenue - already ordered by customer and month
+    run_offsets = np.arange(run_lengths.sum()) - np.repeat(np.cumsum(run_lengths) - run_lengths, run_lengths)
+    entry_months = np.repeat(months, run_lengths) + run_offsets
+    entry_rows = np.repeat(rows, run_lengths)
+
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(entry_rows, minlength=num_customers))])
+    revenue_matrix = sp.csr_matrix((np.repeat(running_cents, run_lengths) / 100, column_positions[entry_months], indptr),
+                                   shape=(num_customers, len(covered_months)))
+
+    return revenue_matrix, first_month + covered_months
+
+
+def to_sparse_revenue_matrix(input_df):
+    """
+    Converts a transposed customer revenue df (customerName, customerId, months ...) to the sparse representation
+
+    Parameters:
+    - df (pd.DataFrame): transposed monthly revenue for each customer
+
+    Returns:
+    - sp.csr_matrix: customer x month revenue matrix
+    - pd.DataFrame: customerName, customerId for each row of the matrix
+    - list: month column names for each column of the matrix
+    """
+
+    month_columns = [col for col in input_df.columns if col not in ('customerName', 'customerId', 'measureType')]
+
+    values = input_df[month_columns].apply(pd.to_numeric, errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+    revenue_matrix = sp.csr_matrix(values)
+    revenue_matrix.eliminate_zeros()
+
+    customers_df = input_df[['customerName', 'customerId']].reset_index(drop=True)
+
+    return revenue_matrix, customers_df, month_columns
+
+
+def calculate_sparse_customer_waterfall(revenue_matrix):
+    """
+    Calculates the customer level ARR waterfall on the sparse revenue matrix - only the stored (non-zero) entries are visited
+        newBusiness : revenue in a month where the previous month has no revenue (not for the first month)
+        upSell : increase over a non-zero previous month
+        downSell : decrease over a non-zero previous month, to a non-zero value
+        churn : previous month revenue lost in a month without revenue
+
+    Parameters:
+    - revenue_matrix (sp.csr_matrix): customer x month revenue matrix
+
+    Returns:
+    - dict: measureType -> sp.csr_matrix (customers x months) for monthlyRevenue, newBusiness, upSell, downSell and churn
+    """
+
+    revenue_matrix = sp.csr_matrix(revenue_matrix)
+    revenue_matrix.sum_duplicates()
+    revenue_matrix.eliminate_zeros()
+    revenue_matrix.sort_indices()
+
+    num_customers, num_months = revenue_matrix.shape
+
+    # coordinates of the stored entries - ordered by customer and month
+    rows = np.repeat(np.arange(num_customers), np.diff(revenue_matrix.indptr))
+    cols = revenue_matrix.indices
+    values = revenue_matrix.data
+
+    # an entry has a previous (next) month value if the previous (next) stored entry is the same customer and the adjacent month
+    has_prev = np.zeros(len(values), dtype=bool)
+    has_prev[1:] = (rows[1:] == rows[:-1]) & (cols[1:] == cols[:-1] + 1)
+    has_next = np.zeros(len(values), dtype=bool)
+    has_next[:-1] = has_prev[1:]
+
+    prev_values = np.zeros(len(values))
+    prev_values[1:] = values[:-1]
+    prev_values[~has_prev] = 0
+    delta = values - prev_values
+
+    def _to_matrix(mask, data, col_shift=0):
+        return sp.csr_matrix((data[mask], (rows[mask], cols[mask] + col_shift)), shape=(num_customers, num_months))
+
+    new_business_mask = ~has_prev & (cols > 0)
+    up_sell_mask = has_prev & (delta > 0)
+    down_sell_mask = has_prev & (delta < 0)
+
+    # churn is recorded in the month after the last month with (positive) revenue
+    churn_mask = ~has_next & (cols < num_months - 1) & (values > 0)
+
+    return {
+        'monthlyRevenue': revenue_matrix,
+        'newBusiness': _to_matrix(new_business_mask, values),
+        'upSell': _to_matrix(up_sell_mask, delta),
+        'downSell': _to_matrix(down_sell_mask, delta),
+        'churn': _to_matrix(churn_mask, -values, col_shift=1),
+    }
+
+
+def create_sparse_arr_metrics(revenue_matrix, month_columns):
+    """
+    Calculates the aggregated ARR metrics and the logo waterfall from the sparse customer waterfall -
+    column sums and non-zero counts of the sparse grids, no dense customer x month grid is created
+
+    Parameters:
+    - revenue_matrix (sp.csr_matrix): customer x month revenue matrix
+    - month_columns (list): month column names
+
+    Returns:
+    - dict: sparse customer waterfall (see calculate_sparse_customer_waterfall)
+    - pd.DataFrame: logo waterfall (same as calculate_logo_count_waterfall)
+    - pd.DataFrame: aggregated metrics (same as the metrics df of create_customer_and_aggregated_metrics)
+    """
+
+    waterfall = calculate_sparse_customer_waterfall(revenue_matrix)
+
+    # aggregated metrics - monthly totals of each waterfall grid
+    totals = np.vstack([np.asarray(waterfall[measure].sum(axis=0)).ravel() for measure in CUSTOMER_WATERFALL_MEASURE_TYPES])
+    df_agg = create_metrics_from_totals(totals, month_columns)
+
+    # logo waterfall - monthly count of the stored (non-zero) entries
+    df_logo_waterfall = create_logo_metrics_frame(waterfall['monthlyRevenue'].getnnz(axis=0),
+                                                  waterfall['newBusiness'].getnnz(axis=0),
+                                                  waterfall['churn'].getnnz(axis=0),
+                                                  month_columns)
+
+    return waterfall, df_logo_waterfall, df_agg
+
+
+def sparse_waterfall_to_df(waterfall, customers_df, month_columns, customer_rows=None):
+    """
+    Converts the sparse customer waterfall (or a subset of its customers) to the cust_arr_waterfall_df structure -
+    the month columns are pandas sparse columns (Sparse[float64, 0]), only the non-zero cells are stored
+
+    Parameters:
+    - waterfall (dict): sparse customer waterfall (see calculate_sparse_customer_waterfall)
+    - customers_df (pd.DataFrame): customerName, customerId for each row of the grids
+    - month_columns (list): month column names
+    - customer_rows (array like): optional - row positions of the customers to convert, all customers if None
+
+    Returns:
+    - pd.DataFrame: customerName, customerId, measureType and one column per month - sorted by customer and measureType
+    """
+
+    if customer_rows is None:
+        customer_rows = np.arange(len(customers_df))
+    customer_rows = np.asarray(customer_rows)
+
+    num_customers = len(customer_rows)
+    num_measures = len(CUSTOMER_WATERFALL_MEASURE_TYPES)
+
+    # measures stacked one below the other, then reordered so that the measures of a customer are adjacent rows
+    stacked = sp.vstack([waterfall[measure][customer_rows] for measure in CUSTOMER_WATERFALL_MEASURE_TYPES]).tocsr()
+    interleaved_rows = (np.arange(num_measures)[None, :] * num_customers + np.arange(num_customers)[:, None]).ravel()
+
+    df = pd.DataFrame.sparse.from_spmatrix(stacked[interleaved_rows], columns=list(month_columns))
+    df.insert(0, 'customerName', np.repeat(customers_df['customerName'].to_numpy()[customer_rows], num_measures))
+    df.insert(1, 'customerId', np.repeat(customers_df['customerId'].to_numpy()[customer_rows], num_measures))
+    df.insert(2, 'measureType', pd.Categorical(np.tile(CUSTOMER_WATERFALL_MEASURE_TYPES, num_customers), categories=CUSTOMER_WATERFALL_MEASURE_TYPES, ordered=True))
+
+    return df
+
+
+def sparse_revenue_matrix_to_df(revenue_matrix, customers_df, month_columns):
+    """
+    Converts the sparse revenue matrix to the customer_arr_df structure sorted by first month of sales (same order as
+    sort_by_first_month_of_sales) - the month columns are pandas sparse columns (Sparse[float64, 0])
+
+    Parameters:
+    - revenue_matrix (sp.csr_matrix): customer x month revenue matrix - month columns in ascending order
+    - customers_df (pd.DataFrame): customerName, customerId for each row of the matrix
+    - month_columns (list): month column names
+
+    Returns:
+    - pd.DataFrame: customerName, customerId and one column per month
+    """
+
+    revenue_matrix = sp.csr_matrix(revenue_matrix)
+    revenue_matrix.eliminate_zeros()
+    revenue_matrix.sort_indices()
+
+    num_customers, num_months = revenue_matrix.shape
+    has_sales = np.diff(revenue_matrix.indptr) > 0
+
+    # first and last stored month of each customer (see calculate_sales_month_range) - the stored months are in ascending order,
+    # customers without sales get the first month and the number of months (sorted after the customers of the first month)
+    first_non_zero_month = np.zeros(num_customers, dtype=np.int64)
+    first_non_zero_month[has_sales] = revenue_matrix.indices[revenue_matrix.indptr[:-1][has_sales]]
+    last_non_zero_month = np.full(num_customers, num_months, dtype=np.int64)
+    last_non_zero_month[has_sales] = revenue_matrix.indices[revenue_matrix.indptr[1:][has_sales] - 1]
+
+    # customerId as sortable integer codes (missing ids last)
+    customer_codes, _ = pd.factorize(customers_df['customerId'], sort=True)
+    customer_codes = np.where(customer_codes < 0, num_customers, customer_codes)
+
+    sort_order = np.lexsort((customer_codes, last_non_zero_month, first_non_zero_month))
+
+    df = pd.DataFrame.sparse.from_spmatrix(revenue_matrix[sort_order], columns=list(month_columns))
+    df.insert(0, 'customerName', customers_df['customerName'].to_numpy()[sort_order])
+    df.insert(1, 'customerId', customers_df['customerId'].to_numpy()[sort_order])
+
+    return df
+
+
+def densify_frame(input_df):
+    """
+    Converts the sparse columns of a df (e.g. a page of a sparse backend grid) to dense columns - for display, editing
+    and arrow files. Dfs without sparse columns are returned as is
+
+    Parameters:
+    - df (pd.DataFrame): df with or without sparse columns
+
+    Returns:
+    - pd.DataFrame: same df with dense columns
+    """
+
+    sparse_dtypes = {col: dtype.subtype for col, dtype in input_df.dtypes.items() if isinstance(dtype, pd.SparseDtype)}
+
+    return input_df.astype(sparse_dtypes) if sparse_dtypes else input_df
+
+
+def create_sparse_arr_metrics_from_contracts(input_df):
+    """
+    Sparse backend of create_arr_metrics_from_contracts - the revenue matrix, the customer waterfall and the aggregated
+    metrics are calculated on CSR matrices. The customer level dfs have sparse month columns (Sparse[float64, 0]), so their
+    memory scales with the active customer months - pages are densified for display (densify_frame)
+
+    Parameters:
+    - df (pd.DataFrame): validated contract data DataFrame
+
+    Returns: 4 data frames - same as create_arr_metrics_from_contracts, with sparse month columns in the customer level dfs
+    """
+
+    revenue_matrix, customers_df, month_columns = create_sparse_revenue_matrix_from_contracts(input_df)
+
+    waterfall, df_logo_waterfall, df_agg = create_sparse_arr_metrics(revenue_matrix, month_columns)
+
+    df_cust_arr_waterfall = sparse_waterfall_to_df(waterfall, customers_df, month_columns)
+
+    # monthlyRevenue for the customer level details - sorted by first month of sales
+    df_rr = sparse_revenue_matrix_to_df(revenue_matrix, customers_df, month_columns)
+
+    return df_cust_arr_waterfall, df_rr, df_logo_waterfall, df_agg
@@ -11,83 +11,207 @@ def validate_input_data(input_df):
         1. Validates all the columns 
         2. Validates dates columns with the specified date format
 
+    All the checks run in one pass (see create_validation_report) and every failed check is reported 
+
     Parameters:
     - df (pd.DataFrame): Original contract data DataFrame.
 
     Returns:
-    - pd.DataFrame: Processed DataFrame one row for each month - for the customer and contract 
+    - bool: True if all the rows are valid 
     """
-    # Check if the required columns are present
 
-    required_columns = PREDEFINED_COLUMN_HEADERS + ['startDateFormat', 'endDateFormat']
-    df = input_df
+    _, validation_report = create_validation_report(input_df)
 
-    # required_columns = ['customerId', 'contractId', 'contractStartDate', 'contractEndDate', 'totalContractValue', 'startDateFormat', 'endDateFormat']
-    try:
-        if not all(col in df.columns for col in required_columns):
-            raise ValueError("Columns 'customerId', 'customerName', 'contractId', 'contractStartDate', 'contractEndDate', 'totalContractValue', 'startDateFormat', and 'endDateFormat' are required columns")
-    except:
-        st.error("Columns 'customerId', 'customerName', 'contractId', 'contractStartDate', 'contractEndDate', 'totalContractValue', 'startDateFormat', and 'endDateFormat' are required columns")
-        return False
-    
-    # Check if 'customeId' column has a value for all rows
-    if not df['customerId'].notna().all():
-        st.error("Not all rows have values in the 'customerID' column.")
-        return False
+    for rule in validation_report['rules']:
+        if rule['count'] > 0:
+            st.error(f"{rule['message']} - {rule['count']} rows: {format_row_index(rule['rows'])}")
 
-    # Check if 'customeName' column has a value for all rows
-    if not df['customerName'].notna().all():
-        st.error("Not all rows have values in the 'customerName' column.")
-        return False
+    return validation_report['num_rejected'] == 0
 
 
-    # Validate date formats in 'contractStartDate' and 'contractEndDate'
+def create_validation_report(input_df, max_rows=10):
+    """
+    Runs all the validations of the uploaded contract data as vectorized masks in one pass 
+        1. required columns 
+        2. customerId and customerName have values 
+        3. contractStartDate and contractEndDate are valid for the selected date format 
+        4. contract duration is positive 
+        5. totalContractValue is numeric 
 
-    # Convert the date formats to pandas date format 
-    df['startDateFormat'] = df['startDateFormat'].map(PREDEFINED_DATE_FORMAT_MAP)
-    df['endDateFormat'] = df['endDateFormat'].map(PREDEFINED_DATE_FORMAT_MAP)
+    The dates are converted, contractDuration is calculated and totalContractValue is converted to numeric in a shallow copy
+    of the df - the converted df is returned with the report, the caller's df is not modified
 
+    Parameters:
+    - df (pd.DataFrame): mapped contract data DataFrame 
+    - max_rows (int): number of offending row indices kept for each rule 
 
+    Returns:
+    - pd.DataFrame: converted df (dates, contractDuration, numeric totalContractValue)
+    - dict: validation report 
+        - rules: list of {rule, message, count, rows (first max_rows row indices)}
+        - rejected: boolean pd.Series - True for the rows that failed at least one rule 
+        - num_rows, num_rejected 
+        - missing_columns: required columns that are not in the df 
+    """
 
-    # Use pd.to_datetime to validate and convert the 'startDate' column
-    try:
-        df['contractStartDate'] = df.apply(lambda row: pd.to_datetime(row['contractStartDate'], format=row['startDateFormat'], errors='coerce'), axis=1)
-        if df['contractStartDate'].isna().any():
-            raise ValueError("Invalid date format in 'contractStartDate' column for the selected format")
-    except:
-        st.error("Invalid date format in 'contractStartDate' column for the selected format")
-        return False
+    required_columns = PREDEFINED_COLUMN_HEADERS
+    df = input_df.copy(deep=False)
 
-    # Use pd.to_datetime to validate and convert the 'startDate' column
-    try:
-        df['contractEndDate'] = df.apply(lambda row: pd.to_datetime(row['contractEndDate'], format=row['endDateFormat'], errors='coerce'), axis=1)
-        if df['contractEndDate'].isna().any():
-            raise ValueError("Invalid date format in 'contractEndDate' column for the selected format")
-    except:
-        st.error("Invalid date format in 'contractEndDate' column for the selected format")
-        return False
-        
-    # Calculate the contract duration in months
+    def _rule(rule, message, mask):
+        return {'rule': rule, 'message': message, 'count': int(mask.sum()), 'rows': list(df.index[mask.to_numpy()][:max_rows])}
+
+    # date formats are frame metadata set by map_columns (older frames carry them as startDateFormat / endDateFormat columns)
+    date_formats = get_date_formats(df)
+
+    # Check if the required columns are present - none of the other checks can run without them 
+    missing_columns = [col for col in required_columns if col not in df.columns]
+    missing_columns += [f'{col} date format' for col in ['contractStartDate', 'contractEndDate'] if date_formats[col] is None]
+    if missing_columns:
+        rejected = pd.Series(True, index=df.index)
+        rules = [_rule('requiredColumns', f"Missing required columns: {', '.join(missing_columns)}", rejected)]
+        return df, {'rules': rules, 'rejected': rejected, 'num_rows': len(df), 'num_rejected': len(df), 'missing_columns': missing_columns}
+
+    # Check if 'customeId' and 'customerName' columns have a value for all rows
+    missing_customer_id = df['customerId'].isna()
+    missing_customer_name = df['customerName'].isna()
+
+    # Use pd.to_datetime to validate and convert the date columns - one to_datetime call per distinct date format
+    df['contractStartDate'] = parse_dates_by_format(df['contractStartDate'], date_formats['contractStartDate'])
+    df['contractEndDate'] = parse_dates_by_format(df['contractEndDate'], date_formats['contractEndDate'])
+    invalid_start_date = df['contractStartDate'].isna()
+    invalid_end_date = df['contractEndDate'].isna()
+
+    # Calculate the contract duration in days - only checked when both dates are valid 
     df['contractDuration'] = (df['contractEndDate'] - df['contractStartDate']).dt.days 
+    invalid_duration = ~(df['contractDuration'] > 0) & ~invalid_start_date & ~invalid_end_date
 
-    # Validate contract duration
-    try:
-        valid_contract_duration = df['contractDuration'] > 0
-        print(valid_contract_duration)
-        if not valid_contract_duration.all():
-            raise ValueError("Invalid contract duration. 'contractEndDate' should be later than 'contractStartDate'.")
-    except:
-        st.error("Invalid contract duration. 'contractEndDate' should be later than 'contractStartDate'.")
-        return False
-    
     # Validate contract value column
-    try:
-        if not pd.to_numeric(df['totalContractValue'], errors='coerce').notna().all():
-            raise ValueError("Invalid 'totalContractValue'. It must contain numeric values.")
-    except: 
-        st.error("Invalid 'totalContractValue'. It must contain numeric values.")
-        return False
-    return True
+    df['totalContractValue'] = pd.to_numeric(df['totalContractValue'], errors='coerce')
+    invalid_contract_value = df['totalContractValue'].isna()
+
+    rules = [
+        _rule('customerId', "Not all rows have values in the 'customerID' column.", missing_customer_id),
+        _rule('customerName', "Not all rows have values in the 'customerName' column.", missing_customer_name),
+        _rule('contractStartDate', "Invalid date format in 'contractStartDate' column for the selected format", invalid_start_date),
+        _rule('contractEndDate', "Invalid date format in 'contractEndDate' column for the selected format", invalid_end_date),
+        _rule('contractDuration', "Invalid contract duration. 'contractEndDate' should be later than 'contractStartDate'.", invalid_duration),
+        _rule('totalContractValue', "Invalid 'totalContractValue'. It must contain numeric values.", invalid_contract_value),
+    ]
+
+    rejected = missing_customer_id | missing_customer_name | invalid_start_date | invalid_end_date | invalid_duration | invalid_contract_value
+
+    return df, {'rules': rules, 'rejected': rejected, 'num_rows': len(df), 'num_rejected': int(rejected.sum()), 'missing_columns': []}
+
+
+def validation_report_to_df(validation_report):
+    """
+    Returns the validation report as a df - one row per rule with the number of rows and the first offending row indices 
+    """
+
+    return pd.DataFrame({
+        'Check': [rule['rule'] for rule in validation_report['rules']],
+        'Message': [rule['message'] for rule in validation_report['rules']],
+        'Rejected Rows': [rule['count'] for rule in validation_report['rules']],
+        'First Rows': [format_row_index(rule['rows']) for rule in validation_report['rules']],
+    }).set_index('Check')
+
+
+def select_valid_rows(input_df, validation_report):
+    """
+    Returns only the rows of the df that passed all the validations - uses the rejected mask of the report, the checks are not re-run 
+    """
+
+    rejected = validation_report['rejected'].reindex(input_df.index, fill_value=False)
+
+    return input_df[~rejected.to_numpy()]
+
+
+def merge_validation_reports(validation_reports, max_rows=10):
+    """
+    Combines the validation reports of consecutive chunks of the same file (streaming ingestion) into one report - 
+    the rule counts are summed and the first max_rows offending row indices are kept for each rule 
+
+    Note: the rejected mask of the merged report only holds the rejected rows (all True) - select_valid_rows 
+    reindexes the mask, so the other rows are treated as valid
+
+    Parameters:
+    - validation_reports (list): validation reports of the chunks (see create_validation_report)
+    - max_rows (int): number of offending row indices kept for each rule 
+
+    Returns:
+    - dict: validation report (same structure as create_validation_report)
+    """
+
+    rules = {}
+    for validation_report in validation_reports:
+        for rule in validation_report['rules']:
+            merged_rule = rules.setdefault(rule['rule'], {'rule': rule['rule'], 'message': rule['message'], 'count': 0, 'rows': []})
+            merged_rule['count'] += rule['count']
+            merged_rule['rows'] = (merged_rule['rows'] + list(rule['rows']))[:max_rows]
+
+    rejected = [validation_report['rejected'][validation_report['rejected']] for validation_report in validation_reports]
+    missing_columns = [col for validation_report in validation_reports for col in validation_report['missing_columns']]
+
+    return {
+        'rules': list(rules.values()),
+        'rejected': pd.concat(rejected) if rejected else pd.Series(dtype=bool),
+        'num_rows': sum(validation_report['num_rows'] for validation_report in validation_reports),
+        'num_rejected': sum(validation_report['num_rejected'] for validation_report in validation_reports),
+        'missing_columns': list(dict.fromkeys(missing_columns)),
+    }
+
+
+def get_date_formats(df):
+    """
+    Returns the pandas date formats of the contractStartDate and contractEndDate columns - from the frame metadata set by 
+    map_columns, or from the startDateFormat / endDateFormat columns. None if the format is not selected 
+
+    Returns:
+    - dict: contractStartDate / contractEndDate -> pandas date format (str), or pd.Series of formats for the column based frames 
+    """
+
+    date_formats = {}
+    for date_column, format_column in [('contractStartDate', 'startDateFormat'), ('contractEndDate', 'endDateFormat')]:
+        if format_column in df.columns:
+            date_formats[date_column] = df[format_column].map(PREDEFINED_DATE_FORMAT_MAP)
+        else:
+            date_formats[date_column] = PREDEFINED_DATE_FORMAT_MAP.get(df.attrs.get('dateFormats', {}).get(date_column))
+
+    return date_formats
+
+
+def parse_dates_by_format(date_values, date_formats):
+    """
+    Parses a date column with a (pandas) date format - either one format for the whole column or a format per row, 
+    in which case the rows are grouped by format and to_datetime is called once per distinct format 
+
+    Parameters:
+    - date_values (pd.Series): date values to parse 
+    - date_formats (str or pd.Series): pandas date format for the column or for each row 
+
+    Returns:
+    - pd.Series: parsed dates (NaT for the invalid rows)
+    """
+
+    if isinstance(date_formats, str):
+        return pd.to_datetime(date_values, format=date_formats, errors='coerce')
+
+    parsed_dates = pd.Series(pd.NaT, index=date_values.index, dtype='datetime64[ns]')
+
+    for date_format, rows in date_formats.groupby(date_formats, sort=False).groups.items():
+        parsed_dates.loc[rows] = pd.to_datetime(date_values.loc[rows], format=date_format, errors='coerce')
+
+    return parsed_dates
+
+
+def format_row_index(row_index, max_rows=10):
+    """
+    Formats the first max_rows row indices for an error message
+    """
+    row_list = ', '.join(str(row) for row in row_index[:max_rows])
+
+    return row_list + (' ...' if len(row_index) > max_rows else '')
+
 
 def validate_mapping(column_names, predefined_date_formats, df):
 
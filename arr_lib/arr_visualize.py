@@ -9,10 +9,8 @@ def get_list_of_months(df, descending):
     """
     Given a dataframe with a column name called months - returns distinct months 
     """
-    inpput_df = df.copy()
-
-    # Melting the DataFrame
-    inpput_df = inpput_df.melt(id_vars='measureType', var_name='month', value_name='value')
+    # Melting the DataFrame - melt returns a new frame, df is not modified
+    inpput_df = df.melt(id_vars='measureType', var_name='month', value_name='value')
 
     # Sorting the unique months
     month_columns = sorted(inpput_df['month'].unique(), reverse = descending)
@@ -42,15 +40,13 @@ def get_core_arr_metrics (df_agg, df_logo, selected_month):
     """
 
 
-    input_df_agg = df_agg.copy()
-    input_df_agg = input_df_agg.melt(id_vars='measureType', var_name='month', value_name='value')
+    input_df_agg = df_agg.melt(id_vars='measureType', var_name='month', value_name='value')
     filtered_data = input_df_agg[input_df_agg['month'] == selected_month].fillna(0) 
 
     # Get the current date to calculate the last 12 and 24 months
     selected_month_date = pd.to_datetime(selected_month) + MonthEnd(0)
 
-    inpput_df_logo = df_logo.copy()
-    logo_df = inpput_df_logo.melt(id_vars='measureType', var_name='month', value_name='value')
+    logo_df = df_logo.melt(id_vars='measureType', var_name='month', value_name='value')
     logo_df['month'] = pd.to_datetime(logo_df['month']) + MonthEnd(0)
 
     # ARR metrics 
@@ -107,5 +103,24 @@ def get_core_arr_metrics (df_agg, df_logo, selected_month):
     gr *= 100
     gr = "{:,.2f}%".format(gr)
 
-    return arr, arr_growth, logo_cnt, logo_growth, churn_cnt, churn_growth, nr, gr 
- 
\ No newline at end of file
+    return arr, arr_growth, logo_cnt, logo_growth, churn_cnt, churn_growth, nr, gr
+
+
+def get_multi_horizon_retention(df_agg, selected_month, horizons):
+    """
+    Returns the gross retention, net retention and revenue growth of the selected month for each of the horizons (in months)
+    - one row per horizon, formatted as % 
+    """
+
+    df = df_agg.set_index('measureType')
+
+    rows = []
+    for horizon in horizons:
+        row = {'Horizon': f'{horizon} months'}
+        for measure, label in [('grossRetentionRate', 'Gross Retention (GRR)'), ('netRetentionRate', 'Net Retention (NRR)'), ('revenueGrowth', 'Revenue Growth')]:
+            value = df.loc[f'{measure}{horizon}M', selected_month] if f'{measure}{horizon}M' in df.index else None
+            row[label] = "{:,.2f}%".format(value * 100) if not pd.isnull(value) else None
+        rows.append(row)
+
+    return pd.DataFrame(rows).set_index('Horizon')
+
@@ -1,13 +1,16 @@
 import pandas as pd
-import streamlit as st 
 
 
 # returns a new dataframe with the column header names changed as per the column mapping performed by the user
-@st.cache_data
 def map_columns(df, column_mapping_df):
     """
     Map columns in the DataFrame according to the provided mapping.
 
+    The mapped columns reuse the buffers of the original columns (no conversion to lists, dtypes are kept) - 
+    the date formats are stored once as frame metadata: df.attrs['dateFormats'] = {'contractStartDate': .., 'contractEndDate': ..}
+
+    Note: not cached with st.cache_data - hashing and pickling the upload costs more than the select / rename 
+
     Parameters:
     - df (pd.DataFrame): Original DataFrame.
     - column_mapping (dict): Dictionary mapping predefined columns to user-selected columns.
@@ -18,14 +21,23 @@ def map_columns(df, column_mapping_df):
 
     column_mapping = column_mapping_df.set_index('columnHeaders')['columnNames'].to_dict()
 
-    new_df = pd.DataFrame({key: df[value].tolist() for key, value in column_mapping.items()})
+    # select / rename - the same file column can be mapped to more than one data element
+    new_df = pd.DataFrame({key: df[value] for key, value in column_mapping.items()}, copy=False)
 
-    st_format = column_mapping_df.loc[column_mapping_df['columnHeaders']=='contractStartDate', 'dateFormat'].iloc[0]
-    end_format =  column_mapping_df.loc[column_mapping_df['columnHeaders'] == 'contractEndDate', 'dateFormat'].iloc[0]
-
-    new_df['startDateFormat'] = st_format
-    new_df['endDateFormat'] = end_format
+    new_df.attrs['dateFormats'] = get_mapped_date_formats(column_mapping_df)
 
     return new_df
 
 
+def get_mapped_date_formats(column_mapping_df):
+    """
+    Returns the date formats selected in the column mapping 
+
+    Returns:
+    - dict: contractStartDate / contractEndDate -> date format (as displayed, e.g. mm/dd/yy)
+    """
+
+    st_format = column_mapping_df.loc[column_mapping_df['columnHeaders']=='contractStartDate', 'dateFormat'].iloc[0]
+    end_format =  column_mapping_df.loc[column_mapping_df['columnHeaders'] == 'contractEndDate', 'dateFormat'].iloc[0]
+
+    return {'contractStartDate': st_format, 'contractEndDate': end_format}
@@ -1,13 +1,15 @@
 import streamlit as st
 import pandas as pd
 from arr_lib.column_mapping import map_columns
-from arr_lib.arr_validations import validate_input_data
+from arr_lib.arr_validations import create_validation_report
 from arr_lib.arr_validations import validate_mapping
+from arr_lib.arr_ingestion import read_typed_contracts
+from arr_lib.session_store import put_session_frame, get_session_frame
 import os
 
 
-# column mapper with dateformat picker
-def perform_column_mapping(predefined_columns, predefined_date_formats, input_df):
+# column mapper with dateformat picker - with typed_upload_file the mapped data is read from the upload by the typed (pyarrow) reader
+def perform_column_mapping(predefined_columns, predefined_date_formats, input_df, typed_upload_file=None):
 
 
     # Column names from the DataFrame
@@ -114,15 +116,23 @@ def perform_column_mapping(predefined_columns, predefined_date_formats, input_df
         
             # change the column header of the input_df based on mapped column
             if result_df is not None:
-                mapped_df = map_columns (input_df, result_df)
-                st.session_state.mapped_df = mapped_df
+                if typed_upload_file is not None:
+                    mapped_df = read_typed_contracts(typed_upload_file, result_df)
+                else:
+                    mapped_df = map_columns (input_df, result_df)
 
-                validation_status = validate_input_data(st.session_state.mapped_df)
-                st.session_state.column_mapping_status = validation_status
+                # column map of the mapped data - part of the pipeline cache key of the mapped data 
+                st.session_state.mapped_column_map_df = result_df
 
-            return st.session_state.mapped_df, st.session_state.column_mapping_status
+                # run all the checks once - the report is displayed on the home page, the converted df is kept
+                mapped_df, validation_report = create_validation_report(mapped_df)
+                put_session_frame(st.session_state, 'mapped_df', mapped_df)
+                st.session_state.validation_report = validation_report
+                st.session_state.column_mapping_status = validation_report['num_rejected'] == 0
+
+            return get_session_frame(st.session_state, 'mapped_df'), st.session_state.column_mapping_status
         else: 
             # # initialize validation status
             if 'column_mapping_status' not in st.session_state:
                     st.session_state.column_mapping_status = False
-            return st.session_state.mapped_df, st.session_state.column_mapping_status
+            return get_session_frame(st.session_state, 'mapped_df'), st.session_state.column_mapping_status
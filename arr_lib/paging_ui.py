@@ -0,0 +1,46 @@
+import streamlit as st
+from arr_lib.setup import GRID_PAGE_SIZES
+from arr_lib.arr_paging import get_month_columns, search_grid_rows, filter_customer_grid, slice_grid_page
+from arr_lib.arr_sparse import densify_frame
+
+
+# paging controls for the large grids - search, month window, sort by total, page size and page.
+# Returns only the rows (and months) of the page being viewed, the caller displays them
+def render_grid_page(input_df, key, customer_grid=True):
+    """
+    Renders the paging controls of a grid and returns the page to display
+
+    Parameters:
+    - df (pd.DataFrame): grid - customer grid (customerName, customerId and one column per month) or any df (e.g. the upload)
+    - key (str): prefix of the widget keys - one per grid
+    - customer_grid (bool): customer grid controls (month window, sort by total) - otherwise search and paging only
+
+    Returns:
+    - pd.DataFrame: rows of the page - dense columns (a sparse grid is densified page by page)
+    """
+
+    search_col, size_col, page_col = st.columns([4, 1, 1])
+    search = search_col.text_input('Search customer name / id' if customer_grid else 'Search', key=f'{key}_search')
+    page_size = size_col.selectbox('Rows per page', GRID_PAGE_SIZES, key=f'{key}_page_size')
+
+    if customer_grid:
+        month_columns = sorted(str(col) for col in get_month_columns(input_df))
+        window_col, sort_col = st.columns([5, 1])
+        month_window = None
+        # a window of a previous grid with other months is reset
+        if not set(st.session_state.get(f'{key}_months', ())) <= set(month_columns):
+            del st.session_state[f'{key}_months']
+        if len(month_columns) > 1:
+            month_window = window_col.select_slider('Months', month_columns, value=(month_columns[0], month_columns[-1]), key=f'{key}_months')
+        sort_by_total = sort_col.checkbox('Sort by total', key=f'{key}_sort_by_total')
+        filtered_df = filter_customer_grid(input_df, search, month_window, sort_by_total)
+    else:
+        # any column of the grid can match (e.g. the unmapped columns of the upload)
+        filtered_df = search_grid_rows(input_df, search, list(input_df.columns))
+
+    page = page_col.number_input('Page', min_value=1, value=1, step=1, key=f'{key}_page')
+    page_df, page, num_pages = slice_grid_page(filtered_df, page, page_size)
+
+    st.caption(f"Page {page} of {num_pages} - {len(filtered_df):,} of {len(input_df):,} rows")
+
+    return densify_frame(page_df)
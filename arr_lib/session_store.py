@@ -0,0 +1,185 @@
+import os
+import uuid
+import shutil
+import pandas as pd
+from arr_lib.setup import SESSION_MEMORY_BUDGET_BYTES
+from arr_lib.setup import SESSION_SPILL_DIR_PATH
+from arr_lib.arr_cache import estimate_nbytes
+from arr_lib.arr_snapshots import write_arrow_frame, read_arrow_frame
+
+
+# Memory budgeted store for the frames of a user session
+# the byte size of every frame in the session state is tracked (and of the dicts of frames and arrays - e.g. the incremental
+# replan state) - above the session memory ceiling, the intermediate frames
+# whose downstream results exist are spilled to disk (arrow files) and replaced by an empty frame in the session state.
+# A spilled frame is reloaded (memory mapped) when it is read with get_session_frame
+
+
+# intermediate frame -> downstream frame - the intermediate frame can be spilled once the downstream frame exists
+SESSION_SPILL_RULES = {
+    'df': 'mapped_df',
+    'mapped_df': 'metrics_df',
+}
+
+# session state key of the store details - spilled frames and tracked sizes
+SESSION_STORE_KEY = 'session_store'
+
+
+def get_session_store(session):
+    """
+    Returns the store details of the session - created on first use
+
+    Returns:
+    - dict: store_id, spilled (key -> {path, nbytes, attrs}), sizes (key -> (id of the frame, nbytes))
+    """
+
+    if SESSION_STORE_KEY not in session:
+        session[SESSION_STORE_KEY] = {'store_id': uuid.uuid4().hex, 'spilled': {}, 'sizes': {}}
+
+    return session[SESSION_STORE_KEY]
+
+
+def put_session_frame(session, key, df):
+    """
+    Stores a frame in the session state - replaces the spilled version of the key, if any
+    """
+
+    store = get_session_store(session)
+
+    spilled = store['spilled'].pop(key, None)
+    if spilled is not None and os.path.exists(spilled['path']):
+        os.remove(spilled['path'])
+
+    session[key] = df
+
+
+def get_session_frame(session, key, default=None):
+    """
+    Returns a frame of the session state - a spilled frame is reloaded from disk (it stays spilled)
+
+    Parameters:
+    - session (st.session_state or dict): session state
+    - key (str): session state key of the frame
+    - default: returned if the key is not in the session state
+
+    Returns:
+    - pd.DataFrame: the frame
+    """
+
+    spilled = get_session_store(session)['spilled'].get(key)
+    if spilled is not None:
+        df = read_arrow_frame(spilled['path'])
+        df.attrs.update(spilled['attrs'])
+        return df
+
+    return session[key] if key in session else default
+
+
+def spill_session_frame(session, key):
+    """
+    Writes a frame of the session state to the spill directory of the session and replaces it by an empty frame
+
+    Returns:
+    - bool: False if the frame cannot be written (it stays in memory)
+    """
+
+    store = get_session_store(session)
+    df = session[key]
+
+    spill_path = os.path.join(SESSION_SPILL_DIR_PATH, store['store_id'])
+    os.makedirs(spill_path, exist_ok=True)
+    file_path = os.path.join(spill_path, f'{key}.arrow')
+
+    if not write_arrow_frame(df, file_path):
+        return False
+
+    # the frame metadata (e.g. date formats of mapped_df) is not part of the arrow file
+    store['spilled'][key] = {'path': file_path, 'nbytes': get_frame_nbytes(session, key), 'attrs': dict(df.attrs)}
+    session[key] = pd.DataFrame()
+
+    return True
+
+
+def get_frame_nbytes(session, key):
+    """
+    Returns the memory used by a frame (or dict of frames and arrays) of the session state - recalculated only when a different
+    object is stored under the key
+    """
+
+    store = get_session_store(session)
+    df = session[key]
+
+    tracked_id, nbytes = store['sizes'].get(key, (None, 0))
+    if tracked_id != id(df):
+        nbytes = estimate_nbytes(df)
+        store['sizes'][key] = (id(df), nbytes)
+
+    return nbytes
+
+
+def enforce_session_budget(session, budget_bytes=SESSION_MEMORY_BUDGET_BYTES):
+    """
+    Spills the intermediate frames (SESSION_SPILL_RULES) whose downstream frame exists - largest first, until the frames
+    in memory are within the session memory ceiling
+
+    Returns:
+    - list: keys of the frames spilled by this call
+    """
+
+    store = get_session_store(session)
+    in_memory_bytes = get_session_memory_usage(session, budget_bytes)['in_memory_bytes']
+
+    def _has_frame(key):
+        return key in store['spilled'] or (isinstance(session.get(key), pd.DataFrame) and not session[key].empty)
+
+    candidates = [key for key, downstream_key in SESSION_SPILL_RULES.items()
+                  if key not in store['spilled'] and _has_frame(key) and _has_frame(downstream_key)]
+    candidates.sort(key=lambda key: get_frame_nbytes(session, key), reverse=True)
+
+    spilled_keys = []
+    for key in candidates:
+        if in_memory_bytes <= budget_bytes:
+            break
+        nbytes = get_frame_nbytes(session, key)
+        if spill_session_frame(session, key):
+            in_memory_bytes -= nbytes
+            spilled_keys.append(key)
+
+    return spilled_keys
+
+
+def get_session_memory_usage(session, budget_bytes=SESSION_MEMORY_BUDGET_BYTES):
+    """
+    Returns the memory usage of the session frames - and of the dicts of frames and arrays (e.g. replan_metrics_state)
+
+    Returns:
+    - dict: frames (pd.DataFrame with frame, location and MB for each frame), in_memory_bytes, spilled_bytes, budget_bytes
+    """
+
+    store = get_session_store(session)
+
+    rows = []
+    for key in list(session.keys()):
+        if key in store['spilled'] or key == SESSION_STORE_KEY or not isinstance(session[key], (pd.DataFrame, dict)):
+            continue
+        rows.append({'frame': key, 'location': 'memory', 'nbytes': get_frame_nbytes(session, key)})
+    for key, spilled in store['spilled'].items():
+        rows.append({'frame': key, 'location': 'disk', 'nbytes': spilled['nbytes']})
+
+    frames = pd.DataFrame(rows, columns=['frame', 'location', 'nbytes'])
+    frames['MB'] = (frames['nbytes'] / (1024 * 1024)).round(2)
+    frames = frames.sort_values('nbytes', ascending=False).drop(columns='nbytes').reset_index(drop=True)
+
+    in_memory_bytes = sum(row['nbytes'] for row in rows if row['location'] == 'memory')
+    spilled_bytes = sum(row['nbytes'] for row in rows if row['location'] == 'disk')
+
+    return {'frames': frames, 'in_memory_bytes': in_memory_bytes, 'spilled_bytes': spilled_bytes, 'budget_bytes': budget_bytes}
+
+
+def clear_session_store(session):
+    """
+    Removes the spill directory of the session - called before the session state is cleared
+    """
+
+    if SESSION_STORE_KEY in session:
+        shutil.rmtree(os.path.join(SESSION_SPILL_DIR_PATH, session[SESSION_STORE_KEY]['store_id']), ignore_errors=True)
@@ -27,4 +27,76 @@ ARR_DISPLAY_COLUMN_MAP = {
         "churnLogo" : "Churned Customer",
         "monthlyRevenueLogo": "Closing Period Customers"
 
-}
\ No newline at end of file
+}
+
+# aggregated ARR metrics displayed by stylize_metrics_df - in display order, with the number format of each metric
+# (amounts with 0 precision, rates as % with 2 digit precision)
+AGG_METRICS_DISPLAY_FORMATS = {
+        "lastMonthRevenue" : "{:,.0f}",
+        "newBusiness" : "{:,.0f}",
+        "upSell" : "{:,.0f}",
+        "downSell" : "{:,.0f}",
+        "churn" : "{:,.0f}",
+        "monthlyRevenue" : "{:,.0f}",
+        "grossRetentionRate" : "{:,.2%}",
+        "netRetentionRate" : "{:,.2%}",
+        "yearlyRevenueGrowth" : "{:,.2%}",
+}
+
+# measure types of the customer level ARR waterfall - in display order 
+CUSTOMER_WATERFALL_MEASURE_TYPES = ['monthlyRevenue', 'newBusiness', 'upSell', 'downSell', 'churn']
+
+# measure types of the customer count (logo) waterfall - in display order 
+LOGO_WATERFALL_MEASURE_TYPES = ['lastMonthRevenueLogo', 'newBusinessLogo',  'churnLogo', 'monthlyRevenueLogo']
+
+# trailing windows (in months) for the multi-horizon retention metrics 
+RETENTION_HORIZONS = [3, 6, 12, 24]
+
+# saved column map (Save Column Map / Load Column Map)
+SAVED_COLUMN_MAP_FILE_PATH = 'saved_map/column_map.csv'
+
+# number of upload rows read at a time by the streaming ingestion 
+INGESTION_CHUNK_SIZE = 100000
+
+# backends of the ARR metrics - dense numpy grids or sparse scipy CSR grids (memory scales with the active customer months)
+METRICS_BACKENDS = ['dense', 'sparse']
+
+# arrow types of the data elements for the typed ingestion - ids and names are dictionary encoded (categorical),
+# dates are parsed with the selected date format by the reader 
+PREDEFINED_COLUMN_TYPES = {
+    'customerId': 'dictionary',
+    'customerName': 'dictionary',
+    'contractId': 'string',
+    'contractStartDate': 'timestamp',
+    'contractEndDate': 'timestamp',
+    'totalContractValue': 'float64',
+}
+
+# saved analysis snapshots (arrow files - one directory per snapshot key)
+SNAPSHOT_DIR_PATH = 'saved_snapshots'
+
+# disk budget of the saved snapshots - the least recently used snapshots are removed (same policy as the pipeline cache)
+SNAPSHOT_DIR_BUDGET_BYTES = 2 * 1024 * 1024 * 1024
+
+# memory budget of the pipeline cache (stage outputs shared by all sessions of the server)
+PIPELINE_CACHE_BUDGET_BYTES = 1024 * 1024 * 1024
+
+# memory ceiling of the frames kept in one user session - intermediate frames are spilled to disk above it
+SESSION_MEMORY_BUDGET_BYTES = 512 * 1024 * 1024
+
+# spilled session frames (arrow files - one directory per session)
+SESSION_SPILL_DIR_PATH = 'session_spill'
+
+# reconciliation report - a month is a mismatch if the difference is above the absolute tolerance and above the relative
+# tolerance (share of the larger of the uploaded and historical value)
+RECON_ABSOLUTE_TOLERANCE = 1.0
+RECON_RELATIVE_TOLERANCE = 0.001
+
+# mismatch types of the reconciliation report - in display order 
+RECON_MISMATCH_TYPES = ['missingInUpload', 'missingInHistory', 'amountDelta', 'timingShift']
+
+# customers per page of the reconciliation report 
+RECON_PAGE_SIZE = 50
+
+# page sizes (rows) of the paged grids - MRR by customer and the uploaded data, the first one is the default 
+GRID_PAGE_SIZES = [50, 100, 500, 1000]
@@ -0,0 +1,143 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from arr_lib.arr_analysis import create_monthly_buckets
+
+
+# Benchmark of the month expansion (create_monthly_buckets) - one row per contract month
+# synthetic contracts with a fixed seed, sized so that the expansion creates about --rows rows.
+# The previous row-wise implementation (create_monthly_buckets_rowwise) is timed as the reference and must return the
+# same frame on a smaller seeded input (--check-contracts contracts)
+#
+#   python -m benchmarks.bench_monthly_buckets              (1M expanded rows - the row-wise reference takes about a minute)
+#   python -m benchmarks.bench_monthly_buckets --rows 275000
+
+
+# contract durations in days - 1 to 36 months
+CONTRACT_DURATIONS = np.array([30, 90, 180, 365, 365, 730, 1095])
+
+
+def create_contracts(num_contracts, num_customers, seed=0):
+    """
+    Creates synthetic validated contract data (same columns as create_validation_report leaves in the mapped df)
+
+    Parameters:
+    - num_contracts (int): number of contracts
+    - num_customers (int): number of customers the contracts are spread over
+    - seed (int): random seed
+
+    Returns:
+    - pd.DataFrame: customerId, customerName, contractId, contractStartDate, contractEndDate, totalContractValue, contractDuration
+    """
+
+    rng = np.random.default_rng(seed)
+
+    customers = rng.integers(0, num_customers, num_contracts)
+    start_dates = pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.integers(0, 365 * 8, num_contracts), unit='D')
+    durations = rng.choice(CONTRACT_DURATIONS, num_contracts)
+
+    df = pd.DataFrame({
+        'customerId': customers.astype(str),
+        'customerName': np.char.add('Customer ', customers.astype(str)),
+        # 10% of the contracts without contractId - defaulted by create_monthly_buckets
+        'contractId': np.where(rng.random(num_contracts) < 0.1, None, np.char.add('C', np.arange(num_contracts).astype(str))),
+        'contractStartDate': start_dates,
+        'contractEndDate': start_dates + pd.to_timedelta(durations, unit='D'),
+        'totalContractValue': rng.integers(1000, 100000, num_contracts).astype(float),
+    })
+    df['contractDuration'] = (df['contractEndDate'] - df['contractStartDate']).dt.days
+
+    return df
+
+
+def create_monthly_buckets_rowwise(input_df):
+    """
+    Previous implementation of create_monthly_buckets - one DateOffset and one strftime per expanded row (reference)
+
+    Parameters:
+    - df (pd.DataFrame): validated contract data DataFrame
+
+    Returns:
+    - pd.DataFrame: one row for each month - for the customer and contract
+    """
+
+    df = input_df.copy()
+
+    # Calculate contractMonths by rounding contractLength/30 - added 0.01 for boundary conditions
+    df['contractMonths'] = ((df['contractDuration'] / 30) + 0.01).round()
+
+    # handle missing contactId situations - defaults it to customerId + index of the row (unique)
+    # (assigned instead of fillna(inplace=True) - an inplace fill of a column is not applied under copy-on-write)
+    df['contractId'] = df['contractId'].fillna(df['customerId'].astype(str) + df.index.astype(str))
+
+    # handle repeating contractId situation - concatenate contractId with index
+    df['contractId'] = df['contractId'].astype(str) + df.index.astype(str)
+
+    # Repeat rows based on contractMonths
+    second_df = df.loc[df.index.repeat(df['contractMonths'].astype(int))].reset_index(drop=True)
+
+    # Add a column called monthIndex and increment it by 1 for each customerId and contractId
+    second_df['monthIndex'] = second_df.groupby(['customerId', 'contractId']).cumcount() + 1
+
+    # increments the month fields based on monthIndex
+    second_df['month'] = second_df.apply(lambda row: row['contractStartDate'] + pd.DateOffset(months=row['monthIndex'] - 1), axis=1)
+
+    # Reformat 'month' to YYYY-MM format (drop the day portion)
+    second_df['month'] = second_df['month'].dt.strftime('%Y-%m')
+
+    # Add a column called monthlyRevenue
+    second_df['monthlyRevenue'] = (second_df['totalContractValue'] / second_df['contractMonths']).round(2).fillna(0)
+
+    return second_df[['customerId', 'customerName', 'contractId', 'month', 'monthlyRevenue']]
+
+
+def time_function(function, repeat, *args):
+    """
+    Times a function - all the runs after one warm up run
+
+    Returns:
+    - list: time of each run in seconds
+    """
+
+    function(*args)
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark create_monthly_buckets')
+    parser.add_argument('--rows', type=int, default=1000000, help='approximate number of expanded (contract month) rows')
+    parser.add_argument('--repeat', type=int, default=5, help='number of timed runs')
+    parser.add_argument('--reference-repeat', type=int, default=1, help='number of timed runs of the row-wise reference')
+    parser.add_argument('--check-contracts', type=int, default=2000, help='number of contracts of the equivalence check')
+    args = parser.parse_args()
+
+    # same frame as the row-wise reference on a smaller seeded input
+    check_df = create_contracts(args.check_contracts, max(args.check_contracts // 10, 1), seed=1)
+    pd.testing.assert_frame_equal(create_monthly_buckets(check_df), create_monthly_buckets_rowwise(check_df))
+    print(f"equivalence check: {args.check_contracts:,} contracts - same frame as the row-wise reference")
+
+    # average contract length in months - number of contracts for the requested expansion
+    average_months = np.mean(np.round(CONTRACT_DURATIONS / 30 + 0.01))
+    num_contracts = int(args.rows / average_months)
+    contracts_df = create_contracts(num_contracts, max(num_contracts // 10, 1))
+
+    num_rows = len(create_monthly_buckets(contracts_df))
+    timings = time_function(create_monthly_buckets, args.repeat, contracts_df)
+    reference_timings = time_function(create_monthly_buckets_rowwise, args.reference_repeat, contracts_df)
+
+    print(f"create_monthly_buckets: {num_contracts:,} contracts -> {num_rows:,} rows")
+    print(f"vectorized  best {min(timings):.3f}s  median {np.median(timings):.3f}s  ({args.repeat} runs)")
+    print(f"row-wise    best {min(reference_timings):.3f}s  median {np.median(reference_timings):.3f}s  ({args.reference_repeat} runs)")
+    print(f"row-wise / vectorized: {np.median(reference_timings) / np.median(timings):.1f}x (medians)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import time
+import numpy as np
+from arr_lib.setup import CUSTOMER_WATERFALL_MEASURE_TYPES
+from arr_lib.arr_analysis import create_aggregated_metrics_frame, create_waterfall, annualize_agg_arr
+from arr_lib.arr_analysis import calculate_retention_metrics, create_metrics_from_totals
+
+
+# Benchmark of the retention / trailing window metrics (calculate_retention_metrics) on the aggregated metrics -
+# synthetic monthly totals with a fixed seed, --months months (default 240 - 20 years)
+#
+#   python -m benchmarks.bench_retention_metrics
+#   python -m benchmarks.bench_retention_metrics --months 120
+
+
+def create_monthly_totals(num_months, seed=0):
+    """
+    Creates synthetic monthly totals of the customer waterfall - monthlyRevenue is the running sum of the movements
+
+    Parameters:
+    - num_months (int): number of months
+    - seed (int): random seed
+
+    Returns:
+    - np.ndarray: totals - one row for each measure in CUSTOMER_WATERFALL_MEASURE_TYPES order
+    - list: month column names (YYYY-MM)
+    """
+
+    rng = np.random.default_rng(seed)
+
+    new_business = rng.uniform(5000, 20000, num_months)
+    up_sell = rng.uniform(1000, 5000, num_months)
+    down_sell = -rng.uniform(500, 2000, num_months)
+    churn = -rng.uniform(1000, 6000, num_months)
+
+    # no movements before the first month
+    for movement in (up_sell, down_sell, churn):
+        movement[0] = 0
+
+    measures = {
+        'monthlyRevenue': np.cumsum(new_business + up_sell + down_sell + churn),
+        'newBusiness': new_business,
+        'upSell': up_sell,
+        'downSell': down_sell,
+        'churn': churn,
+    }
+    month_columns = [f'{2000 + i // 12}-{i % 12 + 1:02d}' for i in range(num_months)]
+
+    return np.vstack([measures[measure] for measure in CUSTOMER_WATERFALL_MEASURE_TYPES]), month_columns
+
+
+def time_function(function, repeat, *args):
+    """
+    Times a function - best and median of the runs after one warm up run
+
+    Returns:
+    - float: best time in seconds
+    - float: median time in seconds
+    """
+
+    function(*args)
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+
+    return min(timings), float(np.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark calculate_retention_metrics')
+    parser.add_argument('--months', type=int, default=240, help='number of months of the aggregate')
+    parser.add_argument('--repeat', type=int, default=20, help='number of timed runs')
+    args = parser.parse_args()
+
+    totals, month_columns = create_monthly_totals(args.months)
+
+    # input of calculate_retention_metrics - same steps as create_metrics_from_totals
+    annualized_df = annualize_agg_arr(create_waterfall(create_aggregated_metrics_frame(totals, month_columns)))
+
+    best, median = time_function(calculate_retention_metrics, args.repeat, annualized_df)
+    print(f"calculate_retention_metrics ({args.months} months): best {best * 1000:.1f}ms  median {median * 1000:.1f}ms")
+
+    best, median = time_function(create_metrics_from_totals, args.repeat, totals, month_columns)
+    print(f"create_metrics_from_totals ({args.months} months): best {best * 1000:.1f}ms  median {median * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+import argparse
+import time
+import tracemalloc
+import warnings
+import numpy as np
+import pandas as pd
+from arr_lib.arr_analysis import create_customer_and_aggregated_metrics, create_aggregated_arr_metrics, create_waterfall
+from arr_lib.arr_analysis import stylize_metrics_df, rename_columns
+from arr_lib.arr_visualize import get_list_of_months, get_core_arr_metrics
+from arr_lib.arr_charts import top_cust_chart
+
+
+# Benchmark of the memory of a Visualize page rerun - the page reads the 8 session frames of the analysis and the replan
+# (month lists, core metrics, top customers, customer waterfall, styled metrics). Traced peak memory of one rerun on a
+# synthetic book of --customers customers x --months months (fixed seed)
+#
+#   python -m benchmarks.bench_session_memory             copy-on-write, session frames read directly (current)
+#   python -m benchmarks.bench_session_memory --before    copy-on-write off, session frames copied by the page (as before)
+
+
+def create_session_frames(num_customers, num_months, seed=0):
+    """
+    Creates the 8 session frames of the analysis and the replan from a synthetic customer revenue grid
+
+    Returns:
+    - dict: session key -> frame
+    """
+
+    rng = np.random.default_rng(seed)
+
+    # 60% of the customer months with revenue
+    month_columns = [f'{2015 + i // 12}-{i % 12 + 1:02d}' for i in range(num_months)]
+    revenue = np.where(rng.random((num_customers, num_months)) < 0.6, rng.integers(100, 5000, (num_customers, num_months)), 0)
+    grid_df = pd.DataFrame(revenue.astype(float), columns=month_columns)
+    grid_df.insert(0, 'customerName', ['Customer %06d' % i for i in range(num_customers)])
+    grid_df.insert(1, 'customerId', np.arange(num_customers))
+
+    cust_arr_waterfall_df, customer_arr_df, logo_metrics_df, metrics_df = create_customer_and_aggregated_metrics(grid_df)
+
+    # the replan frames are the same size as the analysis frames
+    return {
+        'metrics_df': metrics_df, 'customer_arr_waterfall_df': cust_arr_waterfall_df,
+        'customer_arr_df': customer_arr_df, 'logo_metrics_df': logo_metrics_df,
+        'replan_metrics_df': metrics_df, 'replan_customer_arr_waterfall_df': cust_arr_waterfall_df,
+        'replan_customer_arr_df': customer_arr_df, 'replan_logo_metrics_df': logo_metrics_df,
+    }
+
+
+def rerun_page(session, copy_frames):
+    """
+    One rerun of the Visualize page on the session frames
+
+    Parameters:
+    - session (dict): session frames (see create_session_frames)
+    - copy_frames (bool): copy the session frames before reading them (the page before copy-on-write)
+    """
+
+    frames = {key: (df.copy() if copy_frames else df) for key, df in session.items()}
+
+    # analysis and replan sections
+    for prefix in ('', 'replan_'):
+        metrics_df = frames[f'{prefix}metrics_df'].copy() if copy_frames else frames[f'{prefix}metrics_df']
+        _, selected_month = get_list_of_months(metrics_df, True)
+        get_core_arr_metrics(frames[f'{prefix}metrics_df'], frames[f'{prefix}logo_metrics_df'], selected_month)
+        top_cust_chart(frames[f'{prefix}customer_arr_df'], '#ffffff', 'Top customers')
+
+        # waterfall of one customer
+        waterfall_df = frames[f'{prefix}customer_arr_waterfall_df']
+        waterfall_df = waterfall_df.copy() if copy_frames else waterfall_df
+        waterfall_df[waterfall_df['customerId'] == 7]
+
+    stylize_metrics_df(frames['metrics_df'], 'blue')
+    rename_columns(frames['logo_metrics_df'])
+    create_waterfall(create_aggregated_arr_metrics(frames['customer_arr_waterfall_df']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the memory of a Visualize page rerun')
+    parser.add_argument('--customers', type=int, default=50000, help='number of customers')
+    parser.add_argument('--months', type=int, default=120, help='number of months')
+    parser.add_argument('--before', action='store_true', help='copy-on-write off and session frames copied by the page')
+    args = parser.parse_args()
+
+    # the warnings of the page helpers (empty 24 month windows etc.) are not part of the benchmark
+    warnings.simplefilter('ignore')
+
+    # copy-on-write is enabled by arr_lib - switched off to measure the page as before
+    pd.set_option('mode.copy_on_write', not args.before)
+
+    session = create_session_frames(args.customers, args.months)
+
+    # warm up rerun - not measured
+    rerun_page(session, args.before)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    rerun_page(session, args.before)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    mode = 'before (copy-on-write off, frames copied)' if args.before else 'copy-on-write'
+    print(f"Visualize rerun, {args.customers:,} customers x {args.months} months, {mode}: "
+          f"peak {peak / 2 ** 20:.0f} MB  time {elapsed:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,7 @@ from datetime import datetime, timedelta
 from arr_lib.styling import BUTTON_STYLE
 from arr_lib.styling import MARKDOWN_STYLES
 from arr_lib.styling import GLOBAL_STYLING
+from arr_lib.setup import RETENTION_HORIZONS
 
 import arr_lib.arr_visualize as av
 import arr_lib.arr_charts as ac
@@ -21,20 +22,20 @@ st.markdown("<br>", unsafe_allow_html=True)
 if 'metrics_df' not in st.session_state: 
     metrics_df = pd.DataFrame()
 else:
-    # copy uploaded ARR metrics from session 
-    metrics_df = st.session_state.metrics_df.copy()
-    customer_arr_waterfall_df = st.session_state.customer_arr_waterfall_df.copy()
-    customer_arr_df = st.session_state.customer_arr_df.copy()
-    logo_metrics_df = st.session_state.logo_metrics_df.copy()
+    # uploaded ARR metrics from session - read only, the session frames are not copied 
+    metrics_df = st.session_state.metrics_df
+    customer_arr_waterfall_df = st.session_state.customer_arr_waterfall_df
+    customer_arr_df = st.session_state.customer_arr_df
+    logo_metrics_df = st.session_state.logo_metrics_df
 
 if 'replan_metrics_df' not in st.session_state: 
     replan_metrics_df = pd.DataFrame()
 else: 
-    # copy adjusted ARR metrics from session 
-    replan_metrics_df = st.session_state.replan_metrics_df.copy()
-    replan_customer_arr_waterfall_df = st.session_state.replan_customer_arr_waterfall_df.copy()
-    replan_customer_arr_df = st.session_state.replan_customer_arr_df.copy()
-    replan_logo_metrics_df = st.session_state.replan_logo_metrics_df.copy()
+    # adjusted ARR metrics from session - read only, the session frames are not copied 
+    replan_metrics_df = st.session_state.replan_metrics_df
+    replan_customer_arr_waterfall_df = st.session_state.replan_customer_arr_waterfall_df
+    replan_customer_arr_df = st.session_state.replan_customer_arr_df
+    replan_logo_metrics_df = st.session_state.replan_logo_metrics_df
 
 if (metrics_df.empty or replan_metrics_df.empty): 
     st.error('Please generate ARR metrics')
@@ -59,8 +60,8 @@ with card_tab1:  # Adjusted metrics
     ##
 
     # arr metrics 
-    rp_df = replan_metrics_df.copy()
-    rp_logo_df = replan_logo_metrics_df.copy()
+    rp_df = replan_metrics_df
+    rp_logo_df = replan_logo_metrics_df
 
     month_columns, default_month = av.get_list_of_months(rp_df, True)
 
@@ -109,15 +110,15 @@ with card_tab2:
     ##
 
     # arr metrics 
-    met_df = metrics_df.copy()
+    met_df = metrics_df
 
     # Melting the DataFrame
     met_df = met_df.melt(id_vars='measureType', var_name='month', value_name='value')
 
 
         # arr metrics 
-    met_df = metrics_df.copy()
-    logo_df = logo_metrics_df.copy()
+    met_df = metrics_df
+    logo_df = logo_metrics_df
 
     month_columns_2, default_month_2 = av.get_list_of_months(met_df, True)
 
@@ -169,6 +170,26 @@ style_metric_cards(
 
 
 
+st.markdown("<br>", unsafe_allow_html=True)
+##
+## Retention on multiple horizons for the selected months 
+##
+
+st.subheader('Retention by Horizon')
+
+selected_horizons = st.multiselect("Select horizons (months)", RETENTION_HORIZONS, default=RETENTION_HORIZONS, key="retention_horizon_select")
+
+horizon_tab1, horizon_tab2= st.tabs(["Adjusted ARR", "Uploaded ARR"])
+
+with horizon_tab1: 
+    st.markdown("<br>", unsafe_allow_html=True)
+    st.dataframe(av.get_multi_horizon_retention(replan_metrics_df, selected_month, selected_horizons), use_container_width=False)
+
+with horizon_tab2: 
+    st.markdown("<br>", unsafe_allow_html=True)
+    st.dataframe(av.get_multi_horizon_retention(metrics_df, selected_month_2, selected_horizons), use_container_width=False)
+
+
 st.markdown("<br>", unsafe_allow_html=True)
 ##
 ## ARR Analytics 
@@ -266,7 +287,7 @@ with cust_arr_tab1:
 
     st.markdown("<br>", unsafe_allow_html=True)
 
-    df_original = replan_customer_arr_waterfall_df.copy()
+    df_original = replan_customer_arr_waterfall_df
 
     df = replan_customer_arr_waterfall_df[replan_customer_arr_waterfall_df['measureType'] == 'monthlyRevenue']
 
@@ -293,7 +314,7 @@ with cust_arr_tab2:
 
     st.markdown("<br>", unsafe_allow_html=True)
 
-    df_original = customer_arr_waterfall_df.copy()
+    df_original = customer_arr_waterfall_df
 
     df = customer_arr_waterfall_df[replan_customer_arr_waterfall_df['measureType'] == 'monthlyRevenue']
 
@@ -48,20 +48,20 @@ client = OpenAI()
 if 'metrics_df' not in st.session_state: 
     metrics_df = pd.DataFrame()
 else:
-    # copy uploaded ARR metrics from session 
-    metrics_df = st.session_state.metrics_df.copy()
-    customer_arr_waterfall_df = st.session_state.customer_arr_waterfall_df.copy()   
-    customer_arr_df = st.session_state.customer_arr_df.copy()
-    logo_metrics_df = st.session_state.logo_metrics_df.copy()
+    # uploaded ARR metrics from session - read only, the session frames are not copied 
+    metrics_df = st.session_state.metrics_df
+    customer_arr_waterfall_df = st.session_state.customer_arr_waterfall_df   
+    customer_arr_df = st.session_state.customer_arr_df
+    logo_metrics_df = st.session_state.logo_metrics_df
 
 if 'replan_metrics_df' not in st.session_state: 
     replan_metrics_df = pd.DataFrame()
 else: 
-    # copy adjusted ARR metrics from session 
-    replan_metrics_df = st.session_state.replan_metrics_df.copy()
-    replan_customer_arr_waterfall_df = st.session_state.replan_customer_arr_waterfall_df.copy()
-    replan_customer_arr_df = st.session_state.replan_customer_arr_df.copy()
-    replan_logo_metrics_df = st.session_state.replan_logo_metrics_df.copy()
+    # adjusted ARR metrics from session - read only, the session frames are not copied 
+    replan_metrics_df = st.session_state.replan_metrics_df
+    replan_customer_arr_waterfall_df = st.session_state.replan_customer_arr_waterfall_df
+    replan_customer_arr_df = st.session_state.replan_customer_arr_df
+    replan_logo_metrics_df = st.session_state.replan_logo_metrics_df
 
 if (metrics_df.empty or replan_metrics_df.empty): 
     st.error('Please generate ARR metrics')
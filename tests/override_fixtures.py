@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+
+# scratchpad and override dfs shared by the override and reconciliation tests
+
+
+MONTH_COLUMNS = ['2022-01', '2022-02', '2022-03']
+
+
+def create_scratchpad_df():
+    return pd.DataFrame({
+        'customerName': ['Acme', 'Globex'],
+        'customerId': [1001, 1002],
+        '2022-01': [100.0, 0.0],
+        '2022-02': [100.0, 200.0],
+        '2022-03': [100.0, 200.0],
+    })
+
+
+def create_override_df(rows):
+    return pd.DataFrame(rows, columns=['customerId', 'customerName'] + MONTH_COLUMNS)
+
+
+def create_nan_override_df():
+    # Acme without a February value, Globex without any value
+    return create_override_df([[1001, 'Acme', 150.0, np.nan, 175.0],
+                               [1002, 'Globex', np.nan, np.nan, np.nan]])
+
+
+def create_new_customer_override_df():
+    # a customer and a month that are not in the scratchpad
+    override_df = create_override_df([[1003, 'Initech', np.nan, 300.0, 300.0]])
+    override_df['2022-04'] = [300.0]
+    return override_df
+
+
+def create_duplicate_override_df():
+    # two rows for Acme
+    return create_override_df([[1001, 'Acme', 100.0, 300.0, 500.0],
+                               [1001, 'Acme', 200.0, 500.0, 700.0]])
+
+
+def to_categorical_ids(input_df):
+    return input_df.astype({'customerId': 'category', 'customerName': 'category'})
@@ -0,0 +1,47 @@
+import numpy as np
+from arr_lib.arr_analysis import apply_overrides
+from override_fixtures import MONTH_COLUMNS, create_scratchpad_df, create_override_df, create_nan_override_df
+from override_fixtures import create_new_customer_override_df, create_duplicate_override_df, to_categorical_ids
+
+
+# apply_overrides - the override value of a customer month is used if present, otherwise the scratchpad value.
+# Customers and months of both dfs are kept, missing values are 0 and the rows are sorted by first month of sales
+
+
+def test_nan_overrides_keep_the_scratchpad_values():
+    planning_df = apply_overrides(create_scratchpad_df(), create_nan_override_df())
+
+    assert planning_df.columns.tolist() == ['customerId', 'customerName'] + MONTH_COLUMNS
+    assert planning_df.set_index('customerId')[MONTH_COLUMNS].to_dict('index') == {
+        1001: {'2022-01': 150.0, '2022-02': 100.0, '2022-03': 175.0},
+        1002: {'2022-01': 0.0, '2022-02': 200.0, '2022-03': 200.0},
+    }
+
+
+def test_new_customers_and_months_are_added():
+    planning_df = apply_overrides(create_scratchpad_df(), create_new_customer_override_df())
+
+    assert planning_df.columns.tolist() == ['customerId', 'customerName'] + MONTH_COLUMNS + ['2022-04']
+    # sorted by first month of sales - the new customer starts in 2022-02 like Globex, and ends later
+    assert planning_df['customerId'].tolist() == [1001, 1002, 1003]
+    assert planning_df.set_index('customerId').loc[1003, MONTH_COLUMNS + ['2022-04']].tolist() == [0.0, 300.0, 300.0, 300.0]
+    assert planning_df.set_index('customerId').loc[1001, '2022-04'] == 0.0
+
+
+def test_duplicate_override_rows_are_averaged():
+    planning_df = apply_overrides(create_scratchpad_df(), create_duplicate_override_df())
+
+    assert len(planning_df) == 2
+    assert planning_df.set_index('customerId').loc[1001, MONTH_COLUMNS].tolist() == [150.0, 400.0, 600.0]
+
+
+def test_categorical_customer_ids_match_plain_ids():
+    override_df = create_override_df([[1001, 'Acme', 150.0, np.nan, 175.0],
+                                      [1003, 'Initech', 0.0, 300.0, 300.0]])
+
+    expected_df = apply_overrides(create_scratchpad_df(), override_df)
+    planning_df = apply_overrides(to_categorical_ids(create_scratchpad_df()), to_categorical_ids(override_df))
+
+    # one row per customer - the categories of both dfs are combined
+    assert planning_df['customerId'].astype(int).tolist() == expected_df['customerId'].tolist()
+    np.testing.assert_array_equal(planning_df[MONTH_COLUMNS].to_numpy(), expected_df[MONTH_COLUMNS].to_numpy())
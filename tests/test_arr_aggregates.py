@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pytest
+from arr_lib.arr_analysis import calculate_customer_waterfall, create_customer_waterfall_frame
+from arr_lib.arr_aggregates import create_aggregate_store, update_aggregate_store
+from arr_lib.arr_aggregates import aggregate_store_to_metrics_df, aggregate_store_to_logo_metrics_df
+
+
+# random edits applied through update_aggregate_store must give the same store as a full rebuild (create_aggregate_store)
+# of the edited revenue matrix
+
+
+NUM_CUSTOMERS = 200
+NUM_MONTHS = 36
+MONTH_COLUMNS = [f'{2020 + i // 12}-{i % 12 + 1:02d}' for i in range(NUM_MONTHS)]
+
+
+def create_revenue_matrix(rng, num_customers):
+    # about half of the customer months without revenue - so that edits create new business, churn and reactivations
+    revenue = rng.integers(100, 5000, (num_customers, NUM_MONTHS)).astype(float)
+    revenue[rng.random(revenue.shape) < 0.5] = 0
+    return revenue
+
+
+def create_waterfall_df(revenue, customer_ids):
+    names = np.array([f'Customer {customer_id}' for customer_id in customer_ids], dtype=object)
+    return create_customer_waterfall_frame(calculate_customer_waterfall(revenue), names, np.asarray(customer_ids), MONTH_COLUMNS)
+
+
+def edit_revenue_matrix(rng, revenue, edited_customers):
+    # cells are zeroed, set or scaled - a whole customer row is sometimes cleared
+    edited = revenue.copy()
+    for customer in edited_customers:
+        if rng.random() < 0.1:
+            edited[customer] = 0
+            continue
+        months = rng.choice(NUM_MONTHS, rng.integers(1, 6), replace=False)
+        edited[customer, months] = rng.choice([0.0, 250.0, 1234.5, 99999.0], len(months)) * rng.choice([1, 0.5], len(months))
+    return edited
+
+
+def assert_same_store(store, expected_store):
+    assert store['month_columns'] == expected_store['month_columns']
+    np.testing.assert_allclose(store['totals'], expected_store['totals'], rtol=1e-9, atol=1e-6)
+    np.testing.assert_array_equal(store['customer_counts'], expected_store['customer_counts'])
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_edits_match_full_rebuild(seed):
+    rng = np.random.default_rng(seed)
+    customer_ids = np.arange(NUM_CUSTOMERS)
+    revenue = create_revenue_matrix(rng, NUM_CUSTOMERS)
+
+    store = create_aggregate_store(create_waterfall_df(revenue, customer_ids))
+
+    for _ in range(20):
+        edited_customers = rng.choice(NUM_CUSTOMERS, rng.integers(1, 10), replace=False)
+        edited = edit_revenue_matrix(rng, revenue, edited_customers)
+
+        store = update_aggregate_store(store, calculate_customer_waterfall(revenue[edited_customers]),
+                                       calculate_customer_waterfall(edited[edited_customers]))
+        revenue = edited
+
+        assert_same_store(store, create_aggregate_store(create_waterfall_df(revenue, customer_ids)))
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_random_edits_as_dataframes_match_full_rebuild(seed):
+    rng = np.random.default_rng(seed)
+    customer_ids = np.arange(NUM_CUSTOMERS)
+    revenue = create_revenue_matrix(rng, NUM_CUSTOMERS)
+
+    store = create_aggregate_store(create_waterfall_df(revenue, customer_ids))
+
+    for _ in range(10):
+        edited_customers = np.sort(rng.choice(NUM_CUSTOMERS, rng.integers(1, 10), replace=False))
+        edited = edit_revenue_matrix(rng, revenue, edited_customers)
+
+        # the changed customers as cust_arr_waterfall_df rows
+        store = update_aggregate_store(store, create_waterfall_df(revenue[edited_customers], customer_ids[edited_customers]),
+                                       create_waterfall_df(edited[edited_customers], customer_ids[edited_customers]))
+        revenue = edited
+
+    expected_store = create_aggregate_store(create_waterfall_df(revenue, customer_ids))
+    assert_same_store(store, expected_store)
+
+    pd.testing.assert_frame_equal(aggregate_store_to_logo_metrics_df(store), aggregate_store_to_logo_metrics_df(expected_store))
+    pd.testing.assert_frame_equal(aggregate_store_to_metrics_df(store), aggregate_store_to_metrics_df(expected_store), rtol=1e-9)
+
+
+def test_added_and_removed_customers_match_full_rebuild():
+    rng = np.random.default_rng(0)
+    revenue = create_revenue_matrix(rng, NUM_CUSTOMERS + 20)
+    customer_ids = np.arange(NUM_CUSTOMERS + 20)
+
+    # the last 20 customers are added, then the first 20 removed
+    store = create_aggregate_store(create_waterfall_df(revenue[:NUM_CUSTOMERS], customer_ids[:NUM_CUSTOMERS]))
+    store = update_aggregate_store(store, None, calculate_customer_waterfall(revenue[NUM_CUSTOMERS:]))
+    assert_same_store(store, create_aggregate_store(create_waterfall_df(revenue, customer_ids)))
+
+    store = update_aggregate_store(store, calculate_customer_waterfall(revenue[:20]), None)
+    assert_same_store(store, create_aggregate_store(create_waterfall_df(revenue[20:], customer_ids[20:])))
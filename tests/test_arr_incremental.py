@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+from arr_lib.arr_analysis import create_customer_and_aggregated_metrics
+from arr_lib.arr_incremental import update_customer_and_aggregated_metrics
+
+
+# random scratchpad edits applied through update_customer_and_aggregated_metrics must give the same frames as a full
+# recompute (create_customer_and_aggregated_metrics) of the edited scratchpad
+
+
+NUM_CUSTOMERS = 150
+NUM_MONTHS = 36
+MONTH_COLUMNS = [f'{2020 + i // 12}-{i % 12 + 1:02d}' for i in range(NUM_MONTHS)]
+
+
+def create_scratchpad_df(rng):
+    # about half of the customer months without revenue - so that edits create new business, churn and reactivations
+    revenue = rng.integers(100, 5000, (NUM_CUSTOMERS, NUM_MONTHS)).astype(float)
+    revenue[rng.random(revenue.shape) < 0.5] = 0
+
+    df = pd.DataFrame(revenue, columns=MONTH_COLUMNS)
+    df.insert(0, 'customerName', [f'Customer {i % 100:03d}' for i in range(NUM_CUSTOMERS)])
+    df.insert(1, 'customerId', np.arange(NUM_CUSTOMERS))
+    return df
+
+
+def edit_scratchpad_df(rng, input_df):
+    # cells are zeroed or set - a whole customer row is sometimes cleared
+    df = input_df.copy()
+    for row in rng.choice(NUM_CUSTOMERS, rng.integers(1, 8), replace=False):
+        if rng.random() < 0.1:
+            df.iloc[row, 2:] = 0.0
+            continue
+        months = 2 + rng.choice(NUM_MONTHS, rng.integers(1, 5), replace=False)
+        df.iloc[row, months] = rng.choice([0.0, 250.0, 1234.5, 99999.0], len(months))
+    return df
+
+
+def assert_same_frames(frames, expected_frames):
+    for df, expected_df in zip(frames, expected_frames):
+        pd.testing.assert_frame_equal(df.reset_index(drop=True), expected_df.reset_index(drop=True), rtol=1e-9)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_random_edits_match_full_recompute(seed):
+    rng = np.random.default_rng(seed)
+    scratchpad_df = create_scratchpad_df(rng)
+
+    state, frames = update_customer_and_aggregated_metrics(scratchpad_df)
+    assert_same_frames(frames, create_customer_and_aggregated_metrics(scratchpad_df))
+
+    for _ in range(10):
+        scratchpad_df = edit_scratchpad_df(rng, scratchpad_df)
+        state, frames = update_customer_and_aggregated_metrics(scratchpad_df, state)
+
+        assert_same_frames(frames, create_customer_and_aggregated_metrics(scratchpad_df))
+
+
+def test_returned_frames_are_not_changed_by_later_updates():
+    rng = np.random.default_rng(0)
+    scratchpad_df = create_scratchpad_df(rng)
+
+    state, frames = update_customer_and_aggregated_metrics(scratchpad_df)
+    expected_frames = create_customer_and_aggregated_metrics(scratchpad_df)
+
+    # the frames of the first calculation (e.g. kept in the session or a snapshot) keep their values
+    for _ in range(3):
+        state, _ = update_customer_and_aggregated_metrics(edit_scratchpad_df(rng, scratchpad_df), state)
+        assert_same_frames(frames, expected_frames)
+
+
+def test_added_customer_matches_full_recompute():
+    rng = np.random.default_rng(1)
+    scratchpad_df = create_scratchpad_df(rng)
+
+    state, _ = update_customer_and_aggregated_metrics(scratchpad_df)
+
+    # a row added in the editor - full calculation
+    added_df = pd.concat([scratchpad_df, scratchpad_df.tail(1).assign(customerName='New customer', customerId=NUM_CUSTOMERS)], ignore_index=True)
+    state, frames = update_customer_and_aggregated_metrics(added_df, state)
+
+    assert_same_frames(frames, create_customer_and_aggregated_metrics(added_df))
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+from arr_lib.arr_analysis import reconcile_overrides
+from arr_lib.arr_reconciliation import create_reconciliation, create_reconciliation_report
+from override_fixtures import MONTH_COLUMNS, create_scratchpad_df, create_override_df, create_nan_override_df
+from override_fixtures import create_new_customer_override_df, create_duplicate_override_df, to_categorical_ids
+
+
+# create_reconciliation / reconcile_overrides - difference of the override and scratchpad value for each customer and month
+# of the override, customers of both dfs. Missing values are 0, customers with more than one row are averaged
+
+
+def get_differences(recon_df):
+    return recon_df.set_index('customerId').drop(columns='customerName').to_dict('index')
+
+
+def test_nan_overrides_are_zero():
+    reconciliation = create_reconciliation(create_scratchpad_df(), create_nan_override_df())
+
+    assert get_differences(reconciliation['recon_df']) == {
+        1001: {'2022-01': 50.0, '2022-02': -100.0, '2022-03': 75.0},
+        1002: {'2022-01': 0.0, '2022-02': -200.0, '2022-03': -200.0},
+    }
+    assert reconciliation['customer_totals']['mismatchedMonths'].tolist() == [3, 2]
+    assert reconciliation['month_totals'].tolist() == [50.0, -300.0, -125.0]
+    assert reconciliation['total_difference'] == -375.0
+
+
+def test_new_customers_and_months_are_reconciled():
+    override_df = create_new_customer_override_df()
+    reconciliation = create_reconciliation(create_scratchpad_df(), override_df)
+
+    # columns of the override df - the scratchpad has no 2022-04 values
+    assert reconciliation['recon_df'].columns.tolist() == override_df.columns.tolist()
+    assert get_differences(reconciliation['recon_df']) == {
+        1001: {'2022-01': -100.0, '2022-02': -100.0, '2022-03': -100.0, '2022-04': 0.0},
+        1002: {'2022-01': 0.0, '2022-02': -200.0, '2022-03': -200.0, '2022-04': 0.0},
+        1003: {'2022-01': 0.0, '2022-02': 300.0, '2022-03': 300.0, '2022-04': 300.0},
+    }
+    assert reconciliation['total_difference'] == 200.0
+
+    summary_df = create_reconciliation_report(create_scratchpad_df(), override_df)['summary_df']
+    assert dict(zip(summary_df['customerId'], summary_df['mismatchType'])) == {
+        1001: 'missingInHistory', 1002: 'missingInHistory', 1003: 'missingInUpload',
+    }
+
+
+def test_duplicate_override_rows_are_averaged():
+    reconciliation = create_reconciliation(create_scratchpad_df(), create_duplicate_override_df())
+
+    assert get_differences(reconciliation['recon_df'])[1001] == {'2022-01': 50.0, '2022-02': 300.0, '2022-03': 500.0}
+    assert reconciliation['total_difference'] == 450.0
+
+
+def test_categorical_customer_ids_match_plain_ids():
+    override_df = create_nan_override_df()
+
+    expected = create_reconciliation(create_scratchpad_df(), override_df)
+    reconciliation = create_reconciliation(to_categorical_ids(create_scratchpad_df()), to_categorical_ids(override_df))
+
+    assert reconciliation['recon_df']['customerId'].tolist() == expected['recon_df']['customerId'].tolist()
+    np.testing.assert_array_equal(reconciliation['recon_df'][MONTH_COLUMNS].to_numpy(), expected['recon_df'][MONTH_COLUMNS].to_numpy())
+    assert reconciliation['total_difference'] == expected['total_difference']
+
+
+def test_mixed_string_and_integer_ids():
+    # customerId columns with both numbers and text (e.g. 1001 and 'A2') - the customers are matched by value
+    scratchpad_df = create_scratchpad_df().astype({'customerId': object})
+    scratchpad_df.loc[1, 'customerId'] = 'A2'
+    override_df = create_override_df([['A2', 'Globex', 0.0, 200.0, 200.0],
+                                      [1001, 'Acme', 100.0, 100.0, 100.0]])
+
+    reconciliation = create_reconciliation(scratchpad_df, override_df)
+    assert len(reconciliation['recon_df']) == 0
+    assert reconciliation['total_difference'] == 0
+
+    # a text id is not the same customer as the number (same as the merge of the melted dfs) - one customer missing on each side
+    override_df['customerId'] = ['A2', '1001']
+    summary_df = create_reconciliation_report(scratchpad_df, override_df)['summary_df']
+    assert sorted(summary_df['mismatchType'].tolist()) == ['missingInHistory', 'missingInUpload']
+    assert summary_df['difference'].sum() == 0
+
+
+def test_reconcile_overrides_returns_the_recon_df():
+    override_df = create_duplicate_override_df()
+
+    pd.testing.assert_frame_equal(reconcile_overrides(create_scratchpad_df(), override_df),
+                                  create_reconciliation(create_scratchpad_df(), override_df)['recon_df'])
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+from arr_lib.arr_analysis import create_arr_metrics_from_contracts
+from arr_lib.arr_sparse import densify_frame
+
+
+# the sparse metrics backend must return the same frames as the dense backend - the customer level frames with sparse
+# month columns, equal to the dense frames once densified
+
+
+CONTRACT_DURATIONS = np.array([30, 90, 180, 365, 400, 730, 1095])
+
+
+def create_contracts(num_contracts, num_customers, seed):
+    rng = np.random.default_rng(seed)
+
+    customers = rng.integers(0, num_customers, num_contracts)
+    start_dates = pd.Timestamp('2018-01-01') + pd.to_timedelta(rng.integers(0, 365 * 5, num_contracts), unit='D')
+    durations = rng.choice(CONTRACT_DURATIONS, num_contracts)
+
+    df = pd.DataFrame({
+        'customerId': customers,
+        'customerName': ['Customer %03d' % customer for customer in customers],
+        # 10% of the contracts without contractId
+        'contractId': np.where(rng.random(num_contracts) < 0.1, None, ['C%d' % i for i in range(num_contracts)]),
+        'contractStartDate': start_dates,
+        'contractEndDate': start_dates + pd.to_timedelta(durations, unit='D'),
+        'totalContractValue': rng.integers(1000, 100000, num_contracts).astype(float),
+    })
+    df['contractDuration'] = (df['contractEndDate'] - df['contractStartDate']).dt.days
+
+    return df
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_sparse_backend_matches_dense_backend(seed):
+    contracts_df = create_contracts(2000, 300, seed)
+
+    dense_frames = create_arr_metrics_from_contracts(contracts_df)
+    sparse_frames = create_arr_metrics_from_contracts(contracts_df, backend='sparse')
+
+    for dense_df, sparse_df in zip(dense_frames, sparse_frames):
+        pd.testing.assert_frame_equal(densify_frame(sparse_df).reset_index(drop=True), dense_df.reset_index(drop=True))
+
+
+def test_sparse_backend_customer_frames_have_sparse_months():
+    contracts_df = create_contracts(500, 100, 0)
+
+    cust_arr_waterfall_df, customer_arr_df, _, _ = create_arr_metrics_from_contracts(contracts_df, backend='sparse')
+
+    for df in (cust_arr_waterfall_df, customer_arr_df):
+        month_dtypes = df.drop(columns=['customerName', 'customerId', 'measureType'], errors='ignore').dtypes
+        assert all(isinstance(dtype, pd.SparseDtype) for dtype in month_dtypes)
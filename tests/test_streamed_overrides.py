@@ -0,0 +1,68 @@
+import io
+import pandas as pd
+from arr_lib.arr_ingestion import stream_revenue_matrix, read_override_file
+from arr_lib.arr_analysis import create_customer_and_aggregated_metrics, apply_overrides
+from arr_lib.arr_reconciliation import create_reconciliation
+
+
+# large file mode reads the customer columns as strings - the override file read with string ids must match the customers
+# of the streamed grid (no customer reported twice, no customer duplicated in the planning sheet)
+
+
+MONTH_COLUMNS = [f'2022-{month:02d}' for month in range(1, 13)]
+
+COLUMN_MAP_DF = pd.DataFrame({
+    'columnHeaders': ['customerId', 'customerName', 'contractId', 'contractStartDate', 'contractEndDate', 'totalContractValue'],
+    'columnNames': ['Account ID', 'Account Name', 'Opportunity ID', 'Start', 'End', 'Amount'],
+    'dateFormat': ['', '', '', 'mm/dd/yy', 'mm/dd/yy', ''],
+})
+
+
+def create_upload():
+    upload_df = pd.DataFrame({
+        'Account ID': [1001, 1002],
+        'Account Name': ['Acme', 'Globex'],
+        'Opportunity ID': ['O1', 'O2'],
+        'Start': ['01/01/22', '01/01/22'],
+        'End': ['12/31/22', '12/31/22'],
+        'Amount': [1200, 2400],
+    })
+    return io.BytesIO(upload_df.to_csv(index=False).encode())
+
+
+def create_override_file():
+    # same customers and values as the upload - numeric ids in the file
+    override_df = pd.DataFrame({'customerId': [1001, 1002], 'customerName': ['Acme', 'Globex'],
+                                **{month: [100.0, 200.0] for month in MONTH_COLUMNS}})
+    return io.BytesIO(override_df.to_csv(index=False).encode())
+
+
+def create_streamed_customer_arr_df():
+    transposed_df, _ = stream_revenue_matrix(create_upload(), COLUMN_MAP_DF, chunksize=1)
+    return create_customer_and_aggregated_metrics(transposed_df)[1]
+
+
+def test_streamed_grid_has_string_customer_ids():
+    customer_arr_df = create_streamed_customer_arr_df()
+
+    assert customer_arr_df['customerId'].tolist() == ['1001', '1002']
+
+
+def test_reconciliation_of_streamed_grid_and_override():
+    customer_arr_df = create_streamed_customer_arr_df()
+    override_df = read_override_file(create_override_file(), string_customer_ids=True)
+
+    reconciliation = create_reconciliation(customer_arr_df, override_df)
+
+    assert len(reconciliation['recon_df']) == 0
+    assert reconciliation['total_difference'] == 0
+
+
+def test_overrides_of_streamed_grid_keep_one_row_per_customer():
+    customer_arr_df = create_streamed_customer_arr_df()
+    override_df = read_override_file(create_override_file(), string_customer_ids=True)
+
+    planning_df = apply_overrides(customer_arr_df, override_df)
+
+    assert len(planning_df) == 2
+    assert sorted(planning_df['customerId']) == ['1001', '1002']